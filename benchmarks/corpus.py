@@ -0,0 +1,39 @@
+"""
+Synthetic corpora and recall measurement shared by the recall reports in this directory.
+"""
+import time
+from typing import Callable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+Search = Callable[[np.ndarray], Set[str]]
+
+
+def make_corpus(num_docs: int, dims: int, num_clusters: int, seed: int) -> np.ndarray:
+    """Generates clustered vectors, which behave more like real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dims))
+    assignments = rng.integers(0, num_clusters, size=num_docs)
+    return (centers[assignments] + 0.5 * rng.normal(size=(num_docs, dims))).astype(np.float32)
+
+
+def top_k_search(store, top_k: int) -> Search:
+    """Returns a function finding the ids of a store's `top_k` nearest documents to a query."""
+    return lambda query: {doc_id for doc_id, _, _ in store.similarity_search(query, top_k=top_k)}
+
+
+def measure_recall(
+    search: Search, queries: Sequence[np.ndarray], truth: List[Set[str]], top_k: int
+) -> Tuple[float, float]:
+    """
+    Runs every query through `search` and compares the results with the exact neighbours in `truth`.
+
+    Returns:
+        The recall@k, and the mean latency per query in milliseconds.
+    """
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        hits += len(search(query) & expected)
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    return hits / (len(queries) * top_k), latency
@@ -0,0 +1,71 @@
+"""
+Recall@k vs. latency report for HNSWVectorStore against the exact InMemoryVectorStore.
+
+Run it directly to pick `M` / `ef_construction` / `ef_search` for your corpus size:
+
+    python benchmarks/hnsw_recall_report.py --docs 5000 --dims 128 --top-k 10
+"""
+import argparse
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from corpus import make_corpus, measure_recall, top_k_search
+from fastccg.vector_store.hnsw import HNSWVectorStore
+from fastccg.vector_store.in_memory import InMemoryVectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--dims", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--M", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 50, 100, 200])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    console = Console()
+    vectors = make_corpus(args.docs + args.queries, args.dims, num_clusters=50, seed=args.seed)
+    corpus, queries = vectors[:args.docs], vectors[args.docs:]
+
+    exact = InMemoryVectorStore()
+    approx = HNSWVectorStore(M=args.M, ef_construction=args.ef_construction, seed=args.seed)
+
+    start = time.perf_counter()
+    for i, vector in enumerate(corpus):
+        exact.add(f"doc{i}", vector)
+    exact_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, vector in enumerate(corpus):
+        approx.add(f"doc{i}", vector)
+    approx_build = time.perf_counter() - start
+
+    exact_search = top_k_search(exact, args.top_k)
+    start = time.perf_counter()
+    truth = [exact_search(q) for q in queries]
+    exact_latency = (time.perf_counter() - start) / len(queries) * 1000
+
+    table = Table(title=f"Recall@{args.top_k} vs. latency ({args.docs:,} x {args.dims} docs, M={args.M}, ef_construction={args.ef_construction})")
+    table.add_column("Store", style="cyan")
+    table.add_column("ef_search", style="magenta", justify="right")
+    table.add_column(f"Recall@{args.top_k}", style="green", justify="right")
+    table.add_column("Mean latency (ms)", style="yellow", justify="right")
+    table.add_row("exact", "-", "1.000", f"{exact_latency:.3f}")
+
+    for ef in args.ef_search:
+        approx.ef_search = ef
+        recall, latency = measure_recall(top_k_search(approx, args.top_k), queries, truth, args.top_k)
+        table.add_row("hnsw", str(ef), f"{recall:.3f}", f"{latency:.3f}")
+
+    console.print(f"Build time: exact {exact_build:.2f}s, hnsw {approx_build:.2f}s")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
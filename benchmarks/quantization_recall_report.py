@@ -0,0 +1,71 @@
+"""
+Memory vs. recall@k report for QuantizedVectorStore against the exact InMemoryVectorStore.
+
+Run it directly to see what each quantization setting costs in accuracy:
+
+    python benchmarks/quantization_recall_report.py --docs 20000 --dims 256 --top-k 10
+"""
+import argparse
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from corpus import make_corpus, measure_recall, top_k_search
+from fastccg.vector_store.in_memory import InMemoryVectorStore
+from fastccg.vector_store.quantized import QuantizedVectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    console = Console()
+    vectors = make_corpus(args.docs + args.queries, args.dims, num_clusters=100, seed=args.seed)
+    corpus, queries = vectors[:args.docs], vectors[args.docs:]
+
+    exact = InMemoryVectorStore()
+    exact.add_many([f"doc{i}" for i in range(args.docs)], corpus)
+    truth = [top_k_search(exact, args.top_k)(q) for q in queries]
+
+    table = Table(title=f"Memory vs. recall@{args.top_k} ({args.docs:,} x {args.dims} docs)")
+    table.add_column("Store", style="cyan")
+    table.add_column("Bytes / vector", style="magenta", justify="right")
+    table.add_column("Compression", style="magenta", justify="right")
+    table.add_column(f"Recall@{args.top_k}", style="green", justify="right")
+    table.add_column("Mean latency (ms)", style="yellow", justify="right")
+    float_bytes = exact.dimensions * np.dtype(np.float32).itemsize
+    table.add_row("float32 (exact)", f"{float_bytes:.0f}", "1x", "1.000", "-")
+
+    settings = [
+        ("int8", {"method": "int8"}),
+        ("int8, rescore=50", {"method": "int8", "rescore": 50}),
+        (f"pq m={args.dims // 4}", {"method": "pq", "subvectors": args.dims // 4}),
+        (f"pq m={args.dims // 8}", {"method": "pq", "subvectors": args.dims // 8}),
+        (f"pq m={args.dims // 8}, rescore=100", {"method": "pq", "subvectors": args.dims // 8, "rescore": 100}),
+    ]
+    for name, options in settings:
+        store = QuantizedVectorStore(seed=args.seed, **options)
+        for i, vector in enumerate(corpus):
+            store.add(f"doc{i}", vector)
+        store.train()
+
+        recall, latency = measure_recall(top_k_search(store, args.top_k), queries, truth, args.top_k)
+
+        # Codes only: the float vectors kept for re-scoring can stay memory-mapped on disk.
+        code_bytes = store._codes[:args.docs].nbytes / args.docs
+        table.add_row(
+            name, f"{code_bytes:.0f}", f"{float_bytes / code_bytes:.0f}x",
+            f"{recall:.3f}", f"{latency:.3f}",
+        )
+
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
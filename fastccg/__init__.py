@@ -1,11 +1,19 @@
 from typing import Type, Optional
 import json
+from fastccg.core.completion_cache import CompletionCache
+from fastccg.core.http import configure_http
+from fastccg.core.rate_limit import configure_rate_limit
+from fastccg.core.semantic_cache import SemanticCache
 from fastccg.core.model_base import ModelBase
 from fastccg.core.terminal import run_terminal
 from fastccg.embedding.base import EmbeddingBase
 from fastccg.embedding.google import GeminiEmbedding
 from fastccg.vector_store.base import VectorStoreBase
 from fastccg.vector_store.in_memory import InMemoryVectorStore
+from fastccg.vector_store.hnsw import HNSWVectorStore
+from fastccg.vector_store.ivf import IVFVectorStore
+from fastccg.vector_store.quantized import QuantizedVectorStore
+from fastccg.vector_store.sharded import ShardedVectorStore
 from fastccg.rag import RAGModel
 
 
@@ -73,6 +81,7 @@ from fastccg.models.gemini import gemini_flash_1_5, gemini_pro_1_5
 from fastccg.models.claude import claude_3_sonnet
 from fastccg.models.mistral import mistral_tiny, mistral_small, mistral_medium
 from fastccg.models.mock import MockModel
+from fastccg.models.router import RouterModel
 from fastccg.embedding.openai import text_embedding_3_small
 from fastccg.embedding.mock import MockEmbedding
 
@@ -113,7 +122,14 @@ __all__ = [
     "GeminiEmbedding",
     "VectorStoreBase",
     "InMemoryVectorStore",
+    "HNSWVectorStore",
+    "IVFVectorStore",
+    "QuantizedVectorStore",
+    "ShardedVectorStore",
     "RAGModel",
+    "RouterModel",
+    "CompletionCache",
+    "SemanticCache",
     "ModelResponse",
     "ModelPrompt",
     "add_openai_key",
@@ -123,6 +139,8 @@ __all__ = [
     "add_mock_key",
     "init_model",
     "init_embedding",
+    "configure_http",
+    "configure_rate_limit",
     "load_model",
     "run_terminal",
 ]
\ No newline at end of file
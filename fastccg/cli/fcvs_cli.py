@@ -7,21 +7,31 @@ import typer
 from rich.console import Console
 from rich.table import Table
 
+from fastccg.vector_store.fcvs import is_binary_fcvs, read_fcvs, read_header, write_fcvs
+
 app = typer.Typer(
     help="A CLI tool for inspecting, validating, and converting .fcvs (FastCCG Vector Store) files."
 )
 console = Console()
 
 
-def _load_fcvs_file(filepath: Path) -> dict:
-    """Loads and performs basic validation on an .fcvs file."""
+def _check_fcvs_path(filepath: Path) -> None:
+    """Checks that an .fcvs file exists and warns about unexpected extensions."""
     if not filepath.exists():
         console.print(f"[bold red]Error:[/] File not found at '{filepath}'")
         raise typer.Exit(code=1)
     if filepath.suffix != ".fcvs":
         console.print(f"[bold yellow]Warning:[/] File does not have the '.fcvs' extension.")
 
+
+def _load_fcvs_file(filepath: Path) -> dict:
+    """Loads and performs basic validation on an .fcvs file in either layout."""
+    _check_fcvs_path(filepath)
+
     try:
+        if is_binary_fcvs(str(filepath)):
+            ids, vectors, _, metadata = read_fcvs(str(filepath), mmap=True)
+            return {doc_id: [vectors[row].tolist(), metadata[row]] for row, doc_id in enumerate(ids)}
         with open(filepath, "r") as f:
             data = json.load(f)
         if not isinstance(data, dict):
@@ -43,17 +53,38 @@ def inspect(
     Inspects an .fcvs file and displays metadata about its contents.
     """
     console.print(f"--- Inspecting [cyan]{filepath.name}[/cyan] ---")
-    data = _load_fcvs_file(filepath)
-
-    num_vectors = len(data)
-    file_size_bytes = os.path.getsize(filepath)
-    file_size_kb = file_size_bytes / 1024
+    _check_fcvs_path(filepath)
 
     table = Table(title="File Metadata")
     table.add_column("Metric", style="magenta")
     table.add_column("Value", style="green")
 
+    file_size_bytes = os.path.getsize(filepath)
+    file_size_kb = file_size_bytes / 1024
     table.add_row("File Size", f"{file_size_bytes:,} bytes (~{file_size_kb:.2f} KB)")
+
+    if is_binary_fcvs(str(filepath)):
+        # Binary files describe themselves in their header; no need to read the vectors.
+        try:
+            header = read_header(str(filepath))
+        except ValueError as e:
+            console.print(f"[bold red]Error:[/] {e}")
+            raise typer.Exit(code=1)
+        table.add_row("Format", f"binary (v{header.version})")
+        if header.quantization:
+            table.add_row("Quantization", f"{header.quantization} ({header.row_size} bytes per vector)")
+            table.add_row("Original Vectors Stored", str(bool(header.originals_offset)))
+        else:
+            table.add_row("Vector Type", header.dtype.name)
+        table.add_row("Number of Vectors", str(header.count))
+        table.add_row("Vector Dimensions", str(header.dimensions))
+        table.add_row("Metadata Present", str(header.metadata_size > 0))
+        console.print(table)
+        return
+
+    data = _load_fcvs_file(filepath)
+    num_vectors = len(data)
+    table.add_row("Format", "json (v1)")
     table.add_row("Number of Vectors", str(num_vectors))
 
     if num_vectors > 0:
@@ -68,6 +99,39 @@ def inspect(
     console.print(table)
 
 
+def _validate_binary(filepath: Path) -> None:
+    """Checks the header, block bounds and tables of a binary .fcvs file."""
+    try:
+        header = read_header(str(filepath))
+        file_size = os.path.getsize(filepath)
+        vector_end = header.vectors_offset + header.count * header.row_size * header.dtype.itemsize
+        blocks = [
+            ("vector", header.vectors_offset, vector_end),
+            ("norm", header.norms_offset, header.norms_offset + header.count * 4),
+            ("ID", header.ids_offset, header.ids_offset + header.ids_size),
+            ("metadata", header.metadata_offset, header.metadata_offset + header.metadata_size),
+        ]
+        if header.quantization:
+            blocks.append(("codebook", header.codebook_offset, header.codebook_offset + header.codebook_size))
+            if header.originals_offset:
+                originals_end = header.originals_offset + header.count * header.dimensions * 4
+                blocks.append(("original vector", header.originals_offset, originals_end))
+        for name, start, end in blocks:
+            if end > file_size:
+                raise ValueError(f"The {name} block ends at byte {end:,}, past the end of the file ({file_size:,} bytes).")
+
+        ids, _, _, metadata = read_fcvs(str(filepath), mmap=True)
+        if len(ids) != header.count or len(metadata) != header.count:
+            raise ValueError(f"Expected {header.count} IDs and metadata entries, found {len(ids)} and {len(metadata)}.")
+        if len(set(ids)) != len(ids):
+            raise ValueError("The ID table contains duplicate document IDs.")
+        if not all(isinstance(item, dict) for item in metadata):
+            raise ValueError("Invalid metadata. Expected a dictionary for every document.")
+    except (ValueError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(code=1)
+
+
 @app.command()
 def validate(
     filepath: Annotated[Path, typer.Argument(help="The path to the .fcvs file to validate.")]
@@ -76,6 +140,12 @@ def validate(
     Validates the structure and format of an .fcvs file.
     """
     console.print(f"--- Validating [cyan]{filepath.name}[/cyan] ---")
+    _check_fcvs_path(filepath)
+    if is_binary_fcvs(str(filepath)):
+        _validate_binary(filepath)
+        console.print("[bold green]Success:[/] File is a valid .fcvs file.")
+        return
+
     data = _load_fcvs_file(filepath)
 
     is_valid = True
@@ -102,20 +172,24 @@ def validate(
 @app.command()
 def convert(
     filepath: Annotated[Path, typer.Argument(help="The path to the .fcvs file to convert.")],
-    to: Annotated[str, typer.Option("--to", help="The format to convert to. Currently only 'json' is supported.")] = "json",
+    to: Annotated[str, typer.Option("--to", help="The format to convert to: 'json', or 'binary' for the compact .fcvs v2 layout.")] = "json",
+    dtype: Annotated[str, typer.Option("--dtype", help="The vector type for binary output: 'float32' or 'float16'.")] = "float32",
 ):
     """
-    Converts an .fcvs file to another format (e.g., json).
+    Converts an .fcvs file to another format (e.g., json or binary).
     """
-    if to.lower() != 'json':
-        console.print(f"[bold red]Error:[/] Conversion to '{to}' is not supported. Only 'json' is available.")
+    to = to.lower()
+    if to not in ("json", "binary"):
+        console.print(f"[bold red]Error:[/] Conversion to '{to}' is not supported. Use 'json' or 'binary'.")
         raise typer.Exit(code=1)
 
-    console.print(f"--- Converting [cyan]{filepath.name}[/cyan] to JSON ---")
-    # Since .fcvs is already a JSON file, this is mainly a copy/rename operation.
+    console.print(f"--- Converting [cyan]{filepath.name}[/cyan] to {to.upper() if to == 'json' else 'binary .fcvs'} ---")
     data = _load_fcvs_file(filepath)
-    
-    output_path = filepath.with_suffix('.json')
+
+    if to == "json":
+        output_path = filepath.with_suffix('.json')
+    else:
+        output_path = filepath.with_name(f"{filepath.stem}.v2.fcvs")
 
     if output_path.exists():
         overwrite = typer.confirm(f"File '{output_path}' already exists. Overwrite?")
@@ -123,11 +197,85 @@ def convert(
             console.print("Conversion cancelled.")
             raise typer.Exit()
 
-    with open(output_path, 'w') as f:
-        json.dump(data, f, indent=4)
-    
+    if to == "json":
+        with open(output_path, 'w') as f:
+            json.dump(data, f, indent=4)
+    else:
+        ids = list(data.keys())
+        vectors = [item[0] for item in data.values()]
+        metadata = [item[1] for item in data.values()]
+        try:
+            write_fcvs(str(output_path), ids, vectors, metadata, dtype=dtype)
+        except ValueError as e:
+            console.print(f"[bold red]Error:[/] {e}")
+            raise typer.Exit(code=1)
+
     console.print(f"[bold green]Success:[/] File converted and saved to '{output_path}'.")
 
 
+@app.command(name="build-ivf")
+def build_ivf(
+    filepath: Annotated[Path, typer.Argument(help="The path to the .fcvs file to index.")],
+    lists: Annotated[int, typer.Option("--lists", help="Number of k-means partitions. Defaults to sqrt(number of vectors).")] = 0,
+    nprobe: Annotated[int, typer.Option("--nprobe", help="Default number of partitions scanned per query.")] = 8,
+):
+    """
+    Builds an IVF (k-means partitioned) index for an .fcvs file.
+    """
+    from fastccg.vector_store.ivf import IVFVectorStore
+
+    console.print(f"--- Building IVF index for [cyan]{filepath.name}[/cyan] ---")
+    _check_fcvs_path(filepath)
+
+    try:
+        store = IVFVectorStore.build(str(filepath), n_lists=lists or None, nprobe=nprobe)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(code=1)
+    console.print(
+        f"[bold green]Success:[/] Indexed {len(store):,} vectors into {store.n_lists} lists. "
+        f"Index saved to '{filepath}.ivf'."
+    )
+
+
+@app.command()
+def quantize(
+    filepath: Annotated[Path, typer.Argument(help="The path to the .fcvs file to quantize.")],
+    method: Annotated[str, typer.Option("--method", help="'int8' for scalar quantization or 'pq' for product quantization.")] = "int8",
+    subvectors: Annotated[int, typer.Option("--subvectors", help="Bytes per vector for product quantization. Must divide the vector dimensions.")] = 8,
+    keep_vectors: Annotated[bool, typer.Option("--keep-vectors", help="Also store the original vectors for exact re-scoring.")] = False,
+):
+    """
+    Quantizes an .fcvs file into a compact binary file (<name>.<method>.fcvs).
+    """
+    from fastccg.vector_store.quantized import QuantizedVectorStore
+
+    console.print(f"--- Quantizing [cyan]{filepath.name}[/cyan] with {method} ---")
+    _check_fcvs_path(filepath)
+    output_path = filepath.with_name(f"{filepath.stem}.{method}.fcvs")
+
+    if output_path.exists():
+        overwrite = typer.confirm(f"File '{output_path}' already exists. Overwrite?")
+        if not overwrite:
+            console.print("Quantization cancelled.")
+            raise typer.Exit()
+
+    try:
+        store = QuantizedVectorStore(method=method, subvectors=subvectors, rescore=1 if keep_vectors else 0)
+        store.load(str(filepath))
+        store.train()
+        store.save(str(output_path))
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/] {e}")
+        raise typer.Exit(code=1)
+
+    original_size = os.path.getsize(filepath)
+    quantized_size = os.path.getsize(output_path)
+    console.print(
+        f"[bold green]Success:[/] Quantized {len(store):,} vectors to '{output_path}' "
+        f"({original_size:,} -> {quantized_size:,} bytes)."
+    )
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,204 @@
+"""
+An exact-match cache of model completions.
+
+A `CompletionCache` remembers the answer to every request it sees, keyed by
+the SHA-256 of the request as the model would send it: provider, model,
+system prompt, history, temperature and token limit, i.e. `_build_params()`.
+Only an identical request is served from the cache, so there is no risk of
+answering a different question, but also no hit for a reworded one.
+
+Entries live in a pluggable backend: `LRUCacheBackend` keeps them in process,
+bounded by entry count; `SQLiteCacheBackend` keeps them in a database file
+that survives restarts and can be shared between processes. Both expire
+entries after the cache's `ttl`.
+
+Sampled completions (temperature above 0, or the provider's default) differ
+from call to call, so they bypass the cache unless it is created with
+`force=True`.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Tuple
+
+from fastccg.types.response import ModelResponse
+
+if TYPE_CHECKING:
+    from fastccg.core.model_base import ModelBase
+
+
+@dataclass
+class CompletionCacheStats:
+    """Counters of a completion cache."""
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of cacheable requests served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CompletionCacheBackend(ABC):
+    """Where a `CompletionCache` stores its entries: JSON-serializable dicts with an optional expiry."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the entry stored under `key`, or None if there is none or it has expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any], expires_at: Optional[float] = None) -> None:
+        """Stores an entry, to expire at `expires_at` (a `time.time()` timestamp) or never."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Removes every entry."""
+
+
+class LRUCacheBackend(CompletionCacheBackend):
+    """An in-process backend that evicts the least recently used entries beyond `max_entries`."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend(CompletionCacheBackend):
+    """A persistent backend storing one JSON row per request in a SQLite database file."""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL) WITHOUT ROWID"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                with self._connection:
+                    self._connection.execute("DELETE FROM completions WHERE key = ?", (key,))
+                return None
+            return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: Optional[float] = None) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        """Deletes expired entries, which are otherwise only removed when looked up. Returns how many."""
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "DELETE FROM completions WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).rowcount
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM completions")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def request_key(model: "ModelBase") -> str:
+    """Returns the cache key of the request `model` would send next."""
+    request = {"provider": model.provider, "params": model._build_params()}
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def replay_chunks(text: str) -> Iterator[str]:
+    """Splits a cached completion into word-sized chunks, to replay it as a stream."""
+    return iter(re.findall(r"\s*\S+\s*|\s+", text))
+
+
+class CompletionCache:
+    """An exact-match cache of completions, shared by any number of models."""
+
+    def __init__(
+        self, backend: Optional[CompletionCacheBackend] = None, ttl: Optional[float] = None, force: bool = False
+    ):
+        """
+        Args:
+            backend: Where entries are stored. Defaults to an in-process `LRUCacheBackend`.
+            ttl: Seconds after which an entry expires, or None to keep entries until evicted.
+            force: If True, also cache sampled completions (temperature above 0 or unset).
+        """
+        self.backend = backend if backend is not None else LRUCacheBackend()
+        self.ttl = ttl
+        self.force = force
+        self.stats = CompletionCacheStats()
+
+    def key_for(self, model: "ModelBase") -> Optional[str]:
+        """Returns the key of the model's next request, or None if it bypasses the cache."""
+        if not self.force and model._temperature != 0:
+            self.stats.bypassed += 1
+            return None
+        return request_key(model)
+
+    def get(self, key: str) -> Optional[ModelResponse]:
+        """Returns the cached response for a key. A hit consumed no tokens, and has no raw provider response."""
+        value = self.backend.get(key)
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return ModelResponse(content=value["content"], tokens_used=0, provider=value.get("provider"))
+
+    def put(self, key: str, response: ModelResponse) -> None:
+        """Stores a response under a key."""
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        value = {"content": response.content, "tokens_used": response.tokens_used, "provider": response.provider}
+        self.backend.set(key, value, expires_at)
+
+    def clear(self) -> None:
+        """Removes every entry from the backend."""
+        self.backend.clear()
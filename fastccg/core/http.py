@@ -0,0 +1,131 @@
+"""
+A process-wide registry of provider SDK clients and their HTTP connection pools.
+
+Every model and embedding instance gets its SDK client from `get_client`,
+which returns the one client already built for the same provider and API key.
+Instances therefore share a single `httpx.AsyncClient` connection pool per
+(provider, key) instead of each opening their own, so creating a model per
+conversation costs no new connections or TLS handshakes.
+
+A connection pool belongs to the event loop it was first used on, so clients
+are also keyed by the running loop: the synchronous API's background loop and
+each `asyncio.run` loop get their own. Clients of loops that have since
+closed are dropped.
+
+The pool limits, keepalive and HTTP/2 settings of clients built from then on
+are set with `configure_http`.
+"""
+import asyncio
+import importlib.util
+import threading
+from dataclasses import dataclass, fields, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from fastccg.core.rate_limit import get_rate_limiter
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class HTTPSettings:
+    """Connection pool settings of the shared HTTP clients."""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    timeout: float = 600.0
+
+
+_lock = threading.Lock()
+_settings = HTTPSettings()
+_clients: Dict[Tuple[str, str, Optional[asyncio.AbstractEventLoop]], Any] = {}
+
+
+def configure_http(**settings: Any) -> HTTPSettings:
+    """
+    Changes the settings of the shared HTTP clients.
+
+    Clients built before the call keep their pools; models created afterwards
+    get new clients with the new settings.
+
+    Args:
+        **settings: Any of the `HTTPSettings` fields, e.g. `max_connections=200, http2=False`.
+
+    Returns:
+        The settings now in effect.
+    """
+    global _settings
+    unknown = set(settings) - {f.name for f in fields(HTTPSettings)}
+    if unknown:
+        raise ValueError(f"Unknown HTTP settings: {sorted(unknown)}.")
+    with _lock:
+        _settings = replace(_settings, **settings)
+        _clients.clear()
+        return _settings
+
+
+def http_settings() -> HTTPSettings:
+    """Returns the settings used for new HTTP clients."""
+    return _settings
+
+
+def new_http_client(event_hooks: Optional[Dict[str, List[Callable]]] = None) -> httpx.AsyncClient:
+    """Builds an `httpx.AsyncClient` with the current pool settings."""
+    settings = _settings
+    return httpx.AsyncClient(
+        # HTTP/2 needs the `h2` package (the `httpx[http2]` extra); fall back to HTTP/1.1 without it.
+        http2=settings.http2 and importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=settings.timeout,
+        follow_redirects=True,
+        event_hooks=event_hooks,
+    )
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_client(provider: str, api_key: str, factory: Callable[[httpx.AsyncClient], T]) -> T:
+    """
+    Returns the shared SDK client of a provider and API key on the running event loop, building it on first use.
+
+    Call it for each request rather than keeping the client, so a model used
+    from several event loops never sends on another loop's connection pool.
+
+    The client's responses feed their rate-limit headers to the provider's `RateLimiter`.
+
+    Args:
+        provider: The provider name, e.g. "openai".
+        api_key: The API key the client authenticates with.
+        factory: Builds the SDK client around the `httpx.AsyncClient` it is given.
+    """
+    key = (provider, api_key, _running_loop())
+    limiter = get_rate_limiter(provider, api_key)
+
+    async def track_rate_limits(response: httpx.Response) -> None:
+        limiter.update_from_headers(response.headers)
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            # Drop the clients of loops that have since closed; their pools can no longer be used.
+            for stale in [k for k in _clients if k[2] is not None and k[2].is_closed()]:
+                del _clients[stale]
+            client = _clients[key] = factory(new_http_client({"response": [track_rate_limits]}))
+        return client
+
+
+def clear_clients() -> None:
+    """Forgets all shared clients, so the next models build new ones. Existing instances keep theirs."""
+    with _lock:
+        _clients.clear()
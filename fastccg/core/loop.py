@@ -0,0 +1,66 @@
+"""
+A process-wide background event loop for the synchronous API.
+
+`asyncio.run` creates and closes an event loop on every call, which throws
+away the async SDK clients' connection pools. Instead, synchronous wrappers
+submit their coroutine to one long-lived loop running in a daemon thread,
+shared by every model and embedding instance, and block until it finishes.
+Because the coroutine runs on its own thread, this also works when the
+caller is itself running inside an event loop (e.g. a notebook), which
+`asyncio.run` refuses.
+"""
+import asyncio
+import atexit
+import os
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_pid: Optional[int] = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Returns the shared background loop, starting its thread on first use (and again after a fork)."""
+    global _loop, _thread, _pid
+    with _lock:
+        if _loop is None or _thread is None or _pid != os.getpid() or not _thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="fastccg-event-loop", daemon=True)
+            _thread.start()
+            _pid = os.getpid()
+        return _loop
+
+
+def run_sync(coroutine: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """
+    Runs a coroutine on the shared background loop and waits for its result.
+
+    Args:
+        coroutine: The coroutine to run.
+        timeout: Seconds to wait before cancelling it and raising `concurrent.futures.TimeoutError`.
+
+    Raises:
+        RuntimeError: If called from a coroutine running on the background loop
+            itself, which would deadlock; await the coroutine there instead.
+    """
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        coroutine.close()
+        raise RuntimeError("run_sync() cannot be called from the fastccg background loop; await the coroutine instead.")
+    future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        # Covers timeouts and KeyboardInterrupt: don't leave the call running unobserved.
+        future.cancel()
+        raise
+
+
+@atexit.register
+def _shutdown() -> None:
+    if _loop is not None and _pid == os.getpid() and _loop.is_running():
+        _loop.call_soon_threadsafe(_loop.stop)
@@ -1,26 +1,44 @@
-import asyncio
 import json
 from abc import ABC, abstractmethod
-from typing import Any, AsyncGenerator, Callable, List, Optional, Type
-
-from fastccg.memory import MemoryManager
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, List, Optional, Tuple, Type
+
+from fastccg.core.completion_cache import CompletionCache, replay_chunks
+from fastccg.core.loop import run_sync
+from fastccg.core.rate_limit import get_rate_limiter
+from fastccg.core.retry import RetryPolicy
+from fastccg.core.semantic_cache import SemanticCache, scope_key
+from fastccg.errors import RateLimited
+from fastccg.memory import HistoryPolicy, MemoryManager
 from fastccg.types.prompt import ModelPrompt
 from fastccg.types.response import ModelResponse
+from fastccg.utils.tokens import estimate_tokens
+
+
+async def _prepend(first: ModelResponse, rest: AsyncIterator[ModelResponse]) -> AsyncGenerator[ModelResponse, None]:
+    yield first
+    async for item in rest:
+        yield item
 
 
 class ModelBase(ABC):
     """Abstract base class for all models."""
 
     provider: str = "unknown"
+    #: How failed requests are retried. Assign a new `RetryPolicy` to change it per model.
+    retry_policy: RetryPolicy = RetryPolicy()
 
-    def __init__(self, api_key: str, model_name: str):
+    def __init__(self, api_key: Optional[str], model_name: str):
         self.api_key = api_key
         self.model_name = model_name
+        # Shared by every model and embedder of this provider and key.
+        self.rate_limiter = get_rate_limiter(self.provider, api_key)
         self.memory = MemoryManager()
         self._sys_prompt: Optional[ModelPrompt] = None
         self._reply_filter: Optional[Callable[[str], str]] = None
         self._temperature: Optional[float] = None
         self._max_tokens: Optional[int] = None
+        self.completion_cache: Optional[CompletionCache] = None
+        self.semantic_cache: Optional[SemanticCache] = None
 
     # --- Abstract Methods for Subclasses --- #
 
@@ -48,35 +66,138 @@ class ModelBase(ABC):
 
     def ask(self, prompt: str) -> ModelResponse:
         """Send a message and get a blocking response."""
-        return asyncio.run(self.ask_async(prompt))
+        return run_sync(self.ask_async(prompt))
 
     async def ask_async(self, prompt: str) -> ModelResponse:
         """Send a message and get an async response."""
         user_prompt = self.append_prompt(prompt)
-        response = await self._ask_async(prompt)
+        response, remember = await self._lookup_caches(prompt)
+        if response is None:
+            response = await self._request(prompt)
+            remember(response)
 
         if self._reply_filter:
             response.content = self._reply_filter(response.content)
 
         assistant_prompt = self.append_response(response.content)
         self.memory.save_turn(user_prompt, assistant_prompt)
+        self.memory.maybe_compact()
         return response
 
     async def ask_stream(
         self, prompt: str
     ) -> AsyncGenerator[ModelResponse, None]:
-        """Stream the model's response chunk by chunk."""
+        """
+        Stream the model's response chunk by chunk.
+
+        Failures are retried only until the first chunk arrives; after that they
+        are raised, since the chunks already yielded cannot be taken back.
+        """
         user_prompt = self.append_prompt(prompt)
         full_response = ""
 
-        async for response in self._ask_stream(prompt):
-            if self._reply_filter:
-                response.content = self._reply_filter(response.content)
-            full_response += response.content
-            yield response
+        cached, remember = await self._lookup_caches(prompt)
+        if cached is not None:
+            for text in replay_chunks(cached.content):
+                chunk = ModelResponse(content=text, provider=cached.provider)
+                if self._reply_filter:
+                    chunk.content = self._reply_filter(chunk.content)
+                full_response += chunk.content
+                yield chunk
+        else:
+            raw_text = ""
+            tokens = self._estimate_request_tokens()
+            stream, first = await self.retry_policy.run(lambda: self._start_stream(prompt, tokens))
+            if first is not None:
+                async for response in _prepend(first, stream):
+                    raw_text += response.content
+                    if self._reply_filter:
+                        response.content = self._reply_filter(response.content)
+                    full_response += response.content
+                    yield response
+            self.rate_limiter.on_success()
+            remember(ModelResponse(content=raw_text, provider=self.provider))
 
         assistant_prompt = self.append_response(full_response)
         self.memory.save_turn(user_prompt, assistant_prompt)
+        self.memory.maybe_compact()
+
+    async def _lookup_caches(
+        self, prompt: str
+    ) -> Tuple[Optional[ModelResponse], Callable[[ModelResponse], None]]:
+        """
+        Looks the pending request up in the completion cache, then the semantic cache.
+
+        Returns:
+            The cached response, or None, and a function that stores a fresh
+            response in the caches that missed.
+        """
+        stores: List[Callable[[ModelResponse], None]] = []
+        cache = self.completion_cache
+        key = cache.key_for(self) if cache is not None else None
+        if cache is not None and key:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached, lambda response: None
+            stores.append(lambda response: cache.put(key, response))
+
+        semantic = self.semantic_cache
+        # A cached answer ignores earlier turns, so only a conversation's first question is looked up.
+        if semantic is not None and len(self.memory.history) == 1:
+            scope = scope_key(self.provider, self.model_name, self._sys_prompt and self._sys_prompt.content,
+                              self._temperature, self._max_tokens)
+            vector = await semantic.embed(prompt)
+            cached = semantic.get(vector, scope)
+            if cached is not None:
+                return cached, lambda response: None
+            stores.append(lambda response: semantic.put(vector, prompt, response.content, scope, response.provider))
+
+        def remember(response: ModelResponse) -> None:
+            for store in stores:
+                store(response)
+
+        return None, remember
+
+    async def _request(self, prompt: str, retry_policy: Optional[RetryPolicy] = None) -> ModelResponse:
+        """Sends the conversation, ending in `prompt`, within the rate limit and retrying per `retry_policy`."""
+        tokens = self._estimate_request_tokens()
+        return await (retry_policy or self.retry_policy).run(
+            lambda: self.rate_limiter.run(lambda: self._ask_async(prompt), tokens=tokens, retries=0)
+        )
+
+    async def _start_stream(
+        self, prompt: str, tokens: int
+    ) -> Tuple[AsyncGenerator[ModelResponse, None], Optional[ModelResponse]]:
+        """Opens a provider stream within the rate limit and waits for its first chunk (None if it is empty)."""
+        await self.rate_limiter.acquire(tokens)
+        stream = self._ask_stream(prompt)
+        try:
+            return stream, await stream.__anext__()
+        except StopAsyncIteration:
+            return stream, None
+        except BaseException as error:
+            await stream.aclose()
+            if isinstance(error, RateLimited):
+                self.rate_limiter.on_rate_limited(error.retry_after)
+            raise
+
+    def _build_params(self) -> dict:
+        """
+        Returns the request the model would send next. Providers override this
+        with their SDK's parameters; it also serves as the completion cache key.
+        """
+        messages = [{"role": p.role, "content": p.content} for p in self.memory.history]
+        return {
+            "model": self.model_name,
+            "system": self._sys_prompt.content if self._sys_prompt else None,
+            "messages": messages,
+            "temperature": self._temperature,
+            "max_tokens": self._max_tokens,
+        }
+
+    def _estimate_request_tokens(self) -> int:
+        """Estimates the tokens a request counts against rate limits: the prompt and history, plus the reply budget."""
+        return self.memory.tokens + (self._max_tokens or 0)
 
     # --- Configuration Methods --- #
 
@@ -105,6 +226,7 @@ class ModelBase(ABC):
     def sys_prompt(self, msg: str) -> "ModelBase":
         """Set the system-level behavior prompt."""
         self._sys_prompt = ModelPrompt(role="system", content=msg)
+        self.memory.set_system_prompt(self._sys_prompt)
         return self
 
     def reply_filter(self, fn: Callable[[str], str]) -> "ModelBase":
@@ -122,6 +244,76 @@ class ModelBase(ABC):
         self._max_tokens = n
         return self
 
+    def history_window(
+        self,
+        max_turns: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ) -> "ModelBase":
+        """
+        Bound the conversation history sent with each request.
+
+        The oldest turns are dropped once there are more than `max_turns`, or
+        once the history and system prompt exceed `max_tokens`. The latest turn
+        and the system prompt are always kept. Call without arguments to lift
+        the bounds.
+
+        Args:
+            max_turns: The most user turns, with their replies, to keep.
+            max_tokens: The token budget of the history and the system prompt.
+            token_counter: Counts the tokens of a text. Defaults to a character-based estimate.
+        """
+        self.memory.set_policy(HistoryPolicy(
+            max_turns=max_turns, max_tokens=max_tokens, token_counter=token_counter or estimate_tokens
+        ))
+        return self
+
+    def compact_history(
+        self, summarizer: "ModelBase", threshold_tokens: int, keep_turns: int = 4
+    ) -> "ModelBase":
+        """
+        Summarize older turns in the background once the history grows too long.
+
+        After a reply, if the history and system prompt exceed `threshold_tokens`,
+        all but the latest `keep_turns` turns are summarized by `summarizer` into
+        one pinned system message, without delaying the reply.
+
+        Args:
+            summarizer: The model writing the summaries, e.g. a cheaper one. Use a
+                separate instance; it may be shared by many conversations.
+            threshold_tokens: The token count above which the history is compacted.
+            keep_turns: The latest turns kept verbatim.
+        """
+        if summarizer is self:
+            raise ValueError("A model cannot summarize its own history; pass a separate model instance.")
+        self.memory.enable_compaction(summarizer, threshold_tokens, keep_turns=keep_turns)
+        return self
+
+    def cache_responses(self, cache: Optional[CompletionCache] = None) -> "ModelBase":
+        """
+        Serve repeated identical requests from a completion cache.
+
+        Args:
+            cache: The cache to use, which may be shared with other models.
+                Defaults to a new in-memory cache. Set `completion_cache` to
+                None to stop caching.
+        """
+        self.completion_cache = cache if cache is not None else CompletionCache()
+        return self
+
+    def cache_similar_responses(self, cache: SemanticCache) -> "ModelBase":
+        """
+        Answer questions similar to ones answered before from a semantic cache.
+
+        Only the first question of a conversation is looked up, since a cached
+        answer ignores earlier turns. Set `semantic_cache` to None to stop.
+
+        Args:
+            cache: The cache to use, which may be shared with other models.
+        """
+        self.semantic_cache = cache
+        return self
+
     # --- History and State Management --- #
 
     def append_prompt(self, msg: str) -> ModelPrompt:
@@ -138,6 +330,7 @@ class ModelBase(ABC):
         """Reset conversation history and all configurations."""
         self.memory.clear()
         self._sys_prompt = None
+        self.memory.set_system_prompt(None)
         self._reply_filter = None
         self._temperature = None
         self._max_tokens = None
@@ -180,6 +373,7 @@ class ModelBase(ABC):
         ]
         if state.get("sys_prompt"):
             instance._sys_prompt = ModelPrompt.from_dict(state["sys_prompt"])
+            instance.memory.set_system_prompt(instance._sys_prompt)
         instance._temperature = state.get("temperature")
         instance._max_tokens = state.get("max_tokens")
 
@@ -0,0 +1,293 @@
+"""
+Client-side rate limiting of provider requests.
+
+Every (provider, API key) pair has one `RateLimiter`, shared by all model and
+embedding instances using it. A limiter holds two token buckets, one for
+requests per minute and one for (estimated) tokens per minute, and makes
+callers wait, first come first served, until both have budget for their
+request.
+
+Budgets come from `configure_rate_limit` and adapt at runtime:
+
+- A 429 response halves the current rates (at most once per second, so a
+  burst of concurrent failures counts once) and pauses all callers for the
+  provider's `Retry-After` time. Each successful request then raises the rates
+  again, by 2% of the configured limit, until they are back at it.
+- Rate-limit response headers (`x-ratelimit-*`, `anthropic-ratelimit-*`) lower
+  a bucket to the budget the provider reports as remaining, and set the limit
+  of a bucket that was not configured.
+
+A bucket with no configured limit lets requests through until the first 429,
+then limits to half the rate observed over the last minute. Until it has seen
+enough requests to estimate that rate, a 429 only pauses callers.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Mapping, Optional, Tuple, TypeVar
+
+from fastccg.errors import RateLimited
+
+T = TypeVar("T")
+
+# Header names carrying (limit, remaining) budgets, per bucket.
+_REQUEST_HEADERS = (
+    ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests"),
+    ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining"),
+)
+_TOKEN_HEADERS = (
+    ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens"),
+    ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining"),
+)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Returns the delay in seconds requested by `retry-after-ms` or `retry-after` headers, if any."""
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue  # An HTTP date; rare enough to fall back to backing off.
+    return None
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class _Bucket:
+    """A token bucket refilled at `per_minute / 60` per second and holding at most one minute's budget."""
+
+    def __init__(self, limit: Optional[float]):
+        self.limit = limit
+        self.per_minute = limit
+        self.level = limit or 0.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if self.per_minute is not None:
+            self.level = min(self.per_minute, self.level + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available. Requests above the whole budget wait for a full bucket."""
+        if self.per_minute is None:
+            return 0.0
+        deficit = min(amount, self.per_minute) - self.level
+        return max(0.0, deficit * 60.0 / self.per_minute)
+
+    def take(self, amount: float) -> None:
+        if self.per_minute is not None:
+            self.level -= min(amount, self.per_minute)
+
+    def set_rate(self, per_minute: float) -> None:
+        self.per_minute = per_minute
+        self.level = min(self.level, per_minute)
+
+
+@dataclass
+class RateLimiterStats:
+    """Counters of a rate limiter."""
+    requests: int = 0
+    delayed: int = 0
+    seconds_waited: float = 0.0
+    rate_limited: int = 0
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budgets for one provider and API key."""
+
+    #: The factor applied to the rates after a 429.
+    backoff_factor: float = 0.5
+    #: The fraction of the configured limit restored by each successful request.
+    recovery: float = 0.02
+    #: Seconds during which further 429s don't lower the rates again.
+    backoff_cooldown: float = 1.0
+    #: The lowest rate a bucket backs off to, per minute.
+    min_per_minute: float = 1.0
+    #: The requests an unlimited bucket must have seen in the last minute to learn a rate from a 429.
+    min_samples: int = 10
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._last_backoff = -math.inf
+        # (start time, tokens) of the requests sent during the last minute.
+        self._recent: Deque[Tuple[float, float]] = deque()
+        # Guards the state, which sync and async callers may touch from different threads.
+        self._state_lock = threading.Lock()
+        # Queues callers in arrival order; asyncio locks belong to one loop, hence one per loop.
+        self._queues: Dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+        self.stats = RateLimiterStats()
+
+    @property
+    def requests_per_minute(self) -> Optional[float]:
+        """The current, possibly backed-off, request rate, or None if unlimited."""
+        return self._requests.per_minute
+
+    @property
+    def tokens_per_minute(self) -> Optional[float]:
+        """The current, possibly backed-off, token rate, or None if unlimited."""
+        return self._tokens.per_minute
+
+    def configure(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None) -> None:
+        """Sets the limits, and resets the current rates to them."""
+        with self._state_lock:
+            self._requests = _Bucket(requests_per_minute)
+            self._tokens = _Bucket(tokens_per_minute)
+
+    def _queue(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            queue = self._queues.get(loop)
+            if queue is None:
+                # Drop the queues of loops that have since closed.
+                self._queues = {other: lock for other, lock in self._queues.items() if not other.is_closed()}
+                queue = self._queues[loop] = asyncio.Lock()
+            return queue
+
+    async def acquire(self, tokens: float = 0) -> None:
+        """Waits, behind earlier callers, until one request of `tokens` tokens fits in the budgets."""
+        async with self._queue():
+            delayed = False
+            while True:
+                with self._state_lock:
+                    now = time.monotonic()
+                    self._requests.refill(now)
+                    self._tokens.refill(now)
+                    wait = max(self._paused_until - now, self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                    if wait <= 0:
+                        self._requests.take(1)
+                        self._tokens.take(tokens)
+                        self._recent.append((now, tokens))
+                        while self._recent and self._recent[0][0] < now - 60.0:
+                            self._recent.popleft()
+                        self.stats.requests += 1
+                        self.stats.delayed += delayed
+                        return
+                delayed = True
+                self.stats.seconds_waited += wait
+                await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        """Raises backed-off rates a step back toward their limits."""
+        with self._state_lock:
+            for bucket in (self._requests, self._tokens):
+                if bucket.per_minute is None:
+                    continue
+                if bucket.limit is None:
+                    bucket.per_minute *= 1.0 + self.recovery
+                elif bucket.per_minute < bucket.limit:
+                    bucket.per_minute = min(bucket.limit, bucket.per_minute + bucket.limit * self.recovery)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> None:
+        """Backs off after a 429: pauses for `retry_after` seconds and lowers the rates."""
+        with self._state_lock:
+            now = time.monotonic()
+            self.stats.rate_limited += 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if now - self._last_backoff < self.backoff_cooldown:
+                return
+            self._last_backoff = now
+
+            recent = [(start, tokens) for start, tokens in self._recent if start >= now - 60.0]
+            # Too few requests say nothing about the rate the provider tolerates.
+            window = max(now - recent[0][0], 1.0) if len(recent) >= self.min_samples else None
+            backed_off = False
+            for bucket, total in ((self._requests, len(recent)), (self._tokens, sum(tokens for _, tokens in recent))):
+                current = bucket.per_minute
+                if current is None and window is not None:
+                    current = total * 60.0 / window
+                if current:
+                    bucket.set_rate(max(self.min_per_minute, current * self.backoff_factor))
+                    bucket.level = 0.0
+                    backed_off = True
+            if not backed_off and not retry_after:
+                self._paused_until = max(self._paused_until, now + self.backoff_cooldown)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Aligns the buckets with the limits and remaining budgets reported by the provider."""
+        with self._state_lock:
+            now = time.monotonic()
+            for bucket, names in ((self._requests, _REQUEST_HEADERS), (self._tokens, _TOKEN_HEADERS)):
+                for limit_name, remaining_name in names:
+                    limit = _header_number(headers, limit_name)
+                    remaining = _header_number(headers, remaining_name)
+                    if limit is None and remaining is None:
+                        continue
+                    bucket.refill(now)
+                    if limit is not None and bucket.limit is None:
+                        bucket.limit = limit
+                        if bucket.per_minute is None:
+                            bucket.per_minute = bucket.level = limit
+                    if remaining is not None and bucket.per_minute is not None:
+                        bucket.level = min(bucket.level, remaining)
+                    break
+
+    async def run(self, call: Callable[[], Awaitable[T]], tokens: float = 0, retries: int = 3) -> T:
+        """
+        Runs a provider call within the budgets, backing off and retrying it after 429s.
+
+        Args:
+            call: Makes the request. It should raise `RateLimited` on a 429.
+            tokens: The estimated tokens the request consumes.
+            retries: How many times a rate-limited call is queued again before `RateLimited` is raised.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            try:
+                result = await call()
+            except RateLimited as error:
+                self.on_rate_limited(error.retry_after)
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                continue
+            self.on_success()
+            return result
+
+
+_registry_lock = threading.Lock()
+_limits: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+_limiters: Dict[Tuple[str, Any], RateLimiter] = {}
+
+
+def configure_rate_limit(
+    provider: str, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None
+) -> None:
+    """
+    Sets the per-key request and token budgets of a provider, e.g. to the quotas of your account tier.
+
+    Applies to every API key of the provider, including limiters already in use.
+    Pass no budgets to go back to adapting from 429s and response headers only.
+    """
+    with _registry_lock:
+        _limits[provider] = (requests_per_minute, tokens_per_minute)
+        for (limiter_provider, _), limiter in _limiters.items():
+            if limiter_provider == provider:
+                limiter.configure(requests_per_minute, tokens_per_minute)
+
+
+def get_rate_limiter(provider: str, api_key: Any) -> RateLimiter:
+    """Returns the shared rate limiter of a provider and API key."""
+    key = (provider, api_key)
+    with _registry_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(*_limits.get(provider, (None, None)))
+        return limiter
@@ -0,0 +1,91 @@
+"""
+Retrying provider calls with exponential backoff, jitter and a deadline.
+
+A `RetryPolicy` resends a request when it fails with an error that
+`fastccg.errors.is_retryable` classifies as transient. Before attempt n+1 it
+sleeps a random time between 0 and `base_delay * 2**n` seconds, capped at
+`max_delay` ("full jitter", so that clients failing together don't retry in
+lockstep), or longer if a rate limit asked for a longer `Retry-After` wait.
+
+A `deadline` bounds the whole request, including queueing behind rate
+limits, every attempt and every backoff: an attempt still running when it
+passes is cancelled, and no retry is started that could not finish in time.
+Either way the caller gets `DeadlineExceeded`, or the last error if there was
+no time left to retry it.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from fastccg.errors import DeadlineExceeded, RateLimited, is_retryable
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often, and how patiently, failed provider calls are sent again."""
+    #: Attempts per request, including the first. 1 disables retries.
+    max_attempts: int = 4
+    #: The backoff ceiling of the first retry, in seconds. It doubles with every retry.
+    base_delay: float = 0.5
+    #: The longest backoff between two attempts, in seconds.
+    max_delay: float = 20.0
+    #: The time budget of the whole request in seconds, or None for no limit.
+    deadline: Optional[float] = None
+    #: Whether rate-limited requests are retried, rather than raised at once, e.g. to fail over elsewhere.
+    retry_rate_limits: bool = True
+
+    def next_delay(self, attempt: int, error: BaseException, started: float) -> Optional[float]:
+        """
+        Decides whether to retry after a failed attempt.
+
+        Args:
+            attempt: The number of the failed attempt, from 0.
+            error: The error it raised.
+            started: When the request started, on the `time.monotonic()` clock.
+
+        Returns:
+            The seconds to wait before the next attempt, or None to give up.
+        """
+        if attempt + 1 >= self.max_attempts or not is_retryable(error):
+            return None
+        if isinstance(error, RateLimited) and not self.retry_rate_limits:
+            return None
+        delay = random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            delay = max(delay, retry_after)
+        if self.deadline is not None and time.monotonic() - started + delay >= self.deadline:
+            return None
+        return delay
+
+    async def run(self, call: Callable[[], Awaitable[T]]) -> T:
+        """Runs `call()`, retrying it per this policy."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(call, started)
+            except Exception as error:
+                delay = self.next_delay(attempt, error, started)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _attempt(self, call: Callable[[], Awaitable[T]], started: float) -> T:
+        if self.deadline is None:
+            return await call()
+        remaining = self.deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            raise DeadlineExceeded(self.deadline)
+        try:
+            return await asyncio.wait_for(call(), remaining)
+        except asyncio.TimeoutError:
+            # Tell our own timeout apart from a timeout raised inside the call.
+            if time.monotonic() - started < self.deadline:
+                raise
+            raise DeadlineExceeded(self.deadline) from None
@@ -0,0 +1,175 @@
+"""
+A semantic cache of model answers.
+
+Where `CompletionCache` only answers a request it has seen byte for byte, a
+`SemanticCache` also answers paraphrases: it embeds each question, searches a
+dedicated vector store for the most similar cached question, and returns the
+stored answer if their cosine similarity reaches `threshold`. A hit skips the
+whole request path, including retrieval for a `RAGModel`.
+
+Entries are scoped: a question only matches questions asked of the same model
+with the same settings (or, for a `RAGModel`, the same template and filter),
+so answers never leak between differently configured models sharing a cache.
+The cache keeps at most `max_entries` entries, evicting the least recently
+used, and drops entries older than `ttl` when it comes across them.
+
+Since a cached answer ignores what was said before the question, plain models
+only consult the cache for the first question of a conversation.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, List, Optional
+
+from fastccg.types.response import ModelResponse
+from fastccg.vector_store.base import VectorStoreBase
+from fastccg.vector_store.in_memory import InMemoryVectorStore
+
+if TYPE_CHECKING:
+    from fastccg.embedding.base import EmbeddingBase
+
+
+@dataclass
+class SemanticCacheStats:
+    """Counters of a semantic cache."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class SemanticCacheEntry:
+    """One cached answer, with the question it was given for and how often it was reused."""
+    question: str
+    answer: str
+    scope: str
+    created: float
+    provider: Optional[str] = None
+    hits: int = 0
+
+
+def scope_key(*parts: Any) -> str:
+    """Hashes what an answer depends on besides the question into a scope."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """Answers questions similar enough to ones answered before, shared by any number of models."""
+
+    #: How many nearest questions are checked per lookup, so expired entries don't hide live ones.
+    candidates: int = 3
+
+    def __init__(
+        self,
+        embedder: "EmbeddingBase",
+        store: Optional[VectorStoreBase] = None,
+        threshold: float = 0.92,
+        max_entries: int = 10_000,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Args:
+            embedder: The embedding model questions are compared with.
+            store: The vector store holding the cached questions. It must support
+                `delete` and metadata filters, and should not be shared with
+                documents. Defaults to a new `InMemoryVectorStore`.
+            threshold: The cosine similarity from which a cached question counts as the same question.
+            max_entries: The most answers kept; the least recently used are evicted beyond it.
+            ttl: Seconds after which an answer expires, or None to keep answers until evicted.
+        """
+        self.embedder = embedder
+        self.store = store if store is not None else InMemoryVectorStore()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = SemanticCacheStats()
+        # Entry ids (also the store's doc ids), least recently used first.
+        self._entries: "OrderedDict[str, SemanticCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def entries(self) -> List[SemanticCacheEntry]:
+        """Returns the cached entries, least recently used first."""
+        with self._lock:
+            return list(self._entries.values())
+
+    async def embed(self, question: str) -> List[float]:
+        """Embeds a question with the cache's embedder."""
+        return (await self.embedder.embed(question))[0]
+
+    def get(self, vector: List[float], scope: str) -> Optional[ModelResponse]:
+        """
+        Looks up the answer to the most similar cached question in a scope.
+
+        Args:
+            vector: The embedding of the question, from `embed`.
+            scope: The scope of the asking model, from `scope_key`.
+
+        Returns:
+            The cached answer, with no tokens used and no raw provider response, or None.
+        """
+        with self._lock:
+            if self._entries:
+                results = self.store.similarity_search(vector, top_k=self.candidates, filter={"scope": scope})
+                for doc_id, score, _ in results:
+                    if score < self.threshold:
+                        break
+                    entry = self._entries.get(doc_id)
+                    if entry is None:
+                        continue
+                    if self._expired(entry):
+                        self._evict(doc_id)
+                        continue
+                    entry.hits += 1
+                    self._entries.move_to_end(doc_id)
+                    self.stats.hits += 1
+                    return ModelResponse(content=entry.answer, tokens_used=0, provider=entry.provider)
+            self.stats.misses += 1
+            return None
+
+    def put(self, vector: List[float], question: str, answer: str, scope: str, provider: Optional[str] = None) -> None:
+        """Caches the answer to a question, evicting the least recently used entries beyond `max_entries`."""
+        doc_id = uuid.uuid4().hex
+        with self._lock:
+            self.store.add(doc_id, vector, {"scope": scope, "question": question})
+            self._entries[doc_id] = SemanticCacheEntry(
+                question=question, answer=answer, scope=scope, created=time.time(), provider=provider
+            )
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def purge_expired(self) -> int:
+        """Evicts every expired entry, which are otherwise only evicted when looked up. Returns how many."""
+        with self._lock:
+            expired = [doc_id for doc_id, entry in self._entries.items() if self._expired(entry)]
+            for doc_id in expired:
+                self._evict(doc_id)
+            return len(expired)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock:
+            for doc_id in self._entries:
+                self.store.delete(doc_id)
+            self._entries.clear()
+
+    def _expired(self, entry: SemanticCacheEntry) -> bool:
+        return self.ttl is not None and time.time() - entry.created >= self.ttl
+
+    def _evict(self, doc_id: str) -> None:
+        del self._entries[doc_id]
+        self.store.delete(doc_id)
+        self.stats.evictions += 1
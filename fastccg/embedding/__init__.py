@@ -4,5 +4,6 @@ from .base import EmbeddingBase
 from .openai import text_embedding_3_small
 from .mock import MockEmbedding
 from .google import GeminiEmbedding
+from .cache import CachedEmbedding, EmbeddingCacheStats
 
-__all__ = ["EmbeddingBase", "text_embedding_3_small", "MockEmbedding", "GeminiEmbedding"]
+__all__ = ["EmbeddingBase", "text_embedding_3_small", "MockEmbedding", "GeminiEmbedding", "CachedEmbedding", "EmbeddingCacheStats"]
@@ -1,12 +1,36 @@
 from abc import ABC, abstractmethod
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 import asyncio
 
+from fastccg.core.loop import run_sync
+from fastccg.core.rate_limit import get_rate_limiter
+from fastccg.core.retry import RetryPolicy
+from fastccg.utils.singleflight import SingleFlight
+from fastccg.utils.tokens import estimate_tokens
+
+
 class EmbeddingBase(ABC):
-    """Abstract base class for all embedding models."""
+    """Abstract base class for all embedding models.
+
+    Subclasses implement `_embed`, which sends one request. The public `embed`
+    splits its input into batches that fit the provider's per-request limits,
+    sends up to `max_concurrency` of them at once and returns the vectors in
+    input order. Concurrent requests for an identical batch share one request.
+    """
 
     provider: str = "unknown"
 
+    #: The most texts the provider accepts in one request.
+    max_batch_items: int = 256
+    #: The most (estimated) tokens the provider accepts in one request, or None for no limit.
+    max_batch_tokens: Optional[int] = None
+    #: The most requests this instance keeps in flight, across all concurrent `embed` calls.
+    max_concurrency: int = 4
+    #: If True, concurrent requests for an identical batch of texts are sent once.
+    coalesce_requests: bool = True
+    #: How failed requests are retried. Assign a new `RetryPolicy` to change it per instance.
+    retry_policy: RetryPolicy = RetryPolicy()
+
     def __init__(self, api_key: str, model_name: str):
         """Initializes the embedding model.
 
@@ -16,8 +40,23 @@ class EmbeddingBase(ABC):
         """
         self.api_key = api_key
         self.model_name = model_name
+        self._semaphore: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = None
+        self._in_flight = SingleFlight()
+        # Shared by every model and embedder of this provider and key.
+        self.rate_limiter = get_rate_limiter(self.provider, api_key)
 
     @abstractmethod
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Creates embeddings for one batch of texts in a single request.
+
+        Args:
+            texts (List[str]): The texts to embed, within the provider's request limits.
+
+        Returns:
+            List[List[float]]: One embedding per text, in order.
+        """
+        pass
+
     async def embed(self, texts: Union[str, List[str]]) -> List[List[float]]:
         """Creates embeddings for a list of texts.
 
@@ -27,7 +66,54 @@ class EmbeddingBase(ABC):
         Returns:
             List[List[float]]: A list of embeddings, where each embedding is a list of floats.
         """
-        pass
+        if isinstance(texts, str):
+            texts = [texts]
+        batches = self._split_batches(list(texts))
+        if len(batches) <= 1:
+            return await self._embed_limited(batches[0]) if batches else []
+
+        results = await asyncio.gather(*(self._embed_limited(batch) for batch in batches))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        """Splits texts, in order, into batches within `max_batch_items` and `max_batch_tokens`.
+
+        A single text over the token limit is sent in a batch of its own.
+        """
+        if self.max_batch_tokens is None:
+            return [texts[i:i + self.max_batch_items] for i in range(0, len(texts), self.max_batch_items)]
+
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_tokens = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if batch and (len(batch) == self.max_batch_items or batch_tokens + tokens > self.max_batch_tokens):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    async def _embed_limited(self, texts: List[str]) -> List[List[float]]:
+        """Sends one batch, or joins an identical request already in flight."""
+        if not self.coalesce_requests:
+            return await self._send(texts)
+        return await self._in_flight.do(tuple(texts), lambda: self._send(texts))
+
+    async def _send(self, texts: List[str]) -> List[List[float]]:
+        """Sends one batch once fewer than `max_concurrency` requests are in flight."""
+        loop = asyncio.get_running_loop()
+        # Semaphores belong to one event loop, and an instance may be used from several (`embed_sync` uses its own).
+        if self._semaphore is None or self._semaphore[0] is not loop:
+            self._semaphore = (loop, asyncio.Semaphore(self.max_concurrency))
+        async with self._semaphore[1]:
+            tokens = sum(estimate_tokens(text) for text in texts)
+            return await self.retry_policy.run(
+                lambda: self.rate_limiter.run(lambda: self._embed(texts), tokens=tokens, retries=0)
+            )
 
     def embed_sync(self, texts: Union[str, List[str]]) -> List[List[float]]:
         """Synchronous wrapper for the embed method.
@@ -38,4 +124,4 @@ class EmbeddingBase(ABC):
         Returns:
             List[List[float]]: A list of embeddings.
         """
-        return asyncio.run(self.embed(texts))
+        return run_sync(self.embed(texts))
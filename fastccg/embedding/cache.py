@@ -0,0 +1,176 @@
+"""
+A content-addressed cache for embedding models.
+
+`CachedEmbedding` wraps any `EmbeddingBase` and remembers the vector of every
+text it embeds, keyed by (provider, model name, SHA-256 of the text). Lookups
+go through two tiers: an in-process LRU bounded by entry count, then an
+optional SQLite database that stores each vector as a compact float32 blob
+and survives restarts. Only the texts missing from both tiers are sent to the
+provider, in one batched call.
+
+Vectors are returned as float32 values whether or not they came from the
+cache, so a text always embeds to exactly the same vector.
+"""
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .base import EmbeddingBase
+
+# SQLite limits the number of bound parameters per statement.
+_LOOKUP_CHUNK = 500
+
+
+@dataclass
+class EmbeddingCacheStats:
+    """Hit and miss counters of an embedding cache, counted per distinct text of each call."""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of looked-up texts served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _SQLiteTier:
+    """The persistent tier: one row of float32 bytes per (provider, model, text hash)."""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "provider TEXT NOT NULL, model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (provider, model, hash)) WITHOUT ROWID"
+            )
+
+    def get_many(self, provider: str, model: str, hashes: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), _LOOKUP_CHUNK):
+                chunk = hashes[start:start + _LOOKUP_CHUNK]
+                rows = self._connection.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE provider = ? AND model = ? "
+                    f"AND hash IN ({', '.join('?' * len(chunk))})",
+                    (provider, model, *chunk),
+                )
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype="<f4").astype(np.float32)
+        return found
+
+    def put_many(self, provider: str, model: str, vectors: Dict[bytes, np.ndarray]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (provider, model, hash, vector) VALUES (?, ?, ?, ?)",
+                [(provider, model, digest, vector.astype("<f4").tobytes()) for digest, vector in vectors.items()],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class CachedEmbedding(EmbeddingBase):
+    """An embedding model that serves repeated texts from a memory and disk cache."""
+
+    def __init__(self, embedder: EmbeddingBase, max_entries: int = 100_000, path: Optional[str] = None):
+        """
+        Wraps an embedding model with a cache.
+
+        Args:
+            embedder: The embedding model whose results are cached.
+            max_entries: The most vectors kept in the in-process LRU tier.
+            path: If set, the SQLite database file of the persistent tier. It is
+                created if missing and can be shared by several models.
+        """
+        super().__init__(api_key=embedder.api_key, model_name=embedder.model_name)
+        self.embedder = embedder
+        self.provider = embedder.provider
+        self.max_entries = max_entries
+        self.stats = EmbeddingCacheStats()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._disk = _SQLiteTier(path) if path is not None else None
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    async def embed(self, texts: Union[str, List[str]]) -> List[List[float]]:
+        """Embeds texts, sending only those missing from the cache to the wrapped model."""
+        if isinstance(texts, str):
+            texts = [texts]
+        digests = [hashlib.sha256(text.encode("utf-8")).digest() for text in texts]
+
+        vectors: Dict[bytes, np.ndarray] = {}
+        for digest in digests:
+            vector = self._memory.get(digest)
+            if vector is not None:
+                self._memory.move_to_end(digest)
+                vectors[digest] = vector
+        in_memory = len(vectors)
+
+        missing = [digest for digest in dict.fromkeys(digests) if digest not in vectors]
+        if missing and self._disk is not None:
+            found = await asyncio.get_running_loop().run_in_executor(
+                None, self._disk.get_many, self.provider, self.model_name, missing
+            )
+            for digest, vector in found.items():
+                self._remember(digest, vector)
+            vectors.update(found)
+            missing = [digest for digest in missing if digest not in found]
+        from_disk = len(vectors) - in_memory
+
+        if missing:
+            missing_set = set(missing)
+            missing_texts = list(dict.fromkeys(text for text, digest in zip(texts, digests) if digest in missing_set))
+            new_vectors = {
+                hashlib.sha256(text.encode("utf-8")).digest(): np.asarray(vector, dtype=np.float32)
+                for text, vector in zip(missing_texts, await self.embedder.embed(missing_texts))
+            }
+            vectors.update(new_vectors)
+            # Providers that fail softly return empty vectors, which must not be cached.
+            cacheable = {digest: vector for digest, vector in new_vectors.items() if vector.size}
+            for digest, vector in cacheable.items():
+                self._remember(digest, vector)
+            if cacheable and self._disk is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._disk.put_many, self.provider, self.model_name, cacheable
+                )
+
+        self.stats.memory_hits += in_memory
+        self.stats.disk_hits += from_disk
+        self.stats.misses += len(missing)
+        return [vectors[digest].tolist() for digest in digests]
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        return await self.embed(texts)
+
+    def _remember(self, digest: bytes, vector: np.ndarray) -> None:
+        self._memory[digest] = vector
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Empties the in-process tier. The persistent tier is kept."""
+        self._memory.clear()
+
+    def close(self) -> None:
+        """Closes the persistent tier's database."""
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
@@ -1,4 +1,4 @@
-from typing import List, Union, Optional
+from typing import List, Optional
 import google.generativeai as genai
 from .base import EmbeddingBase
 
@@ -7,16 +7,14 @@ class GeminiEmbedding(EmbeddingBase):
     """Google Gemini embedding model."""
     provider = "gemini"
     model = "text-embedding-004"
+    max_batch_items = 100
 
     def __init__(self, api_key: Optional[str] = None):
         super().__init__(api_key=api_key, model_name=self.model)
         genai.configure(api_key=self.api_key)
 
-    async def embed(self, text: Union[str, List[str]]) -> List[List[float]]:
-        """Asynchronously embeds a string or list of strings."""
-        if isinstance(text, str):
-            text = [text]
-        
+    async def _embed(self, text: List[str]) -> List[List[float]]:
+        """Asynchronously embeds a batch of strings."""
         try:
             result = await genai.embed_content_async(
                 model=self.model,
@@ -1,6 +1,6 @@
 import asyncio
 import hashlib
-from typing import List, Union, Optional
+from typing import List, Optional
 
 from .base import EmbeddingBase
 
@@ -17,13 +17,8 @@ class MockEmbedding(EmbeddingBase):
     def __init__(self, api_key: Optional[str] = None):
         super().__init__(api_key=api_key, model_name=self.model)
 
-    async def embed(self, text: Union[str, List[str]]) -> List[List[float]]:
-        """Generates a deterministic vector from the SHA256 hash of the input text."""
-        if isinstance(text, str):
-            texts = [text]
-        else:
-            texts = text
-
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Generates a deterministic vector from the SHA256 hash of each input text."""
         embeddings = []
         for item in texts:
             hasher = hashlib.sha256(item.encode('utf-8'))
@@ -1,38 +1,45 @@
-from typing import List, Union
+from typing import List
 
 from openai import AsyncOpenAI, RateLimitError, APIStatusError, APIConnectionError
 
+from fastccg.core.http import get_client
 from fastccg.embedding.base import EmbeddingBase
-from fastccg.errors import QuotaExceeded, ModelUnavailable, APIRequestFailed
+from fastccg.core.rate_limit import parse_retry_after
+from fastccg.errors import QuotaExceeded, ModelUnavailable, APIRequestFailed, RateLimited
 
 
 class _OpenAIEmbedding(EmbeddingBase):
     """Base class for OpenAI embedding models."""
 
     provider = "openai"
-
-    def __init__(self, api_key: str, model_name: str):
-        super().__init__(api_key=api_key, model_name=model_name)
-        self.client = AsyncOpenAI(api_key=api_key)
-
-    async def embed(self, texts: Union[str, List[str]]) -> List[List[float]]:
-        """Creates embeddings for a list of texts using the OpenAI API."""
-        if isinstance(texts, str):
-            texts = [texts]
-
+    max_batch_items = 2048
+    max_batch_tokens = 300_000
+
+    @property
+    def client(self):
+        """The SDK client of this key on the running event loop, shared with OpenAI chat models using the same key."""
+        api_key = self.api_key
+        return get_client(
+            self.provider, api_key, lambda http_client: AsyncOpenAI(api_key=api_key, http_client=http_client)
+        )
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Creates embeddings for a batch of texts using the OpenAI API."""
         try:
             response = await self.client.embeddings.create(
                 input=texts, model=self.model_name
             )
             return [item.embedding for item in response.data]
-        except RateLimitError:
-            raise QuotaExceeded()
+        except RateLimitError as e:
+            if e.code == "insufficient_quota":
+                raise QuotaExceeded()
+            raise RateLimited(parse_retry_after(e.response.headers))
         except APIStatusError as e:
             if e.status_code == 404:
                 raise ModelUnavailable(f"The model `{self.model_name}` is unavailable.")
-            raise APIRequestFailed(f"OpenAI status error: {e}")
+            raise APIRequestFailed(f"OpenAI status error: {e}", status_code=e.status_code)
         except APIConnectionError as e:
-            raise APIRequestFailed(f"OpenAI connection error: {e}")
+            raise APIRequestFailed(f"OpenAI connection error: {e}", retryable=True)
         except Exception as e:
             raise APIRequestFailed(f"Unexpected OpenAI embedding error: {e}")
 
@@ -1,4 +1,11 @@
 # fastccg/errors.py
+import asyncio
+from typing import Optional
+
+import httpx
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors and overload.
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529})
 
 class FastCCGError(Exception): pass
 
@@ -11,5 +18,42 @@ class ModelUnavailable(FastCCGError):
         super().__init__(msg)
 
 class APIRequestFailed(FastCCGError):
-    def __init__(self, msg: str):
+    def __init__(self, msg: str, status_code: Optional[int] = None, retryable: Optional[bool] = None):
         super().__init__(f"AI API request failed: {msg}")
+        self.status_code = status_code
+        self.retryable = retryable
+
+class RateLimited(QuotaExceeded):
+    """A request was rejected for exceeding a rate limit (HTTP 429) and may succeed if sent later."""
+    def __init__(self, retry_after: Optional[float] = None):
+        FastCCGError.__init__(self, "⏳ Rate limit reached. Slow down or raise your provider's limits.")
+        self.retry_after = retry_after
+
+class DeadlineExceeded(APIRequestFailed):
+    """A request, including its retries, did not finish within its deadline."""
+    def __init__(self, deadline: float):
+        super().__init__(f"no response within the {deadline:g}s deadline.", retryable=False)
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Classifies an error raised by a provider call.
+
+    Returns True if sending the same request again may succeed: rate limits,
+    5xx and other transient statuses, timeouts and connection failures.
+    Quota, authentication, validation and unknown-model errors are final.
+    """
+    if isinstance(error, RateLimited):
+        return True
+    if isinstance(error, (QuotaExceeded, ModelUnavailable, DeadlineExceeded)):
+        return False
+    retryable = getattr(error, "retryable", None)
+    if retryable is not None:
+        return retryable
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    # Providers wrap SDK errors in APIRequestFailed; classify what they wrapped.
+    cause = error.__cause__ or error.__context__
+    return isinstance(error, APIRequestFailed) and cause is not None and is_retryable(cause)
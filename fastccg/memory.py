@@ -1,26 +1,312 @@
+import asyncio
+import concurrent.futures
 import json
 import os
+import warnings
+import weakref
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, Callable, Deque, List, Dict, Any, Literal, Optional, Tuple
 
 from .types.prompt import ModelPrompt
+from .utils.tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from .core.model_base import ModelBase
+
+# Tokens a provider adds around each message for its role and separators.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Starts the synthetic message holding the summary of compacted turns.
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+_SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below so it can be continued without it. Keep names, facts, numbers, "
+    "decisions, open questions and the user's preferences; drop greetings and filler. Merge in the "
+    "previous summary, if there is one. Reply with the summary only."
+)
+
+# Serializes the requests sent through each summarizer, since each uses the summarizer's history.
+# Asyncio locks belong to one loop, hence one per summarizer and loop.
+_summarizer_locks: "weakref.WeakKeyDictionary[ModelBase, Dict[asyncio.AbstractEventLoop, asyncio.Lock]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _summarizer_lock(summarizer: "ModelBase") -> asyncio.Lock:
+    """Returns the lock serializing a summarizer's requests on the running loop."""
+    loop = asyncio.get_running_loop()
+    locks = _summarizer_locks.setdefault(summarizer, {})
+    lock = locks.get(loop)
+    if lock is None:
+        # Drop the locks of loops that have since closed.
+        for closed in [other for other in locks if other.is_closed()]:
+            del locks[closed]
+        lock = locks[loop] = asyncio.Lock()
+    return lock
+
+
+@dataclass(frozen=True)
+class HistoryPolicy:
+    """
+    Bounds on the conversation history sent with each request.
+
+    A turn is a user message and the replies that follow it. When a bound is
+    exceeded, the oldest turns are dropped whole, but never the latest one.
+    System messages in the history, and the model's system prompt, are pinned:
+    they are never dropped, and count against `max_tokens` first.
+    """
+    #: The most turns kept, or None for no limit.
+    max_turns: Optional[int] = None
+    #: The most (estimated) tokens kept, or None for no limit.
+    max_tokens: Optional[int] = None
+    #: Counts the tokens of a message's text. Pass the provider's tokenizer for exact budgets.
+    token_counter: Callable[[str], int] = estimate_tokens
 
 
 class MemoryManager:
     """
     Manages short-term and long-term memory for conversational models.
 
-    - Short-term memory: A simple list of prompts in the current session.
+    - Short-term memory: The prompts of the current session, kept within the
+      bounds of a `HistoryPolicy`. Messages are kept in a deque with their
+      token counts, so appending and trimming cost O(1) per message instead of
+      recounting the whole history.
+    - Compaction: Once enabled, a history grown past a token threshold has its
+      older turns summarized in the background by another model, into one
+      pinned message that each later compaction folds into its new summary.
     - Long-term memory: Persists conversations to a JSONL file, allowing
       models to retrieve context from past sessions.
     """
 
-    def __init__(self, long_term_path: str = ".fcvs"):
-        self.history: List[ModelPrompt] = []
+    def __init__(self, long_term_path: str = ".fcvs", policy: Optional[HistoryPolicy] = None):
+        self.policy = policy or HistoryPolicy()
+        # Pinned system messages, then the trimmable window, each with its token count.
+        self._pinned: List[Tuple[ModelPrompt, int]] = []
+        self._window: Deque[Tuple[ModelPrompt, int]] = deque()
+        self._system_prompt_tokens = 0
+        self._pinned_tokens = 0
+        self._window_tokens = 0
+        self._turns = 0
+        # Bumped whenever the history is replaced, so a compaction of the old history is discarded.
+        self._generation = 0
+        self._summary: Optional[ModelPrompt] = None
+        self._summarizer: Optional["ModelBase"] = None
+        self._compact_threshold = 0
+        self._keep_turns = 4
+        self._summary_role: Literal["system", "assistant"] = "system"
+        self._compaction: Optional["asyncio.Task[bool]"] = None
+        self.compactions = 0
         self._is_long_term_enabled = False
         self.long_term_path = long_term_path
         self.memory_file = os.path.join(long_term_path, "memory.jsonl")
 
+    @property
+    def history(self) -> List[ModelPrompt]:
+        """The messages sent with the next request: pinned system messages, then the recent turns."""
+        return [prompt for prompt, _ in self._pinned] + [prompt for prompt, _ in self._window]
+
+    @history.setter
+    def history(self, prompts: List[ModelPrompt]) -> None:
+        self._pinned, self._window = [], deque()
+        self._pinned_tokens = self._window_tokens = self._turns = 0
+        self._generation += 1
+        self._summary = None
+        # The summary is pinned whatever its role, since it may be written as an assistant message.
+        summary = next((p for p in prompts if p.content.startswith(SUMMARY_PREFIX)), None)
+        for prompt in prompts:
+            if prompt is not summary:
+                self._add(prompt)
+        if summary is not None:
+            self._set_summary(summary)
+        self._trim()
+
+    @property
+    def tokens(self) -> int:
+        """The estimated tokens of the history and the pinned system prompt."""
+        return self._system_prompt_tokens + self._pinned_tokens + self._window_tokens
+
+    @property
+    def turns(self) -> int:
+        """The number of turns in the history."""
+        return self._turns
+
+    def set_policy(self, policy: HistoryPolicy) -> None:
+        """Applies new bounds, trimming the history to them. A new token counter recounts it."""
+        recount = policy.token_counter is not self.policy.token_counter
+        self.policy = policy
+        if recount:
+            self.history = self.history
+        else:
+            self._trim()
+
+    def set_system_prompt(self, prompt: Optional[ModelPrompt]) -> None:
+        """Pins the model's system prompt, sent outside the history, so it counts against the token budget."""
+        self._system_prompt_tokens = self._count(prompt) if prompt is not None else 0
+        self._trim()
+
+    def _count(self, prompt: ModelPrompt) -> int:
+        return self.policy.token_counter(prompt.content) + MESSAGE_OVERHEAD_TOKENS
+
+    def _add(self, prompt: ModelPrompt) -> None:
+        tokens = self._count(prompt)
+        if prompt.role == "system":
+            self._pinned.append((prompt, tokens))
+            self._pinned_tokens += tokens
+            return
+        if prompt.role == "user" or not self._window:
+            self._turns += 1
+        self._window.append((prompt, tokens))
+        self._window_tokens += tokens
+
+    def _drop_oldest_turn(self) -> None:
+        """Drops the first message of the window and the replies following it."""
+        while True:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+            if not self._window or self._window[0][0].role == "user":
+                break
+        self._turns -= 1
+
+    def _trim(self) -> None:
+        """Drops the oldest turns until the history is within the policy, keeping at least the latest turn."""
+        max_turns, max_tokens = self.policy.max_turns, self.policy.max_tokens
+        while self._turns > 1:
+            if max_turns is not None and self._turns > max_turns:
+                self._drop_oldest_turn()
+            elif max_tokens is not None and self.tokens > max_tokens:
+                self._drop_oldest_turn()
+            else:
+                break
+
+    # --- Compaction --- #
+
+    def enable_compaction(
+        self,
+        summarizer: Optional["ModelBase"],
+        threshold_tokens: int,
+        keep_turns: int = 4,
+        role: Literal["system", "assistant"] = "system",
+    ) -> None:
+        """
+        Summarize older turns once the history grows past a token budget.
+
+        Args:
+            summarizer: The model writing the summaries, e.g. a cheaper one. It
+                must not be the model owning this history. None disables compaction.
+            threshold_tokens: The history tokens, system prompt included, above which it is compacted.
+            keep_turns: The latest turns kept verbatim; all older ones are summarized.
+            role: The role of the summary message, "system" or "assistant".
+        """
+        self._summarizer = summarizer
+        self._compact_threshold = threshold_tokens
+        self._keep_turns = keep_turns
+        self._summary_role = role
+
+    @property
+    def summary(self) -> Optional[ModelPrompt]:
+        """The pinned summary of the compacted turns, if any."""
+        return self._summary
+
+    def maybe_compact(self) -> Optional["asyncio.Task[bool]"]:
+        """
+        Starts compacting in the background if the history is over the threshold and no compaction is running.
+
+        Must be called from a running event loop. The history stays usable
+        meanwhile; the summary replaces the summarized turns once it arrives.
+        """
+        if self._summarizer is None or self.tokens <= self._compact_threshold or self._turns <= self._keep_turns:
+            return None
+        if self._compaction is not None and not self._compaction.done():
+            return None
+        self._compaction = asyncio.get_running_loop().create_task(self._compact_in_background())
+        return self._compaction
+
+    async def wait_for_compaction(self) -> None:
+        """Waits until a running background compaction has finished, even if it runs on another event loop."""
+        task = self._compaction
+        if task is None or task.done():
+            return
+        loop = task.get_loop()
+        if loop is asyncio.get_running_loop():
+            await task
+        elif not loop.is_closed():
+            # E.g. started by `ask()` on the background loop: wait for it without touching it from this loop.
+            finished: "concurrent.futures.Future[None]" = concurrent.futures.Future()
+            loop.call_soon_threadsafe(task.add_done_callback, lambda _: finished.set_result(None))
+            await asyncio.wrap_future(finished)
+
+    async def _compact_in_background(self) -> bool:
+        try:
+            return await self.compact()
+        except Exception as e:
+            # The turns stay in the history, and the next turn tries again.
+            warnings.warn(f"Compacting the conversation history failed: {e}")
+            return False
+
+    async def compact(self) -> bool:
+        """
+        Summarizes all but the latest `keep_turns` turns, and the previous summary, into a new pinned summary.
+
+        Returns:
+            True if turns were compacted, False if there were none to compact or
+            the history was replaced while the summary was being written.
+        """
+        summarizer = self._summarizer
+        turns = self._oldest_turns(self._turns - self._keep_turns)
+        if summarizer is None or not turns:
+            return False
+        generation = self._generation
+        request = self._summary_request(turns)
+
+        async with _summarizer_lock(summarizer):
+            summarizer.memory.clear()
+            try:
+                response = await summarizer.ask_async(request)
+            finally:
+                summarizer.memory.clear()
+
+        if generation != self._generation:
+            return False
+        # Turns trimmed by the history policy meanwhile are already gone.
+        for turn in turns:
+            if self._window and self._window[0][0] is turn[0]:
+                self._drop_oldest_turn()
+        self._set_summary(ModelPrompt(role=self._summary_role, content=SUMMARY_PREFIX + response.content.strip()))
+        self.compactions += 1
+        self._trim()
+        return True
+
+    def _oldest_turns(self, count: int) -> List[List[ModelPrompt]]:
+        """Returns the first `count` turns of the window, each a list of its messages."""
+        turns: List[List[ModelPrompt]] = []
+        for prompt, _ in self._window:
+            if prompt.role == "user" or not turns:
+                if len(turns) == count:
+                    break
+                turns.append([])
+            turns[-1].append(prompt)
+        return turns
+
+    def _summary_request(self, turns: List[List[ModelPrompt]]) -> str:
+        parts = [_SUMMARY_INSTRUCTIONS]
+        if self._summary is not None:
+            parts.append("Previous summary:\n" + self._summary.content[len(SUMMARY_PREFIX):])
+        transcript = "\n".join(f"{prompt.role}: {prompt.content}" for turn in turns for prompt in turn)
+        parts.append("Conversation:\n" + transcript)
+        return "\n\n".join(parts)
+
+    def _set_summary(self, summary: ModelPrompt) -> None:
+        """Replaces the pinned summary, keeping it ahead of the other pinned messages."""
+        kept = [(prompt, tokens) for prompt, tokens in self._pinned if prompt is not self._summary]
+        tokens = self._count(summary)
+        self._pinned = [(summary, tokens)] + kept
+        self._pinned_tokens = tokens + sum(count for _, count in kept)
+        self._summary = summary
+
+    # --- Long-term memory --- #
+
     def enable_long_term(self, enable: bool):
         """Enable or disable long-term memory persistence."""
         self._is_long_term_enabled = enable
@@ -28,8 +314,9 @@ class MemoryManager:
             os.makedirs(self.long_term_path)
 
     def append(self, prompt: ModelPrompt):
-        """Add a prompt to the short-term history."""
-        self.history.append(prompt)
+        """Add a prompt to the short-term history, dropping the oldest turns beyond the policy's bounds."""
+        self._add(prompt)
+        self._trim()
 
     def get_history(self) -> List[Dict[str, Any]]:
         """Get the current conversation history in a serializable format."""
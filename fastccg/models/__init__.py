@@ -3,6 +3,7 @@ from . import claude
 from . import gemini
 from . import mistral
 from . import mock
+from . import router
 
 _mock_key_set = False
 
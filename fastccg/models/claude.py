@@ -1,14 +1,16 @@
-import asyncio
 from typing import AsyncGenerator
 
 import anthropic
 from anthropic import AsyncAnthropic, APIStatusError, RateLimitError, APIConnectionError
 
+from fastccg.core.http import get_client
+from fastccg.core.loop import run_sync
 from fastccg.core.model_base import ModelBase
+from fastccg.core.rate_limit import parse_retry_after
 from fastccg.types.response import ModelResponse
 from fastccg.types.prompt import ModelPrompt
 from fastccg.errors import (
-    QuotaExceeded,
+    RateLimited,
     ModelUnavailable,
     APIRequestFailed,
 )
@@ -19,9 +21,13 @@ class _ClaudeModel(ModelBase):
 
     provider = "anthropic"
 
-    def __init__(self, api_key: str, model_name: str):
-        super().__init__(api_key=api_key, model_name=model_name)
-        self.client = AsyncAnthropic(api_key=api_key)
+    @property
+    def client(self):
+        """The SDK client of this key on the running event loop."""
+        api_key = self.api_key
+        return get_client(
+            self.provider, api_key, lambda http_client: AsyncAnthropic(api_key=api_key, http_client=http_client)
+        )
 
     def _build_params(self) -> dict:
         messages = [{"role": p.role, "content": p.content} for p in self.history]
@@ -39,7 +45,7 @@ class _ClaudeModel(ModelBase):
         return params
 
     def _ask(self, prompt: str) -> ModelResponse:
-        return asyncio.run(self._ask_async(prompt))
+        return run_sync(self._ask_async(prompt))
 
     async def _ask_async(self, prompt: str) -> ModelResponse:
         self.append_prompt(prompt)
@@ -62,14 +68,14 @@ class _ClaudeModel(ModelBase):
                 raw=response,
             )
 
-        except RateLimitError:
-            raise QuotaExceeded()
+        except RateLimitError as e:
+            raise RateLimited(parse_retry_after(e.response.headers))
         except APIStatusError as e:
             if e.status_code == 404:
                 raise ModelUnavailable(f"The model `{self.model_name}` is unavailable.")
-            raise APIRequestFailed(f"Anthropic status error: {e}")
+            raise APIRequestFailed(f"Anthropic status error: {e}", status_code=e.status_code)
         except APIConnectionError as e:
-            raise APIRequestFailed(f"Anthropic connection error: {e}")
+            raise APIRequestFailed(f"Anthropic connection error: {e}", retryable=True)
         except Exception as e:
             raise APIRequestFailed(f"Unexpected Claude error: {e}")
 
@@ -89,14 +95,14 @@ class _ClaudeModel(ModelBase):
 
             self.history.append(ModelPrompt(role="assistant", content=full_response))
 
-        except RateLimitError:
-            raise QuotaExceeded()
+        except RateLimitError as e:
+            raise RateLimited(parse_retry_after(e.response.headers))
         except APIStatusError as e:
             if e.status_code == 404:
                 raise ModelUnavailable(f"The model `{self.model_name}` is unavailable.")
-            raise APIRequestFailed(f"Anthropic status error: {e}")
+            raise APIRequestFailed(f"Anthropic status error: {e}", status_code=e.status_code)
         except APIConnectionError as e:
-            raise APIRequestFailed(f"Anthropic connection error: {e}")
+            raise APIRequestFailed(f"Anthropic connection error: {e}", retryable=True)
         except Exception as e:
             raise APIRequestFailed(f"Unexpected Claude stream error: {e}")
 
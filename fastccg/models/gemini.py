@@ -1,7 +1,7 @@
-import asyncio
 from typing import AsyncGenerator
 
 import google.generativeai as genai
+from fastccg.core.loop import run_sync
 from fastccg.core.model_base import ModelBase
 from fastccg.types.response import ModelResponse
 
@@ -34,7 +34,7 @@ class _GeminiModel(ModelBase):
 
     def _ask(self, prompt: str) -> ModelResponse:
         """Sync wrapper for the async ask method."""
-        return asyncio.run(self._ask_async(prompt))
+        return run_sync(self._ask_async(prompt))
 
     async def _ask_async(self, prompt: str) -> ModelResponse:
         """Async method to send a prompt to the model."""
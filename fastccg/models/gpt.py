@@ -1,13 +1,15 @@
-import asyncio
 from typing import AsyncGenerator
 
 import openai
-from openai import RateLimitError, NotFoundError, APIConnectionError
+from openai import RateLimitError, NotFoundError, APIConnectionError, APIStatusError
 
+from fastccg.core.http import get_client
+from fastccg.core.loop import run_sync
 from fastccg.core.model_base import ModelBase
+from fastccg.core.rate_limit import parse_retry_after
 from fastccg.types.response import ModelResponse
 from fastccg.types.prompt import ModelPrompt
-from fastccg.errors import QuotaExceeded, ModelUnavailable, APIRequestFailed
+from fastccg.errors import QuotaExceeded, ModelUnavailable, APIRequestFailed, RateLimited
 
 
 class _OpenAIModel(ModelBase):
@@ -15,9 +17,13 @@ class _OpenAIModel(ModelBase):
 
     provider = "openai"
 
-    def __init__(self, api_key: str, model_name: str):
-        super().__init__(api_key=api_key, model_name=model_name)
-        self.client = openai.AsyncOpenAI(api_key=api_key)
+    @property
+    def client(self):
+        """The SDK client of this key on the running event loop."""
+        api_key = self.api_key
+        return get_client(
+            self.provider, api_key, lambda http_client: openai.AsyncOpenAI(api_key=api_key, http_client=http_client)
+        )
 
     def _build_params(self) -> dict:
         messages = []
@@ -34,7 +40,7 @@ class _OpenAIModel(ModelBase):
         return params
 
     def _ask(self, prompt: str) -> ModelResponse:
-        return asyncio.run(self._ask_async(prompt))
+        return run_sync(self._ask_async(prompt))
 
     async def _ask_async(self, prompt: str) -> ModelResponse:
         try:
@@ -47,12 +53,16 @@ class _OpenAIModel(ModelBase):
                 provider=self.provider,
                 raw=response,
             )
-        except RateLimitError:
-            raise QuotaExceeded()
+        except RateLimitError as e:
+            if e.code == "insufficient_quota":
+                raise QuotaExceeded()
+            raise RateLimited(parse_retry_after(e.response.headers))
         except NotFoundError:
             raise ModelUnavailable(f"The model `{self.model_name}` was not found or is unavailable.")
+        except APIStatusError as e:
+            raise APIRequestFailed(f"Status error: {str(e)}", status_code=e.status_code)
         except APIConnectionError as e:
-            raise APIRequestFailed(f"Connection error: {str(e)}")
+            raise APIRequestFailed(f"Connection error: {str(e)}", retryable=True)
         except Exception as e:
             raise APIRequestFailed(f"Unexpected error: {str(e)}")
 
@@ -64,12 +74,16 @@ class _OpenAIModel(ModelBase):
             async for chunk in stream:
                 content = chunk.choices[0].delta.content or ""
                 yield ModelResponse(content=content, provider=self.provider, raw=chunk)
-        except RateLimitError:
-            raise QuotaExceeded()
+        except RateLimitError as e:
+            if e.code == "insufficient_quota":
+                raise QuotaExceeded()
+            raise RateLimited(parse_retry_after(e.response.headers))
         except NotFoundError:
             raise ModelUnavailable(f"The model `{self.model_name}` was not found or is unavailable.")
+        except APIStatusError as e:
+            raise APIRequestFailed(f"Status error: {str(e)}", status_code=e.status_code)
         except APIConnectionError as e:
-            raise APIRequestFailed(f"Connection error: {str(e)}")
+            raise APIRequestFailed(f"Connection error: {str(e)}", retryable=True)
         except Exception as e:
             raise APIRequestFailed(f"Unexpected error: {str(e)}")
 
@@ -1,20 +1,35 @@
-import asyncio
 from typing import AsyncGenerator
 
 from mistralai import Mistral
+from mistralai.models import SDKError
+from fastccg.core.http import get_client
+from fastccg.core.loop import run_sync
 from fastccg.core.model_base import ModelBase
+from fastccg.core.rate_limit import parse_retry_after
+from fastccg.errors import RateLimited
 from fastccg.types.response import ModelResponse
 from fastccg.types.prompt import ModelPrompt
 
 
+def _raise_rate_limited(error: SDKError) -> None:
+    """Raises `RateLimited` if a Mistral SDK error is a 429."""
+    if getattr(error, "status_code", None) == 429:
+        response = getattr(error, "raw_response", None)
+        raise RateLimited(parse_retry_after(response.headers if response is not None else None)) from error
+
+
 class _MistralModel(ModelBase):
     """Base class for Mistral models using the new client."""
 
     provider = "mistral"
 
-    def __init__(self, api_key: str, model_name: str):
-        super().__init__(api_key=api_key, model_name=model_name)
-        self.client = Mistral(api_key=api_key)
+    @property
+    def client(self):
+        """The SDK client of this key on the running event loop."""
+        api_key = self.api_key
+        return get_client(
+            self.provider, api_key, lambda http_client: Mistral(api_key=api_key, async_client=http_client)
+        )
 
     def _build_messages(self) -> list:
         """Build chat messages for Mistral format."""
@@ -35,13 +50,17 @@ class _MistralModel(ModelBase):
 
     def _ask(self, prompt: str) -> ModelResponse:
         """Sync wrapper."""
-        return asyncio.run(self._ask_async(prompt))
+        return run_sync(self._ask_async(prompt))
 
     async def _ask_async(self, prompt: str) -> ModelResponse:
         """Async call using new Mistral client."""
         self.append_prompt(prompt)
         params = self._build_params()
-        response = await self.client.chat.complete_async(**params)
+        try:
+            response = await self.client.chat.complete_async(**params)
+        except SDKError as e:
+            _raise_rate_limited(e)
+            raise
 
         content = response.choices[0].message.content
         tokens_used = response.usage.total_tokens
@@ -58,7 +77,11 @@ class _MistralModel(ModelBase):
         """Streaming async chat using new client."""
         self.append_prompt(prompt)
         params = self._build_params()
-        stream = await self.client.chat.stream_async(**params)
+        try:
+            stream = await self.client.chat.stream_async(**params)
+        except SDKError as e:
+            _raise_rate_limited(e)
+            raise
 
         full_response = ""
         async for chunk in stream:
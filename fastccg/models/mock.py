@@ -1,6 +1,7 @@
 import asyncio
 from typing import AsyncGenerator
 
+from fastccg.core.loop import run_sync
 from fastccg.core.model_base import ModelBase
 from fastccg.types.response import ModelResponse
 from fastccg.types.prompt import ModelPrompt
@@ -14,7 +15,7 @@ class MockModel(ModelBase):
         super().__init__(api_key=api_key, model_name=model_name)
 
     def _ask(self, prompt: str) -> ModelResponse:
-        return asyncio.run(self._ask_async(prompt))
+        return run_sync(self._ask_async(prompt))
 
     async def _ask_async(self, prompt: str) -> ModelResponse:
         content = f"This is a mock response to: {prompt}"
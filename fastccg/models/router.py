@@ -0,0 +1,233 @@
+"""
+Routing one conversation across several providers.
+
+A `RouterModel` holds the conversation and configuration like any model, and
+sends each request to one of its backend models, ranked by their recent
+median latency. If the chosen backend has not answered once its usual p95
+latency has passed, the router sends a hedged duplicate to the next backend
+and returns whichever answer arrives first, cancelling the other. A backend
+that fails with `QuotaExceeded`, `ModelUnavailable` or a transient error it
+could not retry away is skipped, and the request fails over to the next one.
+"""
+import asyncio
+import copy
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import AsyncGenerator, Deque, Dict, List, Optional, Sequence
+
+from fastccg.core.loop import run_sync
+from fastccg.core.model_base import ModelBase
+from fastccg.core.retry import RetryPolicy
+from fastccg.errors import ModelUnavailable, QuotaExceeded, is_retryable
+from fastccg.memory import HistoryPolicy, MemoryManager
+from fastccg.types.response import ModelResponse
+
+
+@dataclass
+class BackendStats:
+    """Rolling latency and outcome counters of one router backend."""
+    name: str
+    requests: int = 0
+    failures: int = 0
+    hedges: int = 0
+    hedges_won: int = 0
+    #: Latencies of the most recent successful requests, in seconds.
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=100))
+    #: Until when, on the `time.monotonic()` clock, the backend is skipped after a quota or availability error.
+    unavailable_until: float = 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Returns the q-quantile of the recent latencies, or None before the first success."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.quantile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.quantile(0.95)
+
+
+class RouterModel(ModelBase):
+    """
+    A model that routes, hedges and fails over requests across several backend models.
+
+    The router owns the conversation: each request goes through a copy of the
+    backend carrying the router's history, system prompt, temperature and token
+    limit, so routers sharing a backend never see each other's conversations.
+    The copies share the backend's client, rate limiter and retry policy, except
+    that a rate-limited backend is skipped instead of waited for.
+    """
+
+    provider = "router"
+    # Backends retry on their own; the router fails over instead of resending.
+    retry_policy: RetryPolicy = RetryPolicy(max_attempts=1)
+
+    def __init__(
+        self,
+        backends: Sequence[ModelBase],
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        default_hedge_delay: float = 2.0,
+        min_samples: int = 5,
+        cooldown: float = 30.0,
+        window: int = 100,
+    ):
+        """
+        Args:
+            backends: The models to route between, in order of preference while their latencies are unknown.
+            hedge: Whether to send a duplicate request to a second backend when the first is slow.
+            hedge_quantile: The latency quantile of the first backend after which the duplicate is sent.
+            default_hedge_delay: The hedge delay, in seconds, until a backend has `min_samples` latencies.
+            min_samples: The successful requests a backend needs before its latencies are used.
+            cooldown: Seconds a backend is skipped after `QuotaExceeded` or `ModelUnavailable`.
+            window: How many recent latencies are kept per backend.
+        """
+        if not backends:
+            raise ValueError("RouterModel needs at least one backend model.")
+        super().__init__(api_key=None, model_name="+".join(b.model_name for b in backends))
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.stats: List[BackendStats] = [
+            BackendStats(name=f"{b.provider}/{b.model_name}", latencies=deque(maxlen=window)) for b in self.backends
+        ]
+
+    # --- Routing --- #
+
+    def _ranked(self) -> List[int]:
+        """Orders the backends: available ones first, then by median latency; unmeasured ones are tried first."""
+        now = time.monotonic()
+
+        def key(i: int):
+            stats = self.stats[i]
+            measured = len(stats.latencies) >= self.min_samples
+            return (stats.unavailable_until > now, stats.p50 if measured else 0.0, i)
+
+        return sorted(range(len(self.backends)), key=key)
+
+    def _hedge_delay(self, i: int) -> float:
+        stats = self.stats[i]
+        delay = stats.quantile(self.hedge_quantile) if len(stats.latencies) >= self.min_samples else None
+        return delay if delay is not None else self.default_hedge_delay
+
+    def _fails_over(self, error: BaseException) -> bool:
+        return isinstance(error, (QuotaExceeded, ModelUnavailable)) or is_retryable(error)
+
+    def _on_failure(self, i: int, error: BaseException) -> None:
+        self.stats[i].failures += 1
+        if isinstance(error, (QuotaExceeded, ModelUnavailable)):
+            wait = getattr(error, "retry_after", None) or self.cooldown
+            self.stats[i].unavailable_until = time.monotonic() + wait
+
+    def _prepare(self, backend: ModelBase) -> ModelBase:
+        """
+        Returns a per-request copy of a backend carrying the router's conversation and configuration.
+
+        The backend itself is left untouched: a request may wait for its rate
+        limiter or a retry, meanwhile another router sharing it could replace
+        any conversation stored on it.
+        """
+        call = copy.copy(backend)
+        # The router's history is already within its bounds; only its token counts are reused.
+        call.memory = MemoryManager(policy=HistoryPolicy(token_counter=self.memory.policy.token_counter))
+        call.memory.history = list(self.memory.history)
+        call._sys_prompt = self._sys_prompt
+        call.memory.set_system_prompt(self._sys_prompt)
+        call._temperature = self._temperature
+        call._max_tokens = self._max_tokens
+        return call
+
+    def _backend_policy(self, backend: ModelBase) -> RetryPolicy:
+        # A rate-limited backend is skipped for another one rather than waited for.
+        return replace(backend.retry_policy, retry_rate_limits=False)
+
+    async def _call(self, i: int, prompt: str) -> ModelResponse:
+        self.stats[i].requests += 1
+        backend = self._prepare(self.backends[i])
+        started = time.monotonic()
+        response = await backend._request(prompt, self._backend_policy(backend))
+        self.stats[i].latencies.append(time.monotonic() - started)
+        return response
+
+    # --- ModelBase --- #
+
+    def _ask(self, prompt: str) -> ModelResponse:
+        return run_sync(self._ask_async(prompt))
+
+    async def _ask_async(self, prompt: str) -> ModelResponse:
+        waiting = deque(self._ranked())
+        running: Dict["asyncio.Task[ModelResponse]", int] = {}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            i = waiting.popleft()
+            running[asyncio.ensure_future(self._call(i, prompt))] = i
+
+        primary = waiting[0]
+        launch()
+        try:
+            while running:
+                timeout = None
+                if self.hedge and not hedged and waiting and len(running) == 1:
+                    timeout = self._hedge_delay(next(iter(running.values())))
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self.stats[waiting[0]].hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    i = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if hedged and i != primary:
+                            self.stats[i].hedges_won += 1
+                        return task.result()
+                    self._on_failure(i, error)
+                    if not self._fails_over(error):
+                        raise error
+                    last_error = error
+                if not running and waiting:
+                    launch()
+            assert last_error is not None  # Every backend was tried and failed over.
+            raise last_error
+        finally:
+            for task in running:
+                if task.done() and not task.cancelled():
+                    task.exception()  # Mark a loser's error as seen, so asyncio doesn't log it.
+                else:
+                    task.cancel()
+
+    async def _ask_stream(self, prompt: str) -> AsyncGenerator[ModelResponse, None]:
+        # Streams are not hedged, but fail over until a backend sends its first chunk.
+        last_error: Optional[BaseException] = None
+        for i in self._ranked():
+            backend = self._prepare(self.backends[i])
+            self.stats[i].requests += 1
+            tokens = backend._estimate_request_tokens()
+            try:
+                stream, first = await self._backend_policy(backend).run(lambda: backend._start_stream(prompt, tokens))
+            except Exception as error:
+                self._on_failure(i, error)
+                if not self._fails_over(error):
+                    raise
+                last_error = error
+                continue
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+            backend.rate_limiter.on_success()
+            return
+        assert last_error is not None  # Every backend was tried and failed over.
+        raise last_error
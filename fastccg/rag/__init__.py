@@ -1,5 +1,6 @@
 """High-level RAG implementation for the fastccg library."""
 
+from .ingest import IngestionStats, chunk_text
 from .rag import RAGModel
 
-__all__ = ["RAGModel"]
+__all__ = ["RAGModel", "IngestionStats", "chunk_text"]
@@ -0,0 +1,200 @@
+"""
+A BM25 lexical index for hybrid (lexical + vector) retrieval.
+
+Dense retrieval is weak on exact identifiers and rare terms, which BM25 ranks
+well. The index keeps one postings list per term: two growable `array('I')`
+columns holding document numbers and term frequencies, which cost 8 bytes per
+(term, document) pair. Documents are added incrementally; removed documents
+are tombstoned and dropped from the postings by `compact()`, which runs
+automatically once more than `compaction_threshold` of them are tombstones.
+
+The index is saved as a single `.npz` archive, conventionally beside the
+`.fcvs` file as `<filepath>.bm25`.
+"""
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into lowercase word tokens (letters, digits and underscores)."""
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """An incrementally built BM25 inverted index over document texts."""
+
+    #: The fraction of tombstoned documents that triggers an automatic `compact()`.
+    compaction_threshold: float = 0.25
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        """
+        Initializes an empty index.
+
+        Args:
+            k1: Term frequency saturation. Higher values let repeated terms count for more.
+            b: Document length normalization, from 0 (none) to 1 (full).
+        """
+        self.k1 = k1
+        self.b = b
+        self._doc_ids: List[str] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._deleted = array("B")
+        self._num_deleted = 0
+        self._total_length = 0
+        # term -> (document numbers, term frequencies)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_numbers
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Indexes a document, replacing any earlier version of it."""
+        if doc_id in self._doc_numbers:
+            self.remove(doc_id)
+
+        number = len(self._doc_ids)
+        counts = Counter(tokenize(text))
+        for term, frequency in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("I"))
+            postings[0].append(number)
+            postings[1].append(frequency)
+
+        length = sum(counts.values())
+        self._doc_ids.append(doc_id)
+        self._doc_numbers[doc_id] = number
+        self._lengths.append(length)
+        self._deleted.append(0)
+        self._total_length += length
+
+    def remove(self, doc_id: str) -> bool:
+        """Removes a document. Returns False if it was not indexed."""
+        number = self._doc_numbers.pop(doc_id, None)
+        if number is None:
+            return False
+        self._deleted[number] = 1
+        self._num_deleted += 1
+        self._total_length -= self._lengths[number]
+        if self._num_deleted > self.compaction_threshold * len(self._doc_ids):
+            self.compact()
+        return True
+
+    def compact(self) -> None:
+        """Drops tombstoned documents from the postings lists and renumbers the rest."""
+        if not self._num_deleted:
+            return
+        deleted = np.frombuffer(self._deleted, dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(~deleted) - 1
+        postings = {}
+        for term, (docs, frequencies) in self._postings.items():
+            docs_array = np.frombuffer(docs, dtype=np.uintc)
+            keep = ~deleted[docs_array]
+            if keep.any():
+                postings[term] = (
+                    array("I", renumber[docs_array[keep]].astype(np.uintc).tobytes()),
+                    array("I", np.frombuffer(frequencies, dtype=np.uintc)[keep].tobytes()),
+                )
+        lengths = np.frombuffer(self._lengths, dtype=np.uintc)[~deleted]
+
+        self._postings = postings
+        self._doc_ids = [doc_id for doc_id, gone in zip(self._doc_ids, deleted.tolist()) if not gone]
+        self._doc_numbers = {doc_id: number for number, doc_id in enumerate(self._doc_ids)}
+        self._lengths = array("I", lengths.tobytes())
+        self._deleted = array("B", bytes(len(self._doc_ids)))
+        self._num_deleted = 0
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Ranks the indexed documents against a query with BM25.
+
+        Returns:
+            Up to `top_k` (doc_id, score) pairs, best first. Documents sharing no
+            term with the query are not returned.
+        """
+        if not self._doc_numbers or top_k <= 0:
+            return []
+
+        # Like most engines, document frequencies include tombstones until compaction.
+        total = len(self._doc_ids)
+        lengths = np.frombuffer(self._lengths, dtype=np.uintc).astype(np.float32)
+        average_length = max(self._total_length / len(self._doc_numbers), 1e-9)
+        length_norms = self.k1 * (1.0 - self.b + self.b * lengths / average_length)
+
+        scores = np.zeros(total, dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.uintc)
+            frequencies = np.frombuffer(postings[1], dtype=np.uintc).astype(np.float32)
+            idf = math.log(1.0 + (total - docs.shape[0] + 0.5) / (docs.shape[0] + 0.5))
+            scores[docs] += idf * frequencies * (self.k1 + 1.0) / (frequencies + length_norms[docs])
+
+        if self._num_deleted:
+            scores[np.frombuffer(self._deleted, dtype=np.uint8).astype(bool)] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.shape[0] > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._doc_ids[number], float(scores[number])) for number in candidates.tolist()]
+
+    # --- Persistence --- #
+
+    def save(self, filepath: str) -> None:
+        """Saves the compacted index to a single `.npz` archive at `filepath`."""
+        self.compact()
+        terms = list(self._postings)
+        sizes = np.fromiter((len(self._postings[term][0]) for term in terms), dtype=np.uint64, count=len(terms))
+        offsets = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(sizes, dtype=np.uint64)])
+        header = {"k1": self.k1, "b": self.b, "doc_ids": self._doc_ids, "terms": terms}
+
+        def column(index: int) -> np.ndarray:
+            if not terms:
+                return np.empty(0, dtype=np.uint32)
+            return np.concatenate([np.frombuffer(self._postings[term][index], dtype=np.uintc) for term in terms]).astype(np.uint32)
+
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                header=np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+                lengths=np.frombuffer(self._lengths, dtype=np.uintc).astype(np.uint32),
+                offsets=offsets,
+                docs=column(0),
+                frequencies=column(1),
+            )
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath: str) -> "BM25Index":
+        """Loads an index saved with `save`."""
+        with open(filepath, "rb") as f:
+            archive = np.load(f)
+            header = json.loads(archive["header"].tobytes().decode("utf-8"))
+            lengths, offsets = archive["lengths"], archive["offsets"]
+            docs = archive["docs"].astype(np.uintc)
+            frequencies = archive["frequencies"].astype(np.uintc)
+
+        index = cls(k1=header["k1"], b=header["b"])
+        index._doc_ids = header["doc_ids"]
+        index._doc_numbers = {doc_id: number for number, doc_id in enumerate(index._doc_ids)}
+        index._lengths = array("I", lengths.astype(np.uintc).tobytes())
+        index._deleted = array("B", bytes(len(index._doc_ids)))
+        index._total_length = int(lengths.sum())
+        for term, start, end in zip(header["terms"], offsets[:-1].tolist(), offsets[1:].tolist()):
+            index._postings[term] = (array("I", docs[start:end].tobytes()), array("I", frequencies[start:end].tobytes()))
+        return index
@@ -0,0 +1,259 @@
+"""
+Streaming document ingestion for RAG knowledge bases.
+
+Documents are read one at a time, split into token-bounded chunks, grouped
+into batches and embedded by a fixed number of concurrent workers, which add
+each batch to the vector store with `add_many`. The queue between the reader
+and the workers is bounded, so the reader waits while the workers are busy
+and memory stays flat however large the corpus is.
+
+Each chunk is stored as `<doc_id>#<n>` with the document's metadata plus
+`text`, `doc_id` and `chunk` fields. A document ingested again replaces its
+earlier version, also when both come from the same stream: the reader then
+waits for the earlier version to be stored before replacing it.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from ..embedding.base import EmbeddingBase
+from ..utils.tokens import estimate_tokens
+from ..vector_store.base import VectorStoreBase
+from .bm25 import BM25Index
+
+DEFAULT_PATTERNS = ("*.txt", "*.md")
+
+DocumentSource = Union[str, os.PathLike, Iterable[Any]]
+
+_WORD = re.compile(r"\S+")
+
+
+@dataclass
+class IngestionStats:
+    """Progress and throughput counters of an ingestion run, updated as it goes."""
+    documents: int = 0
+    chunks: int = 0
+    batches: int = 0
+    tokens: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the run started, or its total duration once finished."""
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def chunk_text(text: str, max_tokens: int = 256, overlap: int = 32) -> List[str]:
+    """
+    Splits text into chunks of at most `max_tokens` estimated tokens, breaking between words.
+
+    Args:
+        text: The text to split.
+        max_tokens: The token budget of each chunk.
+        overlap: How many tokens of trailing words each chunk repeats at the start of the next,
+            so that sentences cut at a boundary stay retrievable.
+
+    Returns:
+        The chunks, in order. Whitespace-only text yields no chunks.
+    """
+    if max_tokens < 1 or not 0 <= overlap < max_tokens:
+        raise ValueError("chunk_text expects max_tokens >= 1 and 0 <= overlap < max_tokens.")
+
+    # (start, end, tokens) of every word; words over budget are cut into character slices.
+    words: List[Tuple[int, int, int]] = []
+    for match in _WORD.finditer(text):
+        start, end = match.span()
+        tokens = estimate_tokens(match.group())
+        if tokens <= max_tokens:
+            words.append((start, end, tokens))
+            continue
+        for piece_start in range(start, end, max_tokens):
+            piece_end = min(piece_start + max_tokens, end)
+            words.append((piece_start, piece_end, estimate_tokens(text[piece_start:piece_end])))
+
+    chunks = []
+    first = 0
+    while first < len(words):
+        last, total = first, 0
+        while last < len(words) and total + words[last][2] <= max_tokens:
+            total += words[last][2]
+            last += 1
+        chunks.append(text[words[first][0]:words[last - 1][1]])
+        if last == len(words):
+            break
+        # Step back over up to `overlap` tokens, always moving forward by at least one word.
+        next_first, repeated = last, 0
+        while next_first - 1 > first and repeated + words[next_first - 1][2] <= overlap:
+            next_first -= 1
+            repeated += words[next_first][2]
+        first = next_first
+    return chunks
+
+
+def _iter_directory(directory: Path, patterns: Sequence[str]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    paths = sorted({path for pattern in patterns for path in directory.rglob(pattern) if path.is_file()})
+    for path in paths:
+        text = path.read_text(encoding="utf-8", errors="replace")
+        yield path.relative_to(directory).as_posix(), text, {"source": str(path)}
+
+
+def iter_documents(
+    documents: DocumentSource, patterns: Sequence[str] = DEFAULT_PATTERNS
+) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Normalizes a document source into (doc_id, text, metadata) triples, lazily.
+
+    Args:
+        documents: A directory path, or an iterable of texts, `(doc_id, text)` or
+            `(doc_id, text, metadata)` tuples, or `{"id", "text", "metadata"}` dicts.
+            Plain texts get an id derived from their content, so re-ingesting them is idempotent.
+        patterns: The file name patterns read, recursively, from a directory.
+    """
+    if isinstance(documents, (str, os.PathLike)):
+        directory = Path(documents)
+        if not directory.is_dir():
+            raise ValueError(f"'{directory}' is not a directory.")
+        yield from _iter_directory(directory, patterns)
+        return
+
+    for item in documents:
+        if isinstance(item, str):
+            yield hashlib.sha256(item.encode("utf-8")).hexdigest()[:16], item, {}
+        elif isinstance(item, dict):
+            yield item["id"], item["text"], dict(item.get("metadata") or {})
+        elif isinstance(item, tuple) and len(item) in (2, 3):
+            yield item[0], item[1], dict(item[2] or {}) if len(item) == 3 else {}
+        else:
+            raise ValueError(f"Unsupported document {item!r}. Use a text, a (doc_id, text[, metadata]) tuple or a dict.")
+
+
+def _drop_stale_chunks(
+    store: VectorStoreBase, lexical_index: Optional[BM25Index], doc_id: str, count: int
+) -> None:
+    """Deletes the chunks an earlier, longer version of a document left beyond its new `count` chunks."""
+    while True:
+        chunk_id = f"{doc_id}#{count}"
+        try:
+            stored = store.get_metadata(chunk_id) is not None
+            if stored:
+                store.delete(chunk_id)
+        except NotImplementedError:
+            stored = False
+        indexed = lexical_index is not None and lexical_index.remove(chunk_id)
+        if not (stored or indexed):
+            return
+        count += 1
+
+
+async def ingest(
+    documents: DocumentSource,
+    embedder: EmbeddingBase,
+    store: VectorStoreBase,
+    lexical_index: Optional[BM25Index] = None,
+    chunk_tokens: int = 256,
+    chunk_overlap: int = 32,
+    batch_size: int = 64,
+    concurrency: int = 4,
+    patterns: Sequence[str] = DEFAULT_PATTERNS,
+    stats: Optional[IngestionStats] = None,
+    progress: Optional[Callable[[IngestionStats], None]] = None,
+) -> IngestionStats:
+    """
+    Chunks, embeds and stores a stream of documents. See the module docstring for the pipeline.
+
+    Args:
+        documents: The documents to ingest (see `iter_documents`). A document yielded
+            again replaces its earlier version.
+        embedder: The embedding model.
+        store: The vector store the chunks are added to.
+        lexical_index: If given, chunks are also added to this BM25 index.
+        chunk_tokens: The token budget of each chunk.
+        chunk_overlap: The number of tokens consecutive chunks of a document share.
+        batch_size: The number of chunks sent to the embedder per request.
+        concurrency: The number of embedding requests in flight at once.
+        patterns: The file name patterns read when `documents` is a directory.
+        stats: Counters to update, e.g. to poll progress from another task. A new object by default.
+        progress: Called with the counters after every stored batch.
+
+    Returns:
+        The final counters.
+    """
+    if batch_size < 1 or concurrency < 1:
+        raise ValueError("batch_size and concurrency must be at least 1.")
+    stats = stats if stats is not None else IngestionStats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    source = iter_documents(documents, patterns)
+
+    async def produce() -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[Tuple[str, str, Dict[str, Any]]] = []
+        # The documents read so far, to spot one the source yields again.
+        seen: Set[str] = set()
+        while True:
+            # Read off the event loop, since sources may block on files or networks.
+            # `iter_documents` never yields None, so it marks the end of the source.
+            document: Optional[Tuple[str, str, Dict[str, Any]]] = await loop.run_in_executor(None, next, source, None)
+            if document is None:
+                break
+            doc_id, text, metadata = document
+            if doc_id in seen:
+                # Let the workers store the earlier version first, or its chunks could land after this one's.
+                if batch:
+                    await queue.put(batch)
+                    batch = []
+                await queue.join()
+            seen.add(doc_id)
+            chunks = chunk_text(text, chunk_tokens, chunk_overlap)
+            _drop_stale_chunks(store, lexical_index, doc_id, len(chunks))
+            stats.documents += 1
+            for number, chunk in enumerate(chunks):
+                batch.append((f"{doc_id}#{number}", chunk, {**metadata, "text": chunk, "doc_id": doc_id, "chunk": number}))
+                if len(batch) == batch_size:
+                    await queue.put(batch)
+                    batch = []
+        if batch:
+            await queue.put(batch)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consume() -> None:
+        while (batch := await queue.get()) is not None:
+            ids = [chunk_id for chunk_id, _, _ in batch]
+            texts = [text for _, text, _ in batch]
+            vectors = await embedder.embed(texts)
+            store.add_many(ids, vectors, [metadata for _, _, metadata in batch])
+            if lexical_index is not None:
+                for chunk_id, text in zip(ids, texts):
+                    lexical_index.add(chunk_id, text)
+            stats.chunks += len(batch)
+            stats.batches += 1
+            stats.tokens += sum(estimate_tokens(text) for text in texts)
+            if progress is not None:
+                progress(stats)
+            queue.task_done()
+
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(consume()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        stats.finished = time.perf_counter()
+    return stats
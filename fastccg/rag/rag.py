@@ -1,13 +1,25 @@
+import json
+import os
 import warnings
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 from rich import print as rich_print
 
+from ..core.loop import run_sync
 from ..core.model_base import ModelBase, ModelResponse
+from ..core.semantic_cache import SemanticCache, scope_key
 from ..embedding.base import EmbeddingBase
+from ..utils.singleflight import SingleFlight
 from ..vector_store.base import VectorStoreBase
+from ..vector_store.metadata_index import matches_filter
+from .bm25 import BM25Index
+from .ingest import DEFAULT_PATTERNS, DocumentSource, IngestionStats, ingest
 from .prompts import get_prompt_template
 
+RETRIEVAL_MODES = ("dense", "hybrid")
+# How many candidates each retriever contributes to hybrid fusion, per requested result.
+_HYBRID_CANDIDATES_PER_RESULT = 4
+
 
 class RAGModel:
     """
@@ -27,6 +39,10 @@ class RAGModel:
         top_k: int = 3,
         strict_mode: bool = False,
         trace: bool = False,
+        retrieval: str = "dense",
+        rrf_k: int = 60,
+        coalesce: bool = False,
+        semantic_cache: Optional[SemanticCache] = None,
     ):
         """
         Initializes the RAGModel.
@@ -39,13 +55,39 @@ class RAGModel:
             top_k: The number of top documents to retrieve for context.
             strict_mode: If True, warns when no documents are found.
             trace: If True, prints debugging information during the RAG process.
+            retrieval: 'dense' for vector search only, or 'hybrid' to fuse vector search with
+                BM25 lexical search over the documents' `text` metadata. Hybrid retrieval needs
+                a store implementing `documents()`.
+            rrf_k: The reciprocal rank fusion constant used in hybrid mode. Higher values
+                flatten the advantage of top-ranked documents.
+            coalesce: If True, concurrent `ask_async` calls with the same question and filter
+                share one answer, and only the first is recorded in the model's history.
+            semantic_cache: If set, questions similar to ones answered before are answered from
+                this cache, skipping retrieval and generation.
         """
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unsupported retrieval mode '{retrieval}'. Use one of {list(RETRIEVAL_MODES)}.")
+        if retrieval == "hybrid" and type(store).documents is VectorStoreBase.documents:
+            # The lexical index is built from `store.documents()`, which this store cannot list.
+            raise ValueError(
+                f"Hybrid retrieval needs a store that can list its documents, which {type(store).__name__} "
+                "does not. Use retrieval='dense', or a store such as InMemoryVectorStore."
+            )
         self.llm = llm
         self.embedder = embedder
         self.store = store
         self.top_k = top_k
         self.strict_mode = strict_mode
         self.trace = trace
+        self.retrieval = retrieval
+        self.rrf_k = rrf_k
+        self.coalesce = coalesce
+        self.semantic_cache = semantic_cache
+        self._in_flight = SingleFlight()
+        # Built from the store on the first hybrid query unless loaded or built explicitly.
+        self.lexical_index: Optional[BM25Index] = None
+        # The counters of the current or most recent ingestion run.
+        self.ingestion_stats: Optional[IngestionStats] = None
 
         if template == "auto":
             model_name = llm.model_name.lower()
@@ -59,25 +101,226 @@ class RAGModel:
 
         self.prompt_template_str = get_prompt_template(template)
 
-    async def ask_async(self, question: str) -> ModelResponse:
+    async def ask_async(self, question: str, filter: Optional[Dict[str, Any]] = None) -> ModelResponse:
         """
         Asks a question using the RAG pipeline.
 
         Args:
             question: The question to ask.
+            filter: Optional metadata conditions restricting which documents can be retrieved.
 
         Returns:
             A ModelResponse object containing the generated answer.
         """
+        if self.coalesce:
+            key = (question, json.dumps(filter, sort_keys=True, default=str))
+            return await self._in_flight.do(key, lambda: self._answer(question, filter))
+        return await self._answer(question, filter)
+
+    async def _answer(self, question: str, filter: Optional[Dict[str, Any]]) -> ModelResponse:
+        """Embeds the question, retrieves its context and generates the answer."""
         if self.trace:
             rich_print(f"[bold cyan][RAG TRACE][/] Asking question: '[yellow]{question}[/]'")
             rich_print(f"[bold cyan][RAG TRACE][/] Using top_k: [yellow]{self.top_k}[/]")
 
-        # 1. Embed the query
-        query_vector = (await self.embedder.embed(question))[0]
+        # 1. Embed the query, and answer it from the semantic cache if a similar one was answered before
+        cache = self.semantic_cache
+        if cache is not None:
+            scope = self._cache_scope(filter)
+            cache_vector = await cache.embed(question)
+            cached = cache.get(cache_vector, scope)
+            if cached is not None:
+                if self.trace:
+                    rich_print("[bold cyan][RAG TRACE][/] Answered from the semantic cache")
+                return cached
+        if cache is not None and cache.embedder is self.embedder:
+            query_vector = cache_vector
+        else:
+            query_vector = (await self.embedder.embed(question))[0]
 
         # 2. Retrieve relevant documents
-        search_results = self.store.similarity_search(query_vector, top_k=self.top_k)
+        search_results = self._retrieve([question], [query_vector], filter)[0]
+
+        response = await self._generate(question, search_results)
+        if cache is not None:
+            cache.put(cache_vector, question, response.content, scope, response.provider)
+        return response
+
+    async def ask_many_async(self, questions: List[str], filter: Optional[Dict[str, Any]] = None) -> List[ModelResponse]:
+        """
+        Asks several questions using the RAG pipeline.
+
+        All questions are embedded in a single call and retrieved with one
+        batched `similarity_search_batch` call. Answers are then generated one
+        question at a time, so the conversation history stays in order.
+
+        Args:
+            questions: The questions to ask.
+            filter: Optional metadata conditions applied to the retrieval of every question.
+
+        Returns:
+            One ModelResponse per question, in the same order.
+        """
+        if not questions:
+            return []
+        if len(questions) == 1:
+            return [await self.ask_async(questions[0], filter=filter)]
+
+        if self.trace:
+            rich_print(f"[bold cyan][RAG TRACE][/] Asking [yellow]{len(questions)}[/] questions in a batch")
+            rich_print(f"[bold cyan][RAG TRACE][/] Using top_k: [yellow]{self.top_k}[/]")
+
+        query_vectors = await self.embedder.embed(list(questions))
+        cache = self.semantic_cache
+        cached: List[Optional[ModelResponse]] = [None] * len(questions)
+        if cache is not None:
+            scope = self._cache_scope(filter)
+            if cache.embedder is self.embedder:
+                cache_vectors = query_vectors
+            else:
+                cache_vectors = await cache.embedder.embed(list(questions))
+            cached = [cache.get(vector, scope) for vector in cache_vectors]
+
+        # Only the questions missing from the cache are retrieved for and answered.
+        misses = [i for i, response in enumerate(cached) if response is None]
+        batch_results = []
+        if misses:
+            batch_results = self._retrieve([questions[i] for i in misses], [query_vectors[i] for i in misses], filter)
+
+        answers: Dict[int, ModelResponse] = {}
+        for i, search_results in zip(misses, batch_results):
+            if self.trace:
+                rich_print(f"[bold cyan][RAG TRACE][/] Answering question: '[yellow]{questions[i]}[/]'")
+            answer = answers[i] = await self._generate(questions[i], search_results)
+            if cache is not None:
+                cache.put(cache_vectors[i], questions[i], answer.content, scope, answer.provider)
+        return [answers[i] if response is None else response for i, response in enumerate(cached)]
+
+    async def aindex(
+        self,
+        documents: DocumentSource,
+        chunk_tokens: int = 256,
+        chunk_overlap: int = 32,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        patterns: Sequence[str] = DEFAULT_PATTERNS,
+        progress: Optional[Callable[[IngestionStats], None]] = None,
+    ) -> IngestionStats:
+        """
+        Chunks, embeds and adds documents to the store, streaming them so memory stays flat on large corpora.
+
+        Args:
+            documents: A directory path, or an iterable of texts, `(doc_id, text)` or
+                `(doc_id, text, metadata)` tuples, or `{"id", "text", "metadata"}` dicts.
+                A document id given again, in this or an earlier run, replaces its earlier version.
+            chunk_tokens: The estimated token budget of each chunk.
+            chunk_overlap: The number of tokens consecutive chunks of a document share.
+            batch_size: The number of chunks embedded per request.
+            concurrency: The number of embedding requests in flight at once.
+            patterns: The file name patterns read, recursively, when `documents` is a directory.
+            progress: Called with the ingestion counters after every stored batch.
+
+        Returns:
+            The final ingestion counters, also available as `rag.ingestion_stats` while the run is going.
+        """
+        self.ingestion_stats = IngestionStats()
+        if self.trace:
+            rich_print(f"[bold cyan][RAG TRACE][/] Indexing documents in batches of [yellow]{batch_size}[/] chunks")
+        stats = await ingest(
+            documents,
+            self.embedder,
+            self.store,
+            lexical_index=self.lexical_index,
+            chunk_tokens=chunk_tokens,
+            chunk_overlap=chunk_overlap,
+            batch_size=batch_size,
+            concurrency=concurrency,
+            patterns=patterns,
+            stats=self.ingestion_stats,
+            progress=progress,
+        )
+        if self.trace:
+            rich_print(
+                f"[bold cyan][RAG TRACE][/] Indexed [yellow]{stats.documents}[/] documents as [yellow]{stats.chunks}[/] chunks "
+                f"in {stats.elapsed:.2f}s ([yellow]{stats.chunks_per_second:.1f}[/] chunks/s)"
+            )
+        return stats
+
+    def index_documents(self, documents: DocumentSource, **kwargs: Any) -> IngestionStats:
+        """Synchronous wrapper for `aindex`, taking the same arguments."""
+        return run_sync(self.aindex(documents, **kwargs))
+
+    def build_lexical_index(self) -> BM25Index:
+        """
+        (Re)builds the BM25 index used by hybrid retrieval from the `text` metadata of every stored document.
+
+        Documents added to the store after the index is built are not indexed
+        automatically; add them with `rag.lexical_index.add(doc_id, text)` or
+        rebuild the index.
+        """
+        index = BM25Index()
+        for doc_id, metadata in self.store.documents():
+            index.add(doc_id, metadata.get("text", ""))
+        self.lexical_index = index
+        if self.trace:
+            rich_print(f"[bold cyan][RAG TRACE][/] Built lexical index over [yellow]{len(index)}[/] documents")
+        return index
+
+    def _retrieve(
+        self, questions: List[str], query_vectors: List[List[float]], filter: Optional[Dict[str, Any]]
+    ) -> List[List[Tuple[str, float, Dict[str, Any]]]]:
+        """Retrieves the context documents of each question, fusing in lexical results in hybrid mode."""
+        candidates = self.top_k if self.retrieval == "dense" else self.top_k * _HYBRID_CANDIDATES_PER_RESULT
+        if len(questions) == 1:
+            if filter is None:
+                dense = [self.store.similarity_search(query_vectors[0], top_k=candidates)]
+            else:
+                dense = [self.store.similarity_search(query_vectors[0], top_k=candidates, filter=filter)]
+        elif filter is None:
+            dense = self.store.similarity_search_batch(query_vectors, top_k=candidates)
+        else:
+            dense = self.store.similarity_search_batch(query_vectors, top_k=candidates, filter=filter)
+        if self.retrieval == "dense":
+            return dense
+
+        lexical_index = self.lexical_index if self.lexical_index is not None else self.build_lexical_index()
+        return [
+            self._fuse(dense_results, lexical_index.search(question, top_k=candidates), filter)
+            for question, dense_results in zip(questions, dense)
+        ]
+
+    def _fuse(
+        self,
+        dense: List[Tuple[str, float, Dict[str, Any]]],
+        lexical: List[Tuple[str, float]],
+        filter: Optional[Dict[str, Any]],
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Combines dense and lexical rankings with reciprocal rank fusion: score = sum of 1 / (rrf_k + rank)."""
+        scores: Dict[str, float] = {}
+        metadata: Dict[str, Dict[str, Any]] = {}
+        for rank, (doc_id, _, doc_metadata) in enumerate(dense, start=1):
+            scores[doc_id] = 1.0 / (self.rrf_k + rank)
+            metadata[doc_id] = doc_metadata
+        rank = 0
+        for doc_id, _ in lexical:
+            if doc_id not in metadata:
+                stored = self.store.get_metadata(doc_id)
+                if stored is None or (filter is not None and not matches_filter(stored, filter)):
+                    continue
+                metadata[doc_id] = stored
+            rank += 1
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (self.rrf_k + rank)
+
+        fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.top_k]
+        return [(doc_id, score, metadata[doc_id]) for doc_id, score in fused]
+
+    def _cache_scope(self, filter: Optional[Dict[str, Any]]) -> str:
+        """The semantic cache scope of questions asked with this template, model and filter."""
+        sys_prompt = self.llm._sys_prompt.content if self.llm._sys_prompt else None
+        return scope_key("rag", self.prompt_template_str, self.llm.provider, self.llm.model_name, sys_prompt, filter)
+
+    async def _generate(self, question: str, search_results: List[Tuple[str, float, Dict[str, Any]]]) -> ModelResponse:
+        """Augments the prompt with the retrieved documents and generates the answer."""
         if self.trace:
             rich_print("[bold cyan][RAG TRACE][/] Retrieved documents:")
             rich_print(search_results)
@@ -130,7 +373,7 @@ class RAGModel:
 
     def save(self, filepath: str, pretty_print: bool = False) -> None:
         """
-        Saves the underlying vector store to a file.
+        Saves the underlying vector store to a file, and the lexical index (if built) to `<filepath>.bm25`.
 
         Args:
             filepath: The path to the file where the store will be saved.
@@ -139,10 +382,12 @@ class RAGModel:
         if self.trace:
             rich_print(f"[bold cyan][RAG TRACE][/] Saving vector store to '[yellow]{filepath}[/]'")
         self.store.save(filepath, pretty_print=pretty_print)
+        if self.lexical_index is not None:
+            self.lexical_index.save(filepath + ".bm25")
 
     def load(self, filepath: str) -> None:
         """
-        Loads the underlying vector store from a file.
+        Loads the underlying vector store from a file, and the lexical index from `<filepath>.bm25` if it exists.
 
         Args:
             filepath: The path to the file from which to load the store.
@@ -150,3 +395,4 @@ class RAGModel:
         if self.trace:
             rich_print(f"[bold cyan][RAG TRACE][/] Loading vector store from '[yellow]{filepath}[/]'")
         self.store.load(filepath)
+        self.lexical_index = BM25Index.load(filepath + ".bm25") if os.path.exists(filepath + ".bm25") else None
@@ -163,7 +163,7 @@ def embed(
         embedding_model = fastccg.init_embedding(model_class, api_key=api_key)
 
         with console.status("[bold green]Generating embedding..."):
-            embedding = asyncio.run(embedding_model.embed(text))
+            embedding = embedding_model.embed_sync(text)
         
         console.print(f"[bold green]Embedding Vector (first 10 dims):[/] {embedding[0][:10]}...")
         console.print(f"[bold green]Total Dimensions:[/] {len(embedding[0])}")
@@ -0,0 +1,43 @@
+"""
+Single-flight deduplication of concurrent identical calls.
+
+When several coroutines start the same call while it is already running,
+only the first one runs it; the others wait for its result. Nothing is kept
+once the call finishes, so this collapses bursts of identical requests
+without caching anything.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Shares one in-flight call among concurrent callers with the same key."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        #: The number of callers that joined a call already in flight.
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `call()`, or waits for the in-flight call with the same key and returns its result.
+
+        Every caller receives the same result object, or the same exception. A
+        caller that is cancelled stops waiting without cancelling the call for
+        the others.
+        """
+        task = self._calls.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
@@ -0,0 +1,17 @@
+"""
+Cheap token count estimates for chunking text and budgeting requests.
+
+Exact counts depend on each provider's tokenizer, which fastccg does not ship.
+The estimate assumes about four characters per token, and counts every word
+and punctuation mark as at least one token, so it errs on the high side.
+"""
+import re
+
+CHARS_PER_TOKEN = 4
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens a model's tokenizer would split `text` into."""
+    return sum(-(-len(piece) // CHARS_PER_TOKEN) for piece in _PIECE.findall(text))
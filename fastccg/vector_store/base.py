@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Iterator, Tuple, Optional
 
 
 class VectorStoreBase(ABC):
@@ -17,14 +17,84 @@ class VectorStoreBase(ABC):
         """
         pass
 
+    def add_many(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """
+        Adds many documents and their vector embeddings to the store.
+
+        Stores that can insert a batch more cheaply than one document at a time
+        (for example with a single copy into a matrix) should override this. The
+        default implementation calls `add` once per document.
+
+        Args:
+            ids: Unique identifiers for the documents.
+            vectors: The vector embeddings of the documents, one per id.
+            metadatas: Optional metadata dictionaries, one per id.
+        """
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        if len(vectors) != len(ids) or len(metadatas) != len(ids):
+            raise ValueError("add_many expects one vector and one metadata entry per id.")
+        for doc_id, vector, metadata in zip(ids, vectors, metadatas):
+            self.add(doc_id, vector, metadata)
+
+    def upsert(self, doc_id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Inserts a document, or replaces the vector and metadata of an existing one.
+
+        The built-in stores overwrite existing documents in place on `add`, so the
+        default implementation simply calls `add`. Stores whose `add` does not
+        replace existing entries should override this.
+
+        Args:
+            doc_id: A unique identifier for the document.
+            vector: The vector embedding of the document.
+            metadata: Optional dictionary of metadata associated with the document.
+        """
+        self.add(doc_id, vector, metadata)
+
+    def delete(self, doc_id: str) -> bool:
+        """
+        Deletes a document from the store.
+
+        Args:
+            doc_id: The identifier of the document to delete.
+
+        Returns:
+            True if the document existed and was deleted, False otherwise.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support deleting documents.")
+
+    def get_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the metadata of a document, or None if the store does not hold it.
+
+        Args:
+            doc_id: The identifier of the document.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support looking up documents.")
+
+    def documents(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields the (doc_id, metadata) pair of every document in the store."""
+        raise NotImplementedError(f"{type(self).__name__} does not support listing documents.")
+
     @abstractmethod
-    def similarity_search(self, query_vector: List[float], top_k: int = 5) -> List[Tuple[str, float, Dict[str, Any]]]:
+    def similarity_search(
+        self, query_vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
         """
         Performs a similarity search to find the most relevant documents.
 
         Args:
             query_vector: The vector embedding of the query.
             top_k: The number of top results to return.
+            filter: Optional metadata conditions a document must satisfy to be returned,
+                e.g. `{"tenant": "acme", "year": {"$gte": 2020}}`. See
+                `fastccg.vector_store.metadata_index` for the supported operators.
 
         Returns:
             A list of tuples, where each tuple contains the document ID, 
@@ -32,6 +102,29 @@ class VectorStoreBase(ABC):
         """
         pass
 
+    def similarity_search_batch(
+        self, query_vectors: List[List[float]], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[str, float, Dict[str, Any]]]]:
+        """
+        Performs a similarity search for several queries at once.
+
+        Stores that can score many queries together (for example with a single
+        matrix-matrix product) should override this. The default implementation
+        calls `similarity_search` once per query.
+
+        Args:
+            query_vectors: The vector embeddings of the queries.
+            top_k: The number of top results to return per query.
+            filter: Optional metadata conditions applied to every query.
+
+        Returns:
+            One result list per query, in the same order as `query_vectors`,
+            each formatted like the result of `similarity_search`.
+        """
+        if filter is None:
+            return [self.similarity_search(query_vector, top_k=top_k) for query_vector in query_vectors]
+        return [self.similarity_search(query_vector, top_k=top_k, filter=filter) for query_vector in query_vectors]
+
     @abstractmethod
     def save(self, filepath: str, pretty_print: bool = False) -> None:
         """Saves the vector store to a file."""
@@ -0,0 +1,383 @@
+import heapq
+import json
+import math
+import os
+import random
+from typing import List, Dict, Any, Iterator, Tuple, Optional
+
+import numpy as np
+
+from .base import VectorStoreBase
+from .fcvs import read_fcvs
+from .metadata_index import MetadataIndex
+
+
+class HNSWVectorStore(VectorStoreBase):
+    """
+    An approximate nearest neighbour vector store based on a Hierarchical
+    Navigable Small World (HNSW) graph.
+
+    Searches only visit a small neighbourhood of the graph instead of scanning
+    every vector, which keeps query latency low on corpora with millions of
+    documents at the cost of a (tunable) loss in recall.
+
+    The store is saved as a regular `.fcvs` file plus a `<filepath>.hnsw`
+    sidecar holding the graph. Loading a plain `.fcvs` file without a sidecar,
+    or with a sidecar for other documents, rebuilds the graph from its vectors.
+
+    Deleted documents stay in the graph as tombstones, so searches can still
+    route through them but never return them. Once more than
+    `compaction_threshold` of the nodes are tombstones, the graph is rebuilt
+    from the remaining documents.
+    """
+
+    #: The fraction of tombstoned nodes that triggers an automatic `compact()`.
+    compaction_threshold: float = 0.25
+
+    def __init__(self, M: int = 16, ef_construction: int = 200, ef_search: int = 50, seed: Optional[int] = None):
+        """
+        Initializes the HNSW store.
+
+        Args:
+            M: The number of neighbours each node links to per layer (twice as many on layer 0).
+            ef_construction: The size of the candidate list used while inserting documents.
+            ef_search: The size of the candidate list used while searching. Higher is slower but more accurate.
+            seed: Optional seed for the random level assignment, for reproducible graphs.
+        """
+        if M < 2:
+            raise ValueError("M must be at least 2.")
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self._level_mult = 1 / math.log(M)
+        self._rng = random.Random(seed)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: List[str] = []
+        self._id_to_node: Dict[str, int] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        # Unit-normalized vectors, so cosine similarity is a dot product.
+        self._vectors: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        self._norms: np.ndarray = np.empty(0, dtype=np.float32)
+        self._deleted: np.ndarray = np.zeros(0, dtype=bool)
+        self._num_deleted = 0
+        # _links[node][level] is the list of neighbour nodes on that level.
+        self._links: List[List[List[int]]] = []
+        self._entry_point: Optional[int] = None
+        self._max_level = -1
+        self._metadata_index: Optional[MetadataIndex] = None
+
+    def __len__(self) -> int:
+        return len(self._id_to_node)
+
+    @property
+    def dimensions(self) -> int:
+        """The dimensionality of the stored vectors (0 while the store is empty)."""
+        return self._vectors.shape[1]
+
+    def _normalize(self, vector: List[float]) -> Tuple[np.ndarray, float]:
+        row = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if self._ids and row.shape[0] != self.dimensions:
+            raise ValueError(
+                f"Vector has {row.shape[0]} dimensions, but the store holds {self.dimensions}-dimensional vectors."
+            )
+        norm = float(np.linalg.norm(row))
+        return (row / norm if norm else row), norm
+
+    def _max_links(self, level: int) -> int:
+        return self.M * 2 if level == 0 else self.M
+
+    def _random_level(self) -> int:
+        return int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+
+    # --- Graph Search --- #
+
+    def _distances(self, query: np.ndarray, nodes: List[int]) -> np.ndarray:
+        return 1.0 - self._vectors[nodes] @ query
+
+    def _search_layer(self, query: np.ndarray, entry_points: List[int], ef: int, level: int) -> List[Tuple[float, int]]:
+        """Greedy best-first search on one layer. Returns up to `ef` (distance, node) pairs, closest first."""
+        visited = set(entry_points)
+        entry_distances = self._distances(query, entry_points)
+        candidates = [(float(d), node) for d, node in zip(entry_distances, entry_points)]
+        heapq.heapify(candidates)
+        # Max-heap of the best results found so far, stored with negated distances.
+        results = [(-d, node) for d, node in candidates]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if distance > -results[0][0] and len(results) >= ef:
+                break
+
+            neighbours = [n for n in self._links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+
+            for neighbour_distance, neighbour in zip(self._distances(query, neighbours).tolist(), neighbours):
+                if len(results) < ef or neighbour_distance < -results[0][0]:
+                    heapq.heappush(candidates, (neighbour_distance, neighbour))
+                    heapq.heappush(results, (-neighbour_distance, neighbour))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted((-d, node) for d, node in results)
+
+    def _select_neighbours(self, candidates: List[Tuple[float, int]], max_links: int) -> List[int]:
+        """Picks diverse neighbours: a candidate is kept only if it is closer to the base than to any kept neighbour."""
+        if len(candidates) <= 1:
+            return [node for _, node in candidates]
+
+        nodes = [node for _, node in candidates]
+        vectors = self._vectors[nodes]
+        pairwise = 1.0 - vectors @ vectors.T
+        selected: List[int] = []
+        for i, (distance, _) in enumerate(candidates):
+            if len(selected) >= max_links:
+                break
+            if selected and (pairwise[i, selected] < distance).any():
+                continue
+            selected.append(i)
+        return [nodes[i] for i in selected]
+
+    def _greedy_descend(self, query: np.ndarray, target_level: int) -> int:
+        """Walks down from the top layer to `target_level`, returning the closest node found."""
+        node = self._entry_point
+        assert node is not None  # Only called once the graph has nodes.
+        for level in range(self._max_level, target_level, -1):
+            node = self._search_layer(query, [node], 1, level)[0][1]
+        return node
+
+    # --- Insertion --- #
+
+    def _connect(self, node: int, level: int) -> None:
+        """Links a node into the graph on every layer up to `level`."""
+        query = self._vectors[node]
+        entry = self._greedy_descend(query, level)
+        entry_points = [entry]
+
+        for layer in range(min(level, self._max_level), -1, -1):
+            candidates = [c for c in self._search_layer(query, entry_points, self.ef_construction, layer) if c[1] != node]
+            max_links = self._max_links(layer)
+            neighbours = self._select_neighbours(candidates, max_links)
+            self._links[node][layer] = neighbours
+
+            for neighbour in neighbours:
+                links = self._links[neighbour][layer]
+                if node in links:
+                    continue
+                links.append(node)
+                if len(links) > max_links:
+                    distances = self._distances(self._vectors[neighbour], links)
+                    ranked = sorted(zip(distances.tolist(), links))
+                    self._links[neighbour][layer] = self._select_neighbours(ranked, max_links)
+
+            entry_points = [c[1] for c in candidates] or entry_points
+
+    def add(self, doc_id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Adds a document to the store and links it into the graph."""
+        row, norm = self._normalize(vector)
+        if self._metadata_index is not None:
+            node = self._id_to_node.get(doc_id, len(self._ids))
+            self._metadata_index.replace(node, self._metadata.get(doc_id), metadata or {})
+        self._metadata[doc_id] = metadata or {}
+
+        if doc_id in self._id_to_node:
+            # Update in place and re-link the node's outgoing edges.
+            node = self._id_to_node[doc_id]
+            self._vectors[node] = row
+            self._norms[node] = norm
+            if len(self._ids) > 1:
+                self._connect(node, len(self._links[node]) - 1)
+            return
+
+        node = len(self._ids)
+        if node == 0:
+            self._vectors = np.empty((0, row.shape[0]), dtype=np.float32)
+        if node == self._vectors.shape[0]:
+            # Grow geometrically so repeated inserts stay amortized O(1).
+            grown = np.empty((max(16, node * 2), row.shape[0]), dtype=np.float32)
+            grown[:node] = self._vectors[:node]
+            self._vectors = grown
+            self._norms = np.concatenate([self._norms, np.zeros(grown.shape[0] - node, dtype=np.float32)])
+            self._deleted = np.concatenate([self._deleted, np.zeros(grown.shape[0] - node, dtype=bool)])
+
+        self._vectors[node] = row
+        self._norms[node] = norm
+        self._ids.append(doc_id)
+        self._id_to_node[doc_id] = node
+
+        level = self._random_level()
+        self._links.append([[] for _ in range(level + 1)])
+
+        if self._entry_point is None:
+            self._entry_point, self._max_level = node, level
+            return
+
+        self._connect(node, level)
+        if level > self._max_level:
+            self._entry_point, self._max_level = node, level
+
+    def get_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the metadata of a document, or None if the store does not hold it."""
+        return self._metadata.get(doc_id)
+
+    def documents(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields the (doc_id, metadata) pair of every document in the store."""
+        yield from list(self._metadata.items())
+
+    def delete(self, doc_id: str) -> bool:
+        """
+        Deletes a document by tombstoning its node.
+
+        The node keeps its links so the graph stays navigable. The graph is
+        rebuilt without tombstones once more than `compaction_threshold` of the
+        nodes are deleted.
+        """
+        node = self._id_to_node.pop(doc_id, None)
+        if node is None:
+            return False
+
+        metadata = self._metadata.pop(doc_id, {})
+        if self._metadata_index is not None:
+            self._metadata_index.remove(node, metadata)
+        self._deleted[node] = True
+        self._num_deleted += 1
+        if self._num_deleted > self.compaction_threshold * len(self._ids):
+            self.compact()
+        return True
+
+    def compact(self) -> None:
+        """Rebuilds the graph from the documents that have not been deleted."""
+        if not self._num_deleted:
+            return
+        nodes = np.flatnonzero(~self._deleted[:len(self._ids)])
+        ids = [self._ids[node] for node in nodes.tolist()]
+        metadata: List[Optional[Dict[str, Any]]] = [self._metadata.get(doc_id, {}) for doc_id in ids]
+        raw = self._vectors[nodes] * self._norms[nodes, None]
+
+        self._reset()
+        self.add_many(ids, raw, metadata)
+
+    # --- Search --- #
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Returns the sorted nodes whose metadata matches the filter, building the metadata index if needed."""
+        if self._metadata_index is None:
+            self._metadata_index = MetadataIndex.build(
+                (node, self._metadata.get(doc_id, {})) for node, doc_id in enumerate(self._ids) if not self._deleted[node]
+            )
+        return self._metadata_index.rows(filter)
+
+    def _restricted_search(self, query: np.ndarray, top_k: int, nodes: np.ndarray) -> List[Tuple[float, int]]:
+        """
+        Searches only the given nodes, e.g. those matching a metadata filter or not deleted.
+
+        Small node sets are scored exactly. Large ones search the graph with a
+        candidate list widened by the inverse of their share of the graph, widening
+        further until `top_k` allowed nodes are found.
+        """
+        count = len(self._ids)
+        ef = max(self.ef_search, top_k)
+        if nodes.shape[0] <= ef * self.M:
+            distances = 1.0 - self._vectors[nodes] @ query
+            best = np.argsort(distances, kind="stable")[:top_k]
+            return [(float(distances[i]), int(nodes[i])) for i in best]
+
+        allowed = np.zeros(count, dtype=bool)
+        allowed[nodes] = True
+        ef = max(ef, math.ceil(top_k * count / nodes.shape[0]))
+        entry = self._greedy_descend(query, 0)
+        while True:
+            results = [(d, node) for d, node in self._search_layer(query, [entry], ef, 0) if allowed[node]]
+            if len(results) >= top_k or ef >= count:
+                return results[:top_k]
+            ef *= 2
+
+    def similarity_search(
+        self, query_vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Finds the approximately most similar documents to a query vector, optionally among those matching a metadata filter."""
+        if self._entry_point is None or top_k <= 0:
+            return []
+
+        query, norm = self._normalize(query_vector)
+        if norm == 0:
+            return []
+
+        if filter:
+            results = self._restricted_search(query, top_k, self._filter_rows(filter))
+        elif self._num_deleted:
+            results = self._restricted_search(query, top_k, np.flatnonzero(~self._deleted[:len(self._ids)]))
+        else:
+            entry = self._greedy_descend(query, 0)
+            results = self._search_layer(query, [entry], max(self.ef_search, top_k), 0)
+        return [
+            (self._ids[node], 1.0 - distance, self._metadata.get(self._ids[node], {}))
+            for distance, node in results[:top_k]
+        ]
+
+    # --- Persistence --- #
+
+    def save(self, filepath: str, pretty_print: bool = False) -> None:
+        """Saves the documents to an `.fcvs` file and the graph to a `.hnsw` sidecar, compacting deleted documents first."""
+        self.compact()
+        count = len(self._ids)
+        vectors = (self._vectors[:count] * self._norms[:count, None]).tolist()
+        store = {doc_id: (vectors[node], self._metadata.get(doc_id, {})) for node, doc_id in enumerate(self._ids)}
+        graph = {
+            "M": self.M,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "ids": self._ids,
+            "links": self._links,
+            "entry_point": self._entry_point,
+            "max_level": self._max_level,
+        }
+        indent = 4 if pretty_print else None
+        with open(filepath, 'w') as f:
+            json.dump(store, f, indent=indent)
+        with open(filepath + ".hnsw", 'w') as f:
+            json.dump(graph, f, indent=indent)
+
+    def load(self, filepath: str) -> None:
+        """Loads the store from a JSON or binary `.fcvs` file, rebuilding the graph if no matching `.hnsw` sidecar exists."""
+        ids, raw, _, metadata = read_fcvs(filepath, mmap=False)
+
+        self._reset()
+        graph_path = filepath + ".hnsw"
+        graph = None
+        if os.path.exists(graph_path):
+            with open(graph_path, 'r') as f:
+                graph = json.load(f)
+        # A sidecar left over from another save of the file doesn't describe these documents.
+        if graph is None or len(graph["ids"]) != len(ids) or set(graph["ids"]) != set(ids):
+            for doc_id, vector, doc_metadata in zip(ids, raw, metadata):
+                self.add(doc_id, vector, doc_metadata)
+            return
+
+        if graph["ids"] != ids:
+            order = {doc_id: row for row, doc_id in enumerate(ids)}
+            rows = [order[doc_id] for doc_id in graph["ids"]]
+            ids, raw, metadata = graph["ids"], raw[rows], [metadata[row] for row in rows]
+
+        self.M = graph["M"]
+        self.ef_construction = graph["ef_construction"]
+        self.ef_search = graph["ef_search"]
+        self._level_mult = 1 / math.log(self.M)
+        self._ids = ids
+        self._id_to_node = {doc_id: node for node, doc_id in enumerate(ids)}
+        self._metadata = dict(zip(ids, metadata))
+        self._links = graph["links"]
+        self._entry_point = graph["entry_point"]
+        self._max_level = graph["max_level"]
+        if self._ids:
+            raw = raw.astype(np.float32, copy=False)
+            self._norms = np.linalg.norm(raw, axis=1).astype(np.float32)
+            self._vectors = np.divide(raw, self._norms[:, None], out=np.zeros_like(raw), where=self._norms[:, None] != 0)
+            self._deleted = np.zeros(len(self._ids), dtype=bool)
@@ -1,51 +1,393 @@
-import math
 import json
-from typing import List, Dict, Any, Tuple, Optional
+import os
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Union
+
+import numpy as np
 
 from .base import VectorStoreBase
+from .fcvs import is_binary_fcvs, read_fcvs, read_header, write_fcvs
+from .metadata_index import MetadataIndex
+from .wal import WriteAheadLog, decode_vector, delete_record, upsert_record, wal_path
 
 
 class InMemoryVectorStore(VectorStoreBase):
-    """An in-memory vector store for simple RAG applications."""
+    """
+    An in-memory vector store for simple RAG applications.
+
+    Vectors are kept in a contiguous float32 matrix with precomputed row norms,
+    so a search is a single matrix-vector product followed by a top-k selection.
+    The matrix grows geometrically, so inserts (and `add_many` batches) append in
+    amortized O(1) per row instead of re-allocating the matrix.
+    Stores loaded from a binary `.fcvs` file memory-map their vectors until the
+    first write.
+
+    Searches can be restricted with a metadata `filter`. The filter is resolved
+    against an inverted metadata index (built on the first filtered search and
+    kept up to date afterwards), and only the matching rows are scored.
+
+    Deleted documents are tombstoned in a bitmap that searches skip. Once more
+    than `compaction_threshold` of the rows are tombstones, the matrix is
+    compacted to reclaim their space.
+
+    `save(..., incremental=True)` appends only the changes made since the last
+    save to a write-ahead log beside the snapshot, which `load` replays and
+    `checkpoint` folds back into the snapshot.
+    """
+
+    #: The fraction of tombstoned rows that triggers an automatic `compact()`.
+    compaction_threshold: float = 0.25
 
     def __init__(self):
-        self._vectors: Dict[str, List[float]] = {}
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        # Only the first len(self._ids) rows of the matrix and norms are in use; the rest is spare capacity.
+        self._matrix: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        self._norms: np.ndarray = np.empty(0, dtype=np.float32)
+        # Tombstones: rows whose document was deleted but whose space is not yet reclaimed.
+        self._deleted: np.ndarray = np.zeros(0, dtype=bool)
+        self._num_deleted = 0
         self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._metadata_index: Optional[MetadataIndex] = None
+        # Ids changed since the last save: True for inserts/updates, False for deletes.
+        self._pending: Dict[str, bool] = {}
+        # (filepath, binary, dtype) of the snapshot this store was last saved to or loaded from.
+        self._snapshot: Optional[Tuple[str, bool, str]] = None
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    @property
+    def dimensions(self) -> int:
+        """The dimensionality of the stored vectors (0 while the store is empty)."""
+        return self._matrix.shape[1]
+
+    def _as_row(self, vector: List[float]) -> np.ndarray:
+        """Converts a vector to a float32 row, checking it against the store's dimensions."""
+        row = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if self._ids and row.shape[0] != self.dimensions:
+            raise ValueError(
+                f"Vector has {row.shape[0]} dimensions, but the store holds {self.dimensions}-dimensional vectors."
+            )
+        return row
+
+    def _ensure_writable(self) -> None:
+        """Copies memory-mapped (read-only) vectors into memory before they are modified."""
+        if not self._matrix.flags.writeable or self._matrix.dtype != np.float32:
+            self._matrix = np.array(self._matrix, dtype=np.float32)
+
+    def _reserve(self, rows: int, dimensions: int) -> None:
+        """Makes room for `rows` rows, growing the matrix, norms and tombstones geometrically."""
+        if self._matrix.shape[0] == 0 and self._matrix.shape[1] != dimensions:
+            self._matrix = np.empty((0, dimensions), dtype=np.float32)
+        if rows <= self._matrix.shape[0]:
+            return
+        capacity = max(16, rows, self._matrix.shape[0] * 2)
+        count = len(self._ids)
+        matrix = np.empty((capacity, dimensions), dtype=np.float32)
+        matrix[:count] = self._matrix[:count]
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[:count] = self._norms[:count]
+        deleted = np.zeros(capacity, dtype=bool)
+        deleted[:count] = self._deleted[:count]
+        self._matrix, self._norms, self._deleted = matrix, norms, deleted
+
+    def _used(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The matrix and norms rows that hold documents, without spare capacity."""
+        count = len(self._ids)
+        return self._matrix[:count], self._norms[:count]
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Returns the sorted rows whose metadata matches the filter, building the metadata index if needed."""
+        if self._metadata_index is None:
+            self._metadata_index = MetadataIndex.build(
+                (row, self._metadata.get(doc_id, {})) for row, doc_id in enumerate(self._ids) if not self._deleted[row]
+            )
+        return self._metadata_index.rows(filter)
 
     def add(self, doc_id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
-        """Adds a document and its vector to the store."""
-        self._vectors[doc_id] = vector
+        """Adds a document and its vector to the store, overwriting any existing entry."""
+        row = self._as_row(vector)
+        norm = np.linalg.norm(row)
+
+        if doc_id not in self._id_to_row:
+            self._reserve(len(self._ids) + 1, row.shape[0])
+            self._id_to_row[doc_id] = len(self._ids)
+            self._ids.append(doc_id)
+        self._ensure_writable()
+
+        index = self._id_to_row[doc_id]
+        self._matrix[index] = row
+        self._norms[index] = norm
+        if self._metadata_index is not None:
+            self._metadata_index.replace(index, self._metadata.get(doc_id), metadata or {})
         self._metadata[doc_id] = metadata or {}
+        self._pending[doc_id] = True
+
+    def add_many(
+        self,
+        ids: List[str],
+        vectors: Union[List[List[float]], np.ndarray],
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """
+        Adds many documents with one vectorized copy into the matrix.
+
+        `vectors` may also be a (count, dimensions) array. Existing ids are
+        overwritten in place, and when an id repeats within the batch its last
+        occurrence wins.
+        """
+        ids = list(ids)
+        block = np.asarray(vectors, dtype=np.float32)
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        if block.ndim != 2 or block.shape[0] != len(ids) or len(metadatas) != len(ids):
+            raise ValueError("add_many expects one vector and one metadata entry per id.")
+        if not ids:
+            return
+        if self._ids and block.shape[1] != self.dimensions:
+            raise ValueError(
+                f"Vectors have {block.shape[1]} dimensions, but the store holds {self.dimensions}-dimensional vectors."
+            )
+
+        latest = {doc_id: i for i, doc_id in enumerate(ids)}
+        positions = np.fromiter(latest.values(), dtype=np.int64, count=len(latest))
+        # Growing first avoids copying memory-mapped vectors twice.
+        self._reserve(len(self._ids) + len(latest), block.shape[1])
+        self._ensure_writable()
+
+        rows = np.empty(len(latest), dtype=np.int64)
+        for n, (doc_id, i) in enumerate(latest.items()):
+            row = self._id_to_row.get(doc_id)
+            if row is None:
+                row = len(self._ids)
+                self._id_to_row[doc_id] = row
+                self._ids.append(doc_id)
+            rows[n] = row
+            metadata = metadatas[i] or {}
+            if self._metadata_index is not None:
+                self._metadata_index.replace(row, self._metadata.get(doc_id), metadata)
+            self._metadata[doc_id] = metadata
+            self._pending[doc_id] = True
+
+        self._matrix[rows] = block[positions]
+        self._norms[rows] = np.linalg.norm(block[positions], axis=1)
+
+    def get_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the metadata of a document, or None if the store does not hold it."""
+        return self._metadata.get(doc_id)
+
+    def documents(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields the (doc_id, metadata) pair of every document in the store."""
+        yield from list(self._metadata.items())
+
+    def delete(self, doc_id: str) -> bool:
+        """
+        Deletes a document by tombstoning its row.
+
+        The row is skipped by searches immediately and its space is reclaimed by
+        the next compaction, which runs automatically once more than
+        `compaction_threshold` of the rows are tombstones.
+        """
+        row = self._id_to_row.pop(doc_id, None)
+        if row is None:
+            return False
+
+        metadata = self._metadata.pop(doc_id, {})
+        if self._metadata_index is not None:
+            self._metadata_index.remove(row, metadata)
+        self._deleted[row] = True
+        self._num_deleted += 1
+        self._pending[doc_id] = False
+        if self._num_deleted > self.compaction_threshold * len(self._ids):
+            self.compact()
+        return True
+
+    def compact(self) -> None:
+        """Reclaims the rows of deleted documents, renumbering the remaining rows."""
+        if not self._num_deleted:
+            return
+        live = np.flatnonzero(~self._deleted[:len(self._ids)])
+        self._matrix = np.array(self._matrix[live], dtype=np.float32)
+        self._norms = self._norms[live]
+        self._ids = [self._ids[row] for row in live.tolist()]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._deleted = np.zeros(len(self._ids), dtype=bool)
+        self._num_deleted = 0
+        self._metadata_index = None
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculates cosine similarity between two vectors."""
-        dot_product = sum(v1 * v2 for v1, v2 in zip(vec1, vec2))
-        norm_vec1 = math.sqrt(sum(v**2 for v in vec1))
-        norm_vec2 = math.sqrt(sum(v**2 for v in vec2))
-        
-        if norm_vec1 == 0 or norm_vec2 == 0:
-            return 0.0
-        
-        return dot_product / (norm_vec1 * norm_vec2)
-
-    def similarity_search(self, query_vector: List[float], top_k: int = 5) -> List[Tuple[str, float, Dict[str, Any]]]:
-        """Finds the most similar documents to a query vector."""
-        if not self._vectors:
+    def _scores(self, query_vector: List[float], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Calculates cosine similarity between the query and every stored vector, or only the given rows."""
+        query = self._as_row(query_vector)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return np.zeros(len(self._ids) if rows is None else rows.shape[0], dtype=np.float32)
+
+        matrix, norms = self._used() if rows is None else (self._matrix[rows], self._norms[rows])
+        dots = matrix @ query
+        denominators = norms * query_norm
+        # Zero-norm rows score 0.0 instead of producing NaNs.
+        return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators != 0)
+
+    def _score_matrix(self, query_vectors: List[List[float]], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Calculates cosine similarities for a block of queries with one matrix-matrix product."""
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dimensions:
+            raise ValueError(f"Expected query vectors with {self.dimensions} dimensions.")
+
+        matrix, norms = self._used() if rows is None else (self._matrix[rows], self._norms[rows])
+        dots = queries @ matrix.T
+        denominators = np.linalg.norm(queries, axis=1)[:, None] * norms[None, :]
+        return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators != 0)
+
+    @staticmethod
+    def _top_k_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Returns the row indices of the `top_k` highest scores, best first."""
+        top_k = min(top_k, scores.shape[0])
+        if top_k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if top_k < scores.shape[0]:
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def similarity_search(
+        self, query_vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Finds the most similar documents to a query vector, optionally among those matching a metadata filter."""
+        if not self._id_to_row:
+            return []
+
+        rows = None if not filter else self._filter_rows(filter)
+        if rows is not None and rows.shape[0] == 0:
             return []
 
-        # Calculate similarities for all documents
-        similarities = []
-        for doc_id, vector in self._vectors.items():
-            score = self._cosine_similarity(query_vector, vector)
-            similarities.append((doc_id, score, self._metadata.get(doc_id, {})))
+        scores = self._scores(query_vector, rows)
+        if rows is None and self._num_deleted:
+            scores[self._deleted[:len(self._ids)]] = -np.inf
+        best = self._top_k_rows(scores, min(top_k, len(self)))
+        doc_rows = best if rows is None else rows[best]
+        return [
+            (self._ids[row], float(scores[i]), self._metadata.get(self._ids[row], {}))
+            for i, row in zip(best.tolist(), doc_rows.tolist())
+        ]
+
+    def similarity_search_batch(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None,
+        batch_size: int = 256,
+    ) -> List[List[Tuple[str, float, Dict[str, Any]]]]:
+        """
+        Finds the most similar documents for several query vectors at once.
+
+        Queries are scored in blocks of `batch_size` with a single matrix-matrix
+        product per block, which bounds the temporary score matrix to
+        `batch_size x len(store)` floats. A metadata `filter` is resolved once
+        and applied to every query.
+        """
+        rows = None if not filter or not self._id_to_row else self._filter_rows(filter)
+        if not self._id_to_row or len(query_vectors) == 0 or (rows is not None and rows.shape[0] == 0):
+            return [[] for _ in range(len(query_vectors))]
+
+        top_k = min(top_k, len(self) if rows is None else rows.shape[0])
+        deleted = self._deleted[:len(self._ids)] if rows is None and self._num_deleted else None
+        results: List[List[Tuple[str, float, Dict[str, Any]]]] = []
+        for start in range(0, len(query_vectors), batch_size):
+            scores = self._score_matrix(query_vectors[start:start + batch_size], rows)
+            if deleted is not None:
+                scores[:, deleted] = -np.inf
+            if top_k <= 0:
+                results.extend([] for _ in range(scores.shape[0]))
+                continue
+            if top_k < scores.shape[1]:
+                candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            else:
+                candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            order = np.argsort(-candidate_scores, axis=1, kind="stable")
+            best = np.take_along_axis(candidates, order, axis=1)
+            best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            if rows is not None:
+                best = rows[best]
+            for query_rows, query_scores in zip(best.tolist(), best_scores.tolist()):
+                results.append([
+                    (self._ids[row], score, self._metadata.get(self._ids[row], {}))
+                    for row, score in zip(query_rows, query_scores)
+                ])
+        return results
+
+    def save(
+        self,
+        filepath: str,
+        pretty_print: bool = False,
+        binary: bool = False,
+        dtype: str = "float32",
+        incremental: bool = False,
+    ) -> None:
+        """
+        Saves the vector store to a file.
+
+        Args:
+            filepath: The path to the file where the store will be saved.
+            pretty_print: If True, indents the JSON output. Ignored for binary files.
+            binary: If True, writes the compact binary (v2) layout instead of JSON.
+            dtype: The vector element type for binary files: 'float32' or 'float16'.
+            incremental: If True and the store was last saved to or loaded from `filepath`,
+                only the documents changed since then are appended to the `<filepath>.wal`
+                write-ahead log, instead of rewriting the snapshot. Otherwise a full
+                snapshot is written.
 
-        # Sort by similarity score in descending order and return the top_k results
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:top_k]
+        A full save compacts deleted documents away and removes any write-ahead log,
+        since the new snapshot already contains its changes.
+        """
+        if incremental and self._snapshot is not None and self._snapshot[0] == filepath and os.path.exists(filepath):
+            self._append_log(filepath)
+            return
 
-    def save(self, filepath: str, pretty_print: bool = False) -> None:
-        """Saves the vector store to a file using JSON serialization."""
-        store = {doc_id: (self._vectors[doc_id], self._metadata.get(doc_id, {})) for doc_id in self._vectors}
+        self._write_snapshot(filepath, pretty_print=pretty_print, binary=binary, dtype=dtype)
+        WriteAheadLog(wal_path(filepath)).clear()
+        self._snapshot = (filepath, binary, dtype)
+        self._pending.clear()
+
+    def _append_log(self, filepath: str) -> None:
+        """Appends the documents changed since the last save to the snapshot's write-ahead log."""
+        records = []
+        for doc_id, present in self._pending.items():
+            if present:
+                row = self._id_to_row[doc_id]
+                records.append(upsert_record(doc_id, self._matrix[row], self._metadata.get(doc_id)))
+            else:
+                records.append(delete_record(doc_id))
+        WriteAheadLog(wal_path(filepath)).append(records)
+        self._pending.clear()
+
+    def checkpoint(self) -> None:
+        """
+        Folds the write-ahead log into a new snapshot.
+
+        Rewrites the snapshot the store was last saved to or loaded from, in the
+        same layout, and removes its write-ahead log.
+        """
+        if self._snapshot is None:
+            raise ValueError("checkpoint() requires a store that was saved to or loaded from a file.")
+        filepath, binary, dtype = self._snapshot
+        self.save(filepath, binary=binary, dtype=dtype)
+
+    def _write_snapshot(self, filepath: str, pretty_print: bool, binary: bool, dtype: str) -> None:
+        """Writes every document to a JSON or binary `.fcvs` snapshot."""
+        self.compact()
+        if binary:
+            metadata = [self._metadata.get(doc_id, {}) for doc_id in self._ids]
+            matrix, norms = self._used()
+            write_fcvs(filepath, self._ids, matrix, metadata, norms=norms, dtype=dtype)
+            return
+
+        store = {
+            doc_id: (self._matrix[row].tolist(), self._metadata.get(doc_id, {}))
+            for row, doc_id in enumerate(self._ids)
+        }
         with open(filepath, 'w') as f:
             if pretty_print:
                 json.dump(store, f, indent=4)
@@ -53,8 +395,49 @@ class InMemoryVectorStore(VectorStoreBase):
                 json.dump(store, f)
 
     def load(self, filepath: str) -> None:
-        """Loads the vector store from a file."""
-        with open(filepath, 'r') as f:
-            store = json.load(f)
-            self._vectors = {doc_id: vector for doc_id, (vector, _) in store.items()}
-            self._metadata = {doc_id: metadata for doc_id, (_, metadata) in store.items()}
+        """
+        Loads the vector store from a JSON or binary `.fcvs` file, memory-mapping binary vectors.
+
+        Changes recorded in a `<filepath>.wal` write-ahead log are replayed over the snapshot.
+        """
+        ids, vectors, norms, metadata = read_fcvs(filepath, mmap=True)
+
+        self._ids = ids
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._metadata = dict(zip(ids, metadata))
+        self._metadata_index = None
+        self._matrix = vectors
+        if norms is None:
+            norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+        self._norms = norms
+        self._deleted = np.zeros(len(ids), dtype=bool)
+        self._num_deleted = 0
+
+        binary = is_binary_fcvs(filepath)
+        dtype = "float16" if binary and read_header(filepath).dtype == np.float16 else "float32"
+        self._replay_log(wal_path(filepath))
+        self._snapshot = (filepath, binary, dtype)
+        self._pending = {}
+
+    def _replay_log(self, path: str) -> None:
+        """Applies the records of a write-ahead log, batching consecutive upserts into `add_many` calls."""
+        ids: List[str] = []
+        vectors: List[Any] = []
+        metadatas: List[Optional[Dict[str, Any]]] = []
+
+        def flush() -> None:
+            if ids:
+                self.add_many(ids, vectors, metadatas)
+                ids.clear()
+                vectors.clear()
+                metadatas.clear()
+
+        for record in WriteAheadLog(path).replay():
+            if record["op"] == "upsert":
+                ids.append(record["id"])
+                vectors.append(decode_vector(record))
+                metadatas.append(record.get("metadata"))
+            else:
+                flush()
+                self.delete(record["id"])
+        flush()
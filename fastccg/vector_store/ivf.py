@@ -0,0 +1,370 @@
+import json
+import os
+from typing import List, Dict, Any, Iterator, Tuple, Optional
+
+import numpy as np
+
+from .base import VectorStoreBase
+from .fcvs import read_fcvs
+from .metadata_index import MetadataIndex
+from .quantization import kmeans
+
+
+class IVFVectorStore(VectorStoreBase):
+    """
+    An inverted-file (IVF) vector store.
+
+    Once trained, vectors are partitioned into `n_lists` lists by k-means over
+    their directions, and a query only scans the `nprobe` lists whose centroids
+    are closest to it. Beyond the raw vectors, the index only costs one centroid
+    per list and one list assignment per document.
+
+    Until `train()` is called the store behaves like an exact, brute-force
+    store. The store is saved as a regular `.fcvs` file plus a `<filepath>.ivf`
+    sidecar holding the centroids and list assignments.
+
+    Deleted documents are removed from their list and tombstoned, and their
+    rows are reclaimed once more than `compaction_threshold` of the rows are
+    tombstones.
+    """
+
+    #: The fraction of tombstoned rows that triggers an automatic `compact()`.
+    compaction_threshold: float = 0.25
+
+    def __init__(self, n_lists: Optional[int] = None, nprobe: int = 8, seed: Optional[int] = None):
+        """
+        Initializes the IVF store.
+
+        Args:
+            n_lists: The number of k-means partitions. Defaults to sqrt(number of documents) at training time.
+            nprobe: The number of closest lists scanned per query. Higher is slower but more accurate.
+            seed: Optional seed for the k-means initialization, for reproducible indexes.
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.seed = seed
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        # Unit-normalized vectors, so cosine similarity is a dot product.
+        self._vectors: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        self._norms: np.ndarray = np.empty(0, dtype=np.float32)
+        self._deleted: np.ndarray = np.zeros(0, dtype=bool)
+        self._num_deleted = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: np.ndarray = np.empty(0, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+        self._metadata_index: Optional[MetadataIndex] = None
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    @property
+    def dimensions(self) -> int:
+        """The dimensionality of the stored vectors (0 while the store is empty)."""
+        return self._vectors.shape[1]
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether k-means centroids have been trained for this store."""
+        return self._centroids is not None
+
+    def _trained_centroids(self) -> np.ndarray:
+        """Returns the centroids, raising a clear error before the store was trained."""
+        if self._centroids is None:
+            raise ValueError("IVFVectorStore is not trained yet; call train() first.")
+        return self._centroids
+
+    def _normalize(self, vector: List[float]) -> Tuple[np.ndarray, float]:
+        row = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if self._ids and row.shape[0] != self.dimensions:
+            raise ValueError(
+                f"Vector has {row.shape[0]} dimensions, but the store holds {self.dimensions}-dimensional vectors."
+            )
+        norm = float(np.linalg.norm(row))
+        return (row / norm if norm else row), norm
+
+    # --- Lists --- #
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Returns the index of the closest centroid for each row."""
+        centroids = self._trained_centroids()
+        assignments = np.empty(vectors.shape[0], dtype=np.int32)
+        for start in range(0, vectors.shape[0], chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    def _rebuild_lists(self) -> None:
+        self._lists = [[] for _ in range(self._trained_centroids().shape[0])]
+        for row, list_id in enumerate(self._assignments[:len(self._ids)].tolist()):
+            if list_id >= 0:
+                self._lists[list_id].append(row)
+        self._list_arrays = [None] * len(self._lists)
+
+    def _move_to_list(self, row: int, list_id: int) -> None:
+        old = int(self._assignments[row])
+        if old == list_id:
+            return
+        if old >= 0:
+            self._lists[old].remove(row)
+            self._list_arrays[old] = None
+        self._assignments[row] = list_id
+        self._lists[list_id].append(row)
+        self._list_arrays[list_id] = None
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_arrays[list_id]
+        if rows is None:
+            rows = self._list_arrays[list_id] = np.asarray(self._lists[list_id], dtype=np.int64)
+        return rows
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Returns the sorted rows whose metadata matches the filter, building the metadata index if needed."""
+        if self._metadata_index is None:
+            self._metadata_index = MetadataIndex.build(
+                (row, self._metadata.get(doc_id, {})) for row, doc_id in enumerate(self._ids) if not self._deleted[row]
+            )
+        return self._metadata_index.rows(filter)
+
+    # --- Training --- #
+
+    def train(self, n_lists: Optional[int] = None, iterations: int = 20, max_training_points: int = 256) -> None:
+        """
+        Trains the k-means centroids on the vectors added so far and assigns every document to a list.
+
+        Args:
+            n_lists: Overrides the number of lists configured on the store.
+            iterations: The number of k-means iterations.
+            max_training_points: Centroids are trained on at most this many points per list,
+                sampled from the store; every document is still assigned afterwards.
+        """
+        self.compact()
+        count = len(self._ids)
+        if count == 0:
+            raise ValueError("Cannot train an empty IVFVectorStore.")
+
+        n_lists = n_lists or self.n_lists or max(1, int(np.sqrt(count)))
+        n_lists = min(n_lists, count)
+        self.n_lists = n_lists
+
+        rng = np.random.default_rng(self.seed)
+        vectors = self._vectors[:count]
+        sample_size = min(count, n_lists * max_training_points)
+        sample = vectors[rng.choice(count, size=sample_size, replace=False)] if sample_size < count else vectors
+
+        self._centroids = kmeans(sample, n_lists, iterations=iterations, rng=rng, spherical=True)
+        self._assignments[:count] = self._assign(vectors)
+        self._rebuild_lists()
+
+    # --- Store API --- #
+
+    def add(self, doc_id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Adds a document to the store, assigning it to its closest list if the store is trained."""
+        row_vector, norm = self._normalize(vector)
+
+        if doc_id in self._id_to_row:
+            row = self._id_to_row[doc_id]
+        else:
+            row = len(self._ids)
+            if row == 0:
+                self._vectors = np.empty((0, row_vector.shape[0]), dtype=np.float32)
+            if row == self._vectors.shape[0]:
+                # Grow geometrically so repeated inserts stay amortized O(1).
+                capacity = max(16, row * 2)
+                grown = np.empty((capacity, row_vector.shape[0]), dtype=np.float32)
+                grown[:row] = self._vectors[:row]
+                self._vectors = grown
+                self._norms = np.concatenate([self._norms, np.zeros(capacity - row, dtype=np.float32)])
+                self._assignments = np.concatenate([self._assignments, np.full(capacity - row, -1, dtype=np.int32)])
+                self._deleted = np.concatenate([self._deleted, np.zeros(capacity - row, dtype=bool)])
+            self._ids.append(doc_id)
+            self._id_to_row[doc_id] = row
+
+        if self._metadata_index is not None:
+            self._metadata_index.replace(row, self._metadata.get(doc_id), metadata or {})
+        self._metadata[doc_id] = metadata or {}
+        self._vectors[row] = row_vector
+        self._norms[row] = norm
+        if self.is_trained:
+            self._move_to_list(row, int(np.argmax(self._centroids @ row_vector)))
+
+    def get_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the metadata of a document, or None if the store does not hold it."""
+        return self._metadata.get(doc_id)
+
+    def documents(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields the (doc_id, metadata) pair of every document in the store."""
+        yield from list(self._metadata.items())
+
+    def delete(self, doc_id: str) -> bool:
+        """Deletes a document, removing it from its list and tombstoning its row."""
+        row = self._id_to_row.pop(doc_id, None)
+        if row is None:
+            return False
+
+        metadata = self._metadata.pop(doc_id, {})
+        if self._metadata_index is not None:
+            self._metadata_index.remove(row, metadata)
+        list_id = int(self._assignments[row])
+        if list_id >= 0:
+            self._lists[list_id].remove(row)
+            self._list_arrays[list_id] = None
+            self._assignments[row] = -1
+        self._deleted[row] = True
+        self._num_deleted += 1
+        if self._num_deleted > self.compaction_threshold * len(self._ids):
+            self.compact()
+        return True
+
+    def compact(self) -> None:
+        """Reclaims the rows of deleted documents, renumbering the remaining rows and lists."""
+        if not self._num_deleted:
+            return
+        live = np.flatnonzero(~self._deleted[:len(self._ids)])
+        self._vectors = self._vectors[live]
+        self._norms = self._norms[live]
+        self._assignments = self._assignments[live]
+        self._ids = [self._ids[row] for row in live.tolist()]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._deleted = np.zeros(len(self._ids), dtype=bool)
+        self._num_deleted = 0
+        self._metadata_index = None
+        if self.is_trained:
+            self._rebuild_lists()
+
+    def similarity_search(
+        self, query_vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Finds the most similar documents among the `nprobe` closest lists.
+
+        With a metadata `filter`, only matching documents are scored. When the
+        filter matches fewer documents than the probed lists hold, the matching
+        documents are scanned exactly instead of probing lists.
+        """
+        if not self._id_to_row or top_k <= 0:
+            return []
+
+        query, _ = self._normalize(query_vector)
+        matching = None if not filter else self._filter_rows(filter)
+        if self._centroids is not None:
+            nprobe = min(self.nprobe, self._centroids.shape[0])
+            probed = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+            rows = np.concatenate([self._list_rows(list_id) for list_id in probed.tolist()])
+            if matching is not None:
+                if matching.shape[0] <= rows.shape[0]:
+                    rows = matching
+                else:
+                    rows = rows[np.isin(rows, matching, assume_unique=True)]
+        elif matching is not None:
+            rows = matching
+        elif self._num_deleted:
+            rows = np.flatnonzero(~self._deleted[:len(self._ids)])
+        else:
+            rows = np.arange(len(self._ids))
+
+        if rows.shape[0] == 0:
+            return []
+        scores = self._vectors[rows] @ query
+        top_k = min(top_k, rows.shape[0])
+        best = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < rows.shape[0] else np.arange(rows.shape[0])
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            (self._ids[row], float(scores[i]), self._metadata.get(self._ids[row], {}))
+            for i, row in zip(best.tolist(), rows[best].tolist())
+        ]
+
+    # --- Persistence --- #
+
+    def save(self, filepath: str, pretty_print: bool = False) -> None:
+        """Saves the documents to an `.fcvs` file and, if trained, the index to a `.ivf` sidecar, compacting deleted documents first."""
+        self.compact()
+        count = len(self._ids)
+        vectors = (self._vectors[:count] * self._norms[:count, None]).tolist()
+        store = {doc_id: (vectors[row], self._metadata.get(doc_id, {})) for row, doc_id in enumerate(self._ids)}
+        indent = 4 if pretty_print else None
+        with open(filepath, 'w') as f:
+            json.dump(store, f, indent=indent)
+
+        if self.is_trained:
+            self._save_index(filepath + ".ivf", indent=indent)
+
+    def _save_index(self, index_path: str, indent: Optional[int] = None) -> None:
+        index = {
+            "n_lists": self.n_lists,
+            "nprobe": self.nprobe,
+            "ids": self._ids,
+            "centroids": self._trained_centroids().tolist(),
+            "assignments": self._assignments[:len(self._ids)].tolist(),
+        }
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=indent)
+
+    def load(self, filepath: str) -> None:
+        """
+        Loads the store from a JSON or binary `.fcvs` file, restoring the index from its `.ivf` sidecar.
+
+        Without a sidecar matching the file's documents, the store is loaded untrained.
+        """
+        ids, raw, norms, metadata = read_fcvs(filepath, mmap=False)
+
+        self._reset()
+        index = None
+        if os.path.exists(filepath + ".ivf"):
+            with open(filepath + ".ivf", 'r') as f:
+                index = json.load(f)
+        # A sidecar left over from another save of the file doesn't describe these documents.
+        if index and (len(index["ids"]) != len(ids) or set(index["ids"]) != set(ids)):
+            index = None
+
+        if index and index["ids"] != ids:
+            order = {doc_id: row for row, doc_id in enumerate(ids)}
+            rows = [order[doc_id] for doc_id in index["ids"]]
+            ids, raw, metadata = index["ids"], raw[rows], [metadata[row] for row in rows]
+            norms = None if norms is None else norms[rows]
+
+        self._ids = ids
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._metadata = dict(zip(ids, metadata))
+        if not self._ids:
+            return
+
+        raw = raw.astype(np.float32, copy=False)
+        self._norms = np.linalg.norm(raw, axis=1).astype(np.float32) if norms is None else norms
+        self._vectors = np.divide(raw, self._norms[:, None], out=np.zeros_like(raw), where=self._norms[:, None] != 0)
+        self._assignments = np.full(len(self._ids), -1, dtype=np.int32)
+        self._deleted = np.zeros(len(self._ids), dtype=bool)
+
+        if index:
+            self.n_lists = index["n_lists"]
+            self.nprobe = index["nprobe"]
+            self._centroids = np.asarray(index["centroids"], dtype=np.float32)
+            self._assignments = np.asarray(index["assignments"], dtype=np.int32)
+            self._rebuild_lists()
+
+    @classmethod
+    def build(cls, fcvs_path: str, n_lists: Optional[int] = None, nprobe: int = 8, seed: Optional[int] = None) -> "IVFVectorStore":
+        """
+        Builds an IVF index offline from an existing `.fcvs` file and writes its `.ivf` sidecar.
+
+        Args:
+            fcvs_path: The path to the `.fcvs` file to index.
+            n_lists: The number of k-means partitions. Defaults to sqrt(number of documents).
+            nprobe: The default number of lists scanned per query, stored with the index.
+            seed: Optional seed for the k-means initialization.
+
+        Returns:
+            The trained store.
+        """
+        store = cls(n_lists=n_lists, nprobe=nprobe, seed=seed)
+        store.load(fcvs_path)
+        # Loading restores the parameters of an existing index, which this one replaces.
+        store.n_lists, store.nprobe = n_lists, nprobe
+        store.train()
+        store._save_index(fcvs_path + ".ivf")
+        return store
@@ -0,0 +1,219 @@
+"""
+Metadata filters and the inverted index that evaluates them.
+
+A filter is a dictionary mapping metadata fields to conditions. All
+conditions must match (logical AND):
+
+    {"tenant": "acme"}                                  # equality
+    {"source": {"$in": ["wiki", "docs"]}}               # any of several values
+    {"year": {"$gte": 2020, "$lt": 2024}}               # range
+    {"tenant": "acme", "date": {"$gte": "2024-01-01"}}  # combined
+
+Operators: `$eq`, `$in`, `$gt`, `$gte`, `$lt`, `$lte`. Range operators
+compare numbers with numbers and strings with strings (ISO dates sort
+correctly as strings). A list-valued metadata field matches if any of its
+elements matches. Booleans only match booleans: `True` does not match `1`.
+"""
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+_RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+OPERATORS = ("$eq", "$in") + _RANGE_OPERATORS
+
+
+def _kind(value: Any) -> Optional[str]:
+    """Groups values that can be range-compared with each other."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    return None
+
+
+def _key(value: Any) -> Tuple[Optional[str], Any]:
+    """The equality key of a value, which keeps booleans apart from the numbers they compare equal to."""
+    return _kind(value), value
+
+
+def _values(value: Any) -> List[Any]:
+    """The indexable values of a metadata field: list elements, or the value itself."""
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [v for v in values if _kind(v) is not None or v is None]
+
+
+def _conditions(condition: Any) -> Dict[str, Any]:
+    """Normalizes a field condition to an {operator: operand} dictionary."""
+    if isinstance(condition, dict):
+        unknown = [op for op in condition if op not in OPERATORS]
+        if unknown:
+            raise ValueError(f"Unsupported filter operator(s) {unknown}. Supported operators: {list(OPERATORS)}.")
+        return condition
+    return {"$eq": condition}
+
+
+def _in_range(value: Any, conditions: Dict[str, Any]) -> bool:
+    for op in _RANGE_OPERATORS:
+        if op not in conditions:
+            continue
+        bound = conditions[op]
+        if _kind(value) != _kind(bound) or _kind(value) is None:
+            return False
+        if op == "$gt" and not value > bound:
+            return False
+        if op == "$gte" and not value >= bound:
+            return False
+        if op == "$lt" and not value < bound:
+            return False
+        if op == "$lte" and not value <= bound:
+            return False
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Returns True if a document's metadata satisfies every condition of the filter."""
+    for field, condition in filter.items():
+        if field not in metadata:
+            return False
+        conditions = _conditions(condition)
+        values = _values(metadata[field])
+        keys = [_key(v) for v in values]
+        if "$eq" in conditions and _key(conditions["$eq"]) not in keys:
+            return False
+        if "$in" in conditions and not any(_key(v) in keys for v in conditions["$in"]):
+            return False
+        if any(op in conditions for op in _RANGE_OPERATORS) and not any(_in_range(v, conditions) for v in values):
+            return False
+    return True
+
+
+class MetadataIndex:
+    """
+    A per-field inverted index from metadata values to document rows.
+
+    Equality and `$in` conditions are answered from hash postings. Range
+    conditions bisect a sorted list of each field's distinct values, which is
+    rebuilt lazily after the field changes.
+    """
+
+    def __init__(self) -> None:
+        # field -> (kind, value) -> rows having that value
+        self._postings: Dict[str, Dict[Tuple[Optional[str], Any], Set[int]]] = {}
+        # field -> kind -> sorted distinct values; a field is absent while stale
+        self._sorted: Dict[str, Dict[str, List[Any]]] = {}
+
+    def add(self, row: int, metadata: Dict[str, Any]) -> None:
+        """Indexes the metadata of a document row."""
+        for field, value in metadata.items():
+            postings = self._postings.setdefault(field, {})
+            for item in _values(value):
+                key = _key(item)
+                rows = postings.get(key)
+                if rows is None:
+                    postings[key] = {row}
+                    self._sorted.pop(field, None)
+                else:
+                    rows.add(row)
+
+    def remove(self, row: int, metadata: Dict[str, Any]) -> None:
+        """Removes a document row previously indexed with `metadata`."""
+        for field, value in metadata.items():
+            postings = self._postings.get(field, {})
+            for item in _values(value):
+                key = _key(item)
+                rows = postings.get(key)
+                if rows is None:
+                    continue
+                rows.discard(row)
+                if not rows:
+                    del postings[key]
+                    self._sorted.pop(field, None)
+
+    def replace(self, row: int, old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> None:
+        """Re-indexes a row whose metadata changed from `old` (None for a new row) to `new`."""
+        if old is not None:
+            self.remove(row, old)
+        self.add(row, new)
+
+    def _sorted_values(self, field: str, kind: str) -> List[Any]:
+        by_kind = self._sorted.get(field)
+        if by_kind is None:
+            by_kind = {}
+            for value_kind, value in self._postings.get(field, {}):
+                if value_kind is not None:
+                    by_kind.setdefault(value_kind, []).append(value)
+            for values in by_kind.values():
+                values.sort()
+            self._sorted[field] = by_kind
+        return by_kind.get(kind, [])
+
+    def _range_rows(self, field: str, conditions: Dict[str, Any]) -> Set[int]:
+        bounds = [conditions[op] for op in _RANGE_OPERATORS if op in conditions]
+        kinds = {_kind(bound) for bound in bounds}
+        kind = kinds.pop() if len(kinds) == 1 else None
+        if kind is None:
+            raise ValueError(f"Range bounds for '{field}' must all be numbers or all be strings.")
+        values = self._sorted_values(field, kind)
+
+        start, end = 0, len(values)
+        if "$gt" in conditions:
+            start = max(start, bisect.bisect_right(values, conditions["$gt"]))
+        if "$gte" in conditions:
+            start = max(start, bisect.bisect_left(values, conditions["$gte"]))
+        if "$lt" in conditions:
+            end = min(end, bisect.bisect_left(values, conditions["$lt"]))
+        if "$lte" in conditions:
+            end = min(end, bisect.bisect_right(values, conditions["$lte"]))
+
+        postings = self._postings[field]
+        rows: Set[int] = set()
+        for value in values[start:end]:
+            rows |= postings[kind, value]
+        return rows
+
+    def _field_rows(self, field: str, condition: Any) -> Set[int]:
+        conditions = _conditions(condition)
+        postings = self._postings.get(field, {})
+        candidates: Optional[Set[int]] = None
+
+        def narrow(rows: Set[int]) -> None:
+            nonlocal candidates
+            candidates = set(rows) if candidates is None else candidates & rows
+
+        if "$eq" in conditions:
+            narrow(postings.get(_key(conditions["$eq"]), set()))
+        if "$in" in conditions:
+            rows: Set[int] = set()
+            for value in conditions["$in"]:
+                rows |= postings.get(_key(value), set())
+            narrow(rows)
+        if any(op in conditions for op in _RANGE_OPERATORS):
+            narrow(self._range_rows(field, conditions))
+        return candidates if candidates is not None else set()
+
+    def rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """
+        Returns the sorted rows whose metadata satisfies the filter.
+
+        An empty filter matches every document, including ones without
+        metadata, which the index doesn't know; stores skip the index for it.
+        """
+        result: Optional[Set[int]] = None
+        # Evaluate the most selective-looking conditions (equality) first so intersections stay small.
+        for field, condition in sorted(filter.items(), key=lambda item: isinstance(item[1], dict)):
+            rows = self._field_rows(field, condition)
+            result = rows if result is None else result & rows
+            if not result:
+                break
+        return np.fromiter(sorted(result or ()), dtype=np.int64)
+
+    @classmethod
+    def build(cls, metadata: Iterable[Tuple[int, Dict[str, Any]]]) -> "MetadataIndex":
+        """Builds an index from (row, metadata) pairs."""
+        index = cls()
+        for row, doc_metadata in metadata:
+            index.add(row, doc_metadata)
+        return index
@@ -0,0 +1,211 @@
+"""
+Vector quantizers for compact embedding storage.
+
+- `ScalarQuantizer` maps every dimension to an int8 code (4x smaller than float32).
+- `ProductQuantizer` splits vectors into sub-vectors and stores one byte per
+  sub-vector, the index of its nearest codebook centroid (up to 32x smaller or more).
+
+Both quantizers score a float32 query directly against the codes, without
+decoding the stored vectors.
+"""
+from typing import Dict, Optional, Tuple, Type, Union
+
+import numpy as np
+
+# Rows scored per block, to bound the temporary float32 arrays created while scoring.
+_SCORE_CHUNK = 65536
+
+
+def _trained(parameter: Optional[np.ndarray], quantizer: object) -> np.ndarray:
+    """Returns a trained parameter of a quantizer, raising a clear error before it was trained."""
+    if parameter is None:
+        raise ValueError(f"{type(quantizer).__name__} is not trained yet; call train() first.")
+    return parameter
+
+
+def kmeans(
+    data: np.ndarray,
+    k: int,
+    iterations: int = 20,
+    rng: Optional[np.random.Generator] = None,
+    spherical: bool = False,
+) -> np.ndarray:
+    """
+    Runs Lloyd's k-means and returns the (k, dimensions) float32 centroids.
+
+    Args:
+        data: The (n, dimensions) points to cluster.
+        k: The number of centroids. Must not exceed the number of points.
+        iterations: The number of assignment/update rounds.
+        rng: The random generator used for initialization and for re-seeding empty clusters.
+        spherical: If True, points are assumed unit-normalized, assignment uses the dot
+            product and centroids are re-normalized (k-means on directions).
+    """
+    rng = rng or np.random.default_rng()
+    data = np.asarray(data, dtype=np.float32)
+    centroids = data[rng.choice(data.shape[0], size=k, replace=False)].copy()
+
+    for _ in range(iterations):
+        if spherical:
+            labels = np.argmax(data @ centroids.T, axis=1)
+        else:
+            # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+            labels = np.argmax(data @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        counts = np.bincount(labels, minlength=k).astype(np.float32)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random points so no centroid is wasted.
+            sums[empty] = data[rng.choice(data.shape[0], size=int(empty.sum()))]
+            counts[empty] = 1
+        if spherical:
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms != 0)
+        else:
+            centroids = sums / counts[:, None]
+
+    return centroids.astype(np.float32)
+
+
+class ScalarQuantizer:
+    """Quantizes each dimension independently to an int8 code over its trained [min, max] range."""
+
+    method = "int8"
+    code_dtype = np.int8
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.minimums: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.dimensions
+
+    @property
+    def is_trained(self) -> bool:
+        return self.scales is not None
+
+    def _parameters(self) -> Tuple[np.ndarray, np.ndarray]:
+        return _trained(self.minimums, self), _trained(self.scales, self)
+
+    def train(self, vectors: np.ndarray, rng: Optional[np.random.Generator] = None) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        minimums = vectors.min(axis=0)
+        spans = vectors.max(axis=0) - minimums
+        self.minimums = minimums
+        self.scales = np.where(spans > 0, spans / 255.0, 1.0).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        minimums, scales = self._parameters()
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - minimums) / scales)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        minimums, scales = self._parameters()
+        return (codes.astype(np.float32) + 128.0) * scales + minimums
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products between the query and every encoded row."""
+        minimums, scales = self._parameters()
+        weights = query * scales
+        bias = float(query @ (128.0 * scales + minimums))
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], _SCORE_CHUNK):
+            block = codes[start:start + _SCORE_CHUNK].astype(np.float32)
+            scores[start:start + _SCORE_CHUNK] = block @ weights + bias
+        return scores
+
+    def codebook(self) -> np.ndarray:
+        """The trained parameters as a single float32 array, for persistence."""
+        return np.stack(self._parameters()).astype(np.float32)
+
+    @classmethod
+    def from_codebook(cls, dimensions: int, code_size: int, codebook: np.ndarray) -> "ScalarQuantizer":
+        quantizer = cls(dimensions)
+        codebook = np.asarray(codebook, dtype=np.float32).reshape(2, dimensions)
+        quantizer.minimums, quantizer.scales = codebook[0].copy(), codebook[1].copy()
+        return quantizer
+
+
+class ProductQuantizer:
+    """Splits vectors into `subvectors` chunks and encodes each as the index of its nearest of 256 centroids."""
+
+    method = "pq"
+    code_dtype = np.uint8
+    centroids_per_subvector = 256
+
+    def __init__(self, dimensions: int, subvectors: int = 8):
+        if dimensions % subvectors:
+            raise ValueError(f"Vector dimensions ({dimensions}) must be divisible by the number of subvectors ({subvectors}).")
+        self.dimensions = dimensions
+        self.subvectors = subvectors
+        self.subvector_size = dimensions // subvectors
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def code_size(self) -> int:
+        return self.subvectors
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32).reshape(-1, self.subvectors, self.subvector_size)
+
+    def train(self, vectors: np.ndarray, rng: Optional[np.random.Generator] = None, iterations: int = 20) -> None:
+        parts = self._split(vectors)
+        k = min(self.centroids_per_subvector, parts.shape[0])
+        codebooks = np.zeros((self.subvectors, self.centroids_per_subvector, self.subvector_size), dtype=np.float32)
+        for m in range(self.subvectors):
+            codebooks[m, :k] = kmeans(parts[:, m], k, iterations=iterations, rng=rng)
+        if k < self.centroids_per_subvector:
+            # Too few training points: unused slots repeat a real centroid so they are never closer.
+            codebooks[:, k:] = codebooks[:, :1]
+        self.codebooks = codebooks
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codebooks = _trained(self.codebooks, self)
+        parts = self._split(vectors)
+        codes = np.empty((parts.shape[0], self.subvectors), dtype=np.uint8)
+        squared = (codebooks ** 2).sum(axis=2)
+        for m in range(self.subvectors):
+            affinities = parts[:, m] @ codebooks[m].T - 0.5 * squared[m]
+            codes[:, m] = np.argmax(affinities, axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = _trained(self.codebooks, self)[np.arange(self.subvectors), codes]
+        return parts.reshape(codes.shape[0], self.dimensions)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate dot products via per-subvector lookup tables (asymmetric distance computation)."""
+        codebooks = _trained(self.codebooks, self)
+        table = np.einsum("mkd,md->mk", codebooks, query.reshape(self.subvectors, self.subvector_size))
+        subvector_index = np.arange(self.subvectors)
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], _SCORE_CHUNK):
+            block = codes[start:start + _SCORE_CHUNK]
+            scores[start:start + _SCORE_CHUNK] = table[subvector_index, block].sum(axis=1)
+        return scores
+
+    def codebook(self) -> np.ndarray:
+        return _trained(self.codebooks, self)
+
+    @classmethod
+    def from_codebook(cls, dimensions: int, code_size: int, codebook: np.ndarray) -> "ProductQuantizer":
+        quantizer = cls(dimensions, subvectors=code_size)
+        quantizer.codebooks = np.asarray(codebook, dtype=np.float32).reshape(
+            code_size, cls.centroids_per_subvector, dimensions // code_size
+        ).copy()
+        return quantizer
+
+
+Quantizer = Union[ScalarQuantizer, ProductQuantizer]
+
+QUANTIZERS: Dict[str, Type[Quantizer]] = {
+    ScalarQuantizer.method: ScalarQuantizer,
+    ProductQuantizer.method: ProductQuantizer,
+}
@@ -0,0 +1,333 @@
+from typing import List, Dict, Any, Iterator, Tuple, Optional
+
+import numpy as np
+
+from .base import VectorStoreBase
+from .fcvs import is_binary_fcvs, read_fcvs, read_header, read_quantized_fcvs, write_fcvs, write_quantized_fcvs
+from .metadata_index import MetadataIndex
+from .quantization import ProductQuantizer, Quantizer, ScalarQuantizer
+
+
+class QuantizedVectorStore(VectorStoreBase):
+    """
+    A vector store that keeps compressed codes instead of float32 vectors.
+
+    - `method="int8"` stores one signed byte per dimension (4x smaller).
+    - `method="pq"` stores one byte per sub-vector (e.g. 1536 dims / 96 sub-vectors = 64x smaller).
+
+    Documents are buffered at full precision until `train()` fits the
+    quantizer; afterwards every document is encoded on insert. Searches score
+    the query against the codes directly. With `rescore > 0`, the best
+    `rescore` candidates are re-scored exactly against the original vectors,
+    which are then kept as well (memory-mapped when loaded from a file).
+
+    Quantized stores are saved in the binary `.fcvs` layout.
+
+    Deleted documents are tombstoned and their rows are reclaimed once more
+    than `compaction_threshold` of the rows are tombstones.
+    """
+
+    #: The fraction of tombstoned rows that triggers an automatic `compact()`.
+    compaction_threshold: float = 0.25
+
+    def __init__(self, method: str = "int8", subvectors: int = 8, rescore: int = 0, seed: Optional[int] = None):
+        """
+        Initializes the quantized store.
+
+        Args:
+            method: 'int8' for scalar quantization or 'pq' for product quantization.
+            subvectors: The number of sub-vectors (bytes per vector) for product quantization.
+            rescore: The number of quantized candidates re-scored exactly per query. 0 disables
+                re-scoring and lets the store discard the float vectors after training.
+            seed: Optional seed for sampling and k-means, for reproducible codebooks.
+        """
+        if method not in ("int8", "pq"):
+            raise ValueError(f"Unsupported quantization method '{method}'. Use 'int8' or 'pq'.")
+        self.method = method
+        self.subvectors = subvectors
+        self.rescore = rescore
+        self.seed = seed
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._dimensions = 0
+        self._norms: np.ndarray = np.empty(0, dtype=np.float32)
+        self._deleted: np.ndarray = np.zeros(0, dtype=bool)
+        self._num_deleted = 0
+        # Unit-normalized float32 vectors: the training buffer, and later the re-scoring source.
+        self._vectors: Optional[np.ndarray] = np.empty((0, 0), dtype=np.float32)
+        self._codes: Optional[np.ndarray] = None
+        self._quantizer: Optional[Quantizer] = None
+        self._metadata_index: Optional[MetadataIndex] = None
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    @property
+    def dimensions(self) -> int:
+        """The dimensionality of the stored vectors (0 while the store is empty)."""
+        return self._dimensions
+
+    @property
+    def is_trained(self) -> bool:
+        """Whether the quantizer has been trained and documents are stored as codes."""
+        return self._quantizer is not None
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes held in memory by codes, norms and any in-memory float vectors."""
+        count = len(self._ids)
+        total = self._norms[:count].nbytes
+        if self._codes is not None:
+            total += self._codes[:count].nbytes
+        if self._vectors is not None and not isinstance(self._vectors, np.memmap):
+            total += self._vectors[:count].nbytes
+        return total
+
+    def _normalize(self, vector: List[float]) -> Tuple[np.ndarray, float]:
+        row = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if self._ids and row.shape[0] != self._dimensions:
+            raise ValueError(
+                f"Vector has {row.shape[0]} dimensions, but the store holds {self._dimensions}-dimensional vectors."
+            )
+        norm = float(np.linalg.norm(row))
+        return (row / norm if norm else row), norm
+
+    @staticmethod
+    def _grown(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:array.shape[0]] = array
+        return grown
+
+    def _reserve_row(self) -> int:
+        """Appends an empty row to every per-document array, growing them geometrically."""
+        row = len(self._ids)
+        if row == self._norms.shape[0]:
+            capacity = max(16, row * 2)
+            self._norms = self._grown(self._norms, capacity)
+            self._deleted = self._grown(self._deleted, capacity)
+            if self._vectors is not None:
+                self._vectors = self._grown(self._vectors, capacity)
+            if self._codes is not None:
+                self._codes = self._grown(self._codes, capacity)
+        return row
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Returns the sorted rows whose metadata matches the filter, building the metadata index if needed."""
+        if self._metadata_index is None:
+            self._metadata_index = MetadataIndex.build(
+                (row, self._metadata.get(doc_id, {})) for row, doc_id in enumerate(self._ids) if not self._deleted[row]
+            )
+        return self._metadata_index.rows(filter)
+
+    # --- Training --- #
+
+    def train(self, max_training_points: int = 65536) -> None:
+        """
+        Fits the quantizer on the documents added so far and encodes all of them.
+
+        Args:
+            max_training_points: The quantizer is trained on at most this many sampled documents.
+        """
+        self.compact()
+        count = len(self._ids)
+        if count == 0:
+            raise ValueError("Cannot train an empty QuantizedVectorStore.")
+        if self._vectors is None:
+            raise ValueError("The store no longer holds full-precision vectors to train on.")
+
+        rng = np.random.default_rng(self.seed)
+        vectors = np.asarray(self._vectors[:count], dtype=np.float32)
+        sample = vectors[rng.choice(count, size=max_training_points, replace=False)] if count > max_training_points else vectors
+
+        quantizer: Quantizer
+        if self.method == "int8":
+            quantizer = ScalarQuantizer(self._dimensions)
+        else:
+            quantizer = ProductQuantizer(self._dimensions, subvectors=self.subvectors)
+        quantizer.train(sample, rng=rng)
+
+        codes = np.zeros((self._norms.shape[0], quantizer.code_size), dtype=quantizer.code_dtype)
+        codes[:count] = quantizer.encode(vectors)
+        self._quantizer = quantizer
+        self._codes = codes
+        if not self.rescore:
+            self._vectors = None
+
+    # --- Store API --- #
+
+    def add(self, doc_id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Adds a document to the store, encoding it if the quantizer is trained."""
+        row_vector, norm = self._normalize(vector)
+        if not self._ids:
+            self._dimensions = row_vector.shape[0]
+            if self._vectors is not None:
+                self._vectors = np.empty((0, self._dimensions), dtype=np.float32)
+
+        if doc_id in self._id_to_row:
+            row = self._id_to_row[doc_id]
+        else:
+            row = self._reserve_row()
+            self._ids.append(doc_id)
+            self._id_to_row[doc_id] = row
+
+        if self._metadata_index is not None:
+            self._metadata_index.replace(row, self._metadata.get(doc_id), metadata or {})
+        self._metadata[doc_id] = metadata or {}
+
+        self._norms[row] = norm
+        if self._vectors is not None:
+            if not self._vectors.flags.writeable:
+                # Copy memory-mapped originals into memory before modifying them.
+                self._vectors = np.array(self._vectors, dtype=np.float32)
+            self._vectors[row] = row_vector
+        if self._quantizer is not None:
+            assert self._codes is not None  # Set together with the quantizer.
+            self._codes[row] = self._quantizer.encode(row_vector[None, :])[0]
+
+    def get_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the metadata of a document, or None if the store does not hold it."""
+        return self._metadata.get(doc_id)
+
+    def documents(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields the (doc_id, metadata) pair of every document in the store."""
+        yield from list(self._metadata.items())
+
+    def delete(self, doc_id: str) -> bool:
+        """Deletes a document by tombstoning its row."""
+        row = self._id_to_row.pop(doc_id, None)
+        if row is None:
+            return False
+
+        metadata = self._metadata.pop(doc_id, {})
+        if self._metadata_index is not None:
+            self._metadata_index.remove(row, metadata)
+        self._deleted[row] = True
+        self._num_deleted += 1
+        if self._num_deleted > self.compaction_threshold * len(self._ids):
+            self.compact()
+        return True
+
+    def compact(self) -> None:
+        """Reclaims the rows of deleted documents, renumbering the remaining rows."""
+        if not self._num_deleted:
+            return
+        live = np.flatnonzero(~self._deleted[:len(self._ids)])
+        self._norms = self._norms[live]
+        if self._vectors is not None:
+            self._vectors = np.asarray(self._vectors[live], dtype=np.float32)
+        if self._codes is not None:
+            self._codes = self._codes[live]
+        self._ids = [self._ids[row] for row in live.tolist()]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._deleted = np.zeros(len(self._ids), dtype=bool)
+        self._num_deleted = 0
+        self._metadata_index = None
+
+    def similarity_search(
+        self, query_vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Finds the most similar documents, optionally re-scoring the best quantized candidates exactly.
+
+        With a metadata `filter`, only the codes of matching documents are scored.
+        """
+        count = len(self._ids)
+        if not self._id_to_row or top_k <= 0:
+            return []
+
+        query, _ = self._normalize(query_vector)
+        if filter:
+            rows = self._filter_rows(filter)
+        elif self._num_deleted:
+            rows = np.flatnonzero(~self._deleted[:count])
+        else:
+            rows = np.arange(count)
+        restricted = bool(filter) or self._num_deleted > 0
+        if rows.shape[0] == 0:
+            return []
+        if self._quantizer is None:
+            assert self._vectors is not None  # Only dropped once trained.
+            scores = (self._vectors[rows] if restricted else self._vectors[:count]) @ query
+        else:
+            assert self._codes is not None
+            codes = self._codes[rows] if restricted else self._codes[:count]
+            scores = self._quantizer.scores(codes, query)
+            if self.rescore and self._vectors is not None:
+                candidates = min(max(self.rescore, top_k), rows.shape[0])
+                if candidates < rows.shape[0]:
+                    # Sorted rows keep reads of memory-mapped originals sequential.
+                    rows = rows[np.sort(np.argpartition(-scores, candidates - 1)[:candidates])]
+                scores = np.asarray(self._vectors[rows], dtype=np.float32) @ query
+
+        top_k = min(top_k, rows.shape[0])
+        best = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < rows.shape[0] else np.arange(rows.shape[0])
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            (self._ids[row], float(scores[i]), self._metadata.get(self._ids[row], {}))
+            for i, row in zip(best.tolist(), rows[best].tolist())
+        ]
+
+    # --- Persistence --- #
+
+    def save(self, filepath: str, pretty_print: bool = False) -> None:
+        """
+        Saves the store to a binary `.fcvs` file.
+
+        Trained stores write their codes and codebook, plus the original vectors
+        when re-scoring is enabled. Untrained stores write plain float32 vectors.
+        `pretty_print` is accepted for interface compatibility and ignored.
+        Deleted documents are compacted away before saving.
+        """
+        self.compact()
+        count = len(self._ids)
+        metadata = [self._metadata.get(doc_id, {}) for doc_id in self._ids]
+        if self._quantizer is None:
+            assert self._vectors is not None  # Only dropped once trained.
+            raw = self._vectors[:count] * self._norms[:count, None]
+            write_fcvs(filepath, self._ids, raw, metadata, norms=self._norms)
+            return
+
+        assert self._codes is not None
+        originals = self._vectors if self.rescore and self._vectors is not None else None
+        write_quantized_fcvs(filepath, self._ids, self._codes, self._norms, metadata, self._quantizer, originals=originals)
+
+    def load(self, filepath: str) -> None:
+        """
+        Loads a quantized `.fcvs` file, or buffers the vectors of a float `.fcvs` file for training.
+
+        The quantization method and code size are taken from the file. Stored original
+        vectors are memory-mapped only if this store was created with `rescore > 0`.
+        """
+        self._reset()
+        header = read_header(filepath) if is_binary_fcvs(filepath) else None
+        if header is not None and header.quantization is not None:
+            quantized = read_quantized_fcvs(filepath, mmap=True)
+            self.method = header.quantization
+            if self.method == "pq":
+                self.subvectors = quantized.header.code_size
+            self._ids = quantized.ids
+            self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._metadata = dict(zip(self._ids, quantized.metadata))
+            self._dimensions = quantized.header.dimensions
+            self._norms = quantized.norms
+            self._deleted = np.zeros(len(self._ids), dtype=bool)
+            self._codes = quantized.codes
+            self._quantizer = quantized.quantizer
+            # Original vectors are only kept (memory-mapped) when this store re-scores.
+            self._vectors = quantized.originals if self.rescore else None
+            return
+
+        ids, raw, norms, metadata = read_fcvs(filepath, mmap=False)
+        self._ids = ids
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._metadata = dict(zip(ids, metadata))
+        self._deleted = np.zeros(len(ids), dtype=bool)
+        if ids:
+            raw = np.asarray(raw, dtype=np.float32)
+            self._dimensions = raw.shape[1]
+            self._norms = np.linalg.norm(raw, axis=1).astype(np.float32) if norms is None else norms
+            self._vectors = np.divide(raw, self._norms[:, None], out=np.zeros_like(raw), where=self._norms[:, None] != 0)
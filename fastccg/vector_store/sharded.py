@@ -0,0 +1,257 @@
+import heapq
+import json
+import os
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Tuple, Optional
+
+import numpy as np
+
+from .base import VectorStoreBase
+from .in_memory import InMemoryVectorStore
+from .wal import wal_path
+
+MANIFEST_FORMAT = "fcvs-sharded"
+
+# Shards loaded by a worker process, keyed by path: (file version, store).
+_worker_shards: Dict[str, Tuple[Tuple[int, ...], InMemoryVectorStore]] = {}
+
+
+def _file_version(path: str) -> Tuple[int, ...]:
+    """Identifies the on-disk state of a shard snapshot and its write-ahead log."""
+    snapshot = os.stat(path)
+    log = wal_path(path)
+    log_size = os.stat(log).st_size if os.path.exists(log) else -1
+    return snapshot.st_mtime_ns, snapshot.st_size, log_size
+
+
+def _search_shard_file(path: str, method: str, args: tuple, kwargs: dict) -> Any:
+    """Runs a search method on a shard in a worker process, memory-mapping the shard file once per version."""
+    version = _file_version(path)
+    cached = _worker_shards.get(path)
+    if cached is None or cached[0] != version:
+        shard = InMemoryVectorStore()
+        shard.load(path)
+        _worker_shards[path] = cached = (version, shard)
+    return getattr(cached[1], method)(*args, **kwargs)
+
+
+def _merge(results: List[List[Tuple[str, float, Dict[str, Any]]]], top_k: int) -> List[Tuple[str, float, Dict[str, Any]]]:
+    """Merges best-first per-shard result lists into the global best-first top-k."""
+    merged = heapq.merge(*results, key=lambda result: -result[1])
+    return [result for _, result in zip(range(top_k), merged)]
+
+
+class ShardedVectorStore(VectorStoreBase):
+    """
+    A vector store that hash-partitions documents across several `InMemoryVectorStore` shards.
+
+    Every document lives in the shard chosen by a stable hash of its id. A
+    search is sent to all shards in parallel and their best-first top-k lists
+    are merged with a heap, so results are identical to a single exact store.
+
+    By default shards are searched by a thread pool: the matrix products run in
+    NumPy and release the GIL, so shards are scored on separate cores. With
+    `processes`, shards that are saved and unchanged since are searched by a
+    pool of worker processes instead, which memory-map the shard files and so
+    share their pages through the OS cache. Shards changed since the last save
+    are always searched in this process.
+
+    The store is saved as a small JSON manifest at `filepath` plus one binary
+    `.fcvs` file per shard (`<stem>.shard<i>.fcvs`).
+    """
+
+    def __init__(self, num_shards: int = 4, processes: Optional[int] = None):
+        """
+        Initializes the sharded store.
+
+        Args:
+            num_shards: The number of hash partitions.
+            processes: If set, the number of worker processes used to search saved shards.
+                Otherwise every shard is searched by a thread pool in this process.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1.")
+        self.num_shards = num_shards
+        self.processes = processes
+        self._shards = [InMemoryVectorStore() for _ in range(num_shards)]
+        # The file each shard was last saved to or loaded from, or None if it changed since.
+        self._paths: List[Optional[str]] = [None] * num_shards
+        self._thread_pool: Optional[Executor] = None
+        self._process_pool: Optional[Executor] = None
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    @property
+    def dimensions(self) -> int:
+        """The dimensionality of the stored vectors (0 while the store is empty)."""
+        return next((shard.dimensions for shard in self._shards if len(shard)), 0)
+
+    @property
+    def shards(self) -> List[InMemoryVectorStore]:
+        """The underlying shard stores."""
+        return self._shards
+
+    def shard_of(self, doc_id: str) -> int:
+        """Returns the index of the shard holding a document id."""
+        return zlib.crc32(doc_id.encode("utf-8")) % self.num_shards
+
+    def _check_dimensions(self, dimensions: int) -> None:
+        if len(self) and dimensions != self.dimensions:
+            raise ValueError(
+                f"Vector has {dimensions} dimensions, but the store holds {self.dimensions}-dimensional vectors."
+            )
+
+    # --- Writes --- #
+
+    def add(self, doc_id: str, vector: List[float], metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Adds a document to its shard, overwriting any existing entry."""
+        self._check_dimensions(len(vector))
+        index = self.shard_of(doc_id)
+        self._shards[index].add(doc_id, vector, metadata)
+        self._paths[index] = None
+
+    def add_many(
+        self,
+        ids: List[str],
+        vectors: List[List[float]],
+        metadatas: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        """Adds many documents, with one `add_many` call per shard."""
+        ids = list(ids)
+        block = np.asarray(vectors, dtype=np.float32)
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        if block.ndim != 2 or block.shape[0] != len(ids) or len(metadatas) != len(ids):
+            raise ValueError("add_many expects one vector and one metadata entry per id.")
+        if not ids:
+            return
+        self._check_dimensions(block.shape[1])
+
+        groups: Dict[int, List[int]] = {}
+        for i, doc_id in enumerate(ids):
+            groups.setdefault(self.shard_of(doc_id), []).append(i)
+        for index, positions in groups.items():
+            self._shards[index].add_many([ids[i] for i in positions], block[positions], [metadatas[i] for i in positions])
+            self._paths[index] = None
+
+    def get_metadata(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the metadata of a document, or None if the store does not hold it."""
+        return self._shards[self.shard_of(doc_id)].get_metadata(doc_id)
+
+    def documents(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yields the (doc_id, metadata) pair of every document, shard by shard."""
+        for shard in self._shards:
+            yield from shard.documents()
+
+    def delete(self, doc_id: str) -> bool:
+        """Deletes a document from its shard."""
+        index = self.shard_of(doc_id)
+        deleted = self._shards[index].delete(doc_id)
+        if deleted:
+            self._paths[index] = None
+        return deleted
+
+    def compact(self) -> None:
+        """Reclaims the rows of deleted documents in every shard."""
+        for shard in self._shards:
+            shard.compact()
+
+    # --- Search --- #
+
+    def _fan_out(self, method: str, *args, **kwargs) -> List[Any]:
+        """Calls a search method on every shard in parallel and returns the results in shard order."""
+        if self.processes and self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.processes)
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.num_shards)
+
+        futures = []
+        for shard, path in zip(self._shards, self._paths):
+            if self._process_pool is not None and path is not None:
+                futures.append(self._process_pool.submit(_search_shard_file, path, method, args, kwargs))
+            else:
+                futures.append(self._thread_pool.submit(getattr(shard, method), *args, **kwargs))
+        return [future.result() for future in futures]
+
+    def similarity_search(
+        self, query_vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Searches every shard in parallel and merges their top-k lists."""
+        if top_k <= 0 or not len(self):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        return _merge(self._fan_out("similarity_search", query, top_k=top_k, filter=filter), top_k)
+
+    def similarity_search_batch(
+        self, query_vectors: List[List[float]], top_k: int = 5, filter: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[str, float, Dict[str, Any]]]]:
+        """Runs one batched search per shard in parallel and merges the top-k lists of each query."""
+        if top_k <= 0 or not len(self) or len(query_vectors) == 0:
+            return [[] for _ in range(len(query_vectors))]
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        per_shard = self._fan_out("similarity_search_batch", queries, top_k=top_k, filter=filter)
+        return [_merge(list(results), top_k) for results in zip(*per_shard)]
+
+    def close(self) -> None:
+        """Shuts down the thread and process pools used for searching."""
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown()
+        self._thread_pool = self._process_pool = None
+
+    # --- Persistence --- #
+
+    def _shard_path(self, filepath: str, index: int) -> str:
+        stem, _ = os.path.splitext(filepath)
+        return f"{stem}.shard{index}.fcvs"
+
+    def save(self, filepath: str, pretty_print: bool = False, incremental: bool = False) -> None:
+        """
+        Saves a JSON manifest to `filepath` and every shard to its own binary `.fcvs` file.
+
+        Args:
+            filepath: The path of the manifest.
+            pretty_print: If True, indents the manifest.
+            incremental: If True, shards append their changes to a write-ahead log
+                instead of rewriting their snapshot (see `InMemoryVectorStore.save`).
+        """
+        paths = [self._shard_path(filepath, index) for index in range(self.num_shards)]
+        for index, (shard, path) in enumerate(zip(self._shards, paths)):
+            shard.save(path, binary=True, incremental=incremental)
+            self._paths[index] = path
+
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "num_shards": self.num_shards,
+            "shards": [os.path.basename(path) for path in paths],
+        }
+        with open(filepath, 'w') as f:
+            json.dump(manifest, f, indent=4 if pretty_print else None)
+
+    def checkpoint(self) -> None:
+        """Folds every shard's write-ahead log into its snapshot."""
+        for shard in self._shards:
+            shard.checkpoint()
+
+    def load(self, filepath: str) -> None:
+        """Loads the manifest at `filepath` and memory-maps every shard file it lists."""
+        with open(filepath, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != MANIFEST_FORMAT:
+            raise ValueError(f"'{filepath}' is not a sharded vector store manifest.")
+
+        directory = os.path.dirname(filepath)
+        self.num_shards = manifest["num_shards"]
+        self._shards = []
+        self._paths = []
+        for name in manifest["shards"]:
+            path = os.path.join(directory, name)
+            shard = InMemoryVectorStore()
+            shard.load(path)
+            self._shards.append(shard)
+            self._paths.append(path)
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown()
+            self._thread_pool = None
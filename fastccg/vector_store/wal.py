@@ -0,0 +1,120 @@
+"""
+Append-only write-ahead log (WAL) for incremental vector store persistence.
+
+The log lives beside an `.fcvs` snapshot as `<filepath>.wal` and holds one
+JSON record per line:
+
+    {"op": "upsert", "id": "doc1", "vector": "<base64 little-endian float32>", "metadata": {...}}
+    {"op": "delete", "id": "doc2"}
+
+Records are replayed in order over the snapshot when the store is loaded.
+Upserts carry the document's full state, so replaying a record twice is
+harmless. A truncated final line, e.g. from a crash during an append, is
+ignored.
+"""
+import base64
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+WAL_SUFFIX = ".wal"
+
+
+def wal_path(filepath: str) -> str:
+    """Returns the path of the write-ahead log that belongs to an `.fcvs` snapshot."""
+    return filepath + WAL_SUFFIX
+
+
+def upsert_record(doc_id: str, vector: np.ndarray, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Builds a log record that inserts or replaces a document."""
+    data = np.ascontiguousarray(vector, dtype="<f4").tobytes()
+    return {"op": "upsert", "id": doc_id, "vector": base64.b64encode(data).decode("ascii"), "metadata": metadata or {}}
+
+
+def delete_record(doc_id: str) -> Dict[str, Any]:
+    """Builds a log record that deletes a document."""
+    return {"op": "delete", "id": doc_id}
+
+
+def decode_vector(record: Dict[str, Any]) -> np.ndarray:
+    """Decodes the float32 vector of an upsert record."""
+    return np.frombuffer(base64.b64decode(record["vector"]), dtype="<f4").astype(np.float32)
+
+
+class WriteAheadLog:
+    """An append-only file of JSON-lines records."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def append(self, records: Iterable[Dict[str, Any]], sync: bool = True) -> int:
+        """
+        Appends records to the log.
+
+        Args:
+            records: The records to append, in order.
+            sync: If True, fsyncs the file so the records survive a crash.
+
+        Returns:
+            The number of records written.
+        """
+        lines = [json.dumps(record, separators=(",", ":")) + "\n" for record in records]
+        if not lines:
+            return 0
+        self._truncate_torn_tail()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        return len(lines)
+
+    def _truncate_torn_tail(self, chunk_size: int = 65536) -> None:
+        """Cuts off a truncated final record, so the next append starts on a fresh line."""
+        if not self.exists():
+            return
+        with open(self.path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            # Scan backwards, one chunk at a time, for the end of the last complete record.
+            position = end
+            while position > 0:
+                start = max(0, position - chunk_size)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    f.truncate(start + newline + 1)
+                    return
+                position = start
+            f.truncate(0)
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Yields the logged records in order, stopping at a truncated final line."""
+        if not self.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines: List[str] = f.readlines()
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                if number == len(lines) and not line.endswith("\n"):
+                    return
+                raise ValueError(f"Corrupt record on line {number} of write-ahead log '{self.path}'.")
+            yield record
+
+    def clear(self) -> None:
+        """Removes the log, e.g. after its records were folded into a new snapshot."""
+        if self.exists():
+            os.remove(self.path)
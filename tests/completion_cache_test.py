@@ -0,0 +1,128 @@
+import time
+
+import pytest
+import fastccg
+from fastccg.core.completion_cache import CompletionCache, LRUCacheBackend, SQLiteCacheBackend
+from fastccg.models.mock import MockModel
+
+api = fastccg.add_mock_key()
+
+
+class _CountingModel(MockModel):
+    """A mock model that counts the requests reaching the provider."""
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key=api_key)
+        self.calls = 0
+
+    async def _ask_async(self, prompt: str):
+        self.calls += 1
+        return await super()._ask_async(prompt)
+
+    async def _ask_stream(self, prompt: str):
+        self.calls += 1
+        async for chunk in super()._ask_stream(prompt):
+            yield chunk
+
+
+def _model(cache: CompletionCache) -> _CountingModel:
+    model = _CountingModel(api)
+    model.temperature(0).cache_responses(cache)
+    return model
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_are_served_from_the_cache():
+    """Tests that only an identical request, including history and settings, hits the cache."""
+    cache = CompletionCache()
+    first, second = _model(cache), _model(cache)
+    response = await first.ask_async("Classify: great product")
+    assert (await second.ask_async("Classify: great product")).content == response.content
+    assert first.calls == 1 and second.calls == 0 and cache.stats.hits == 1
+
+    # The second turn of `first` has a different history, and so a different key.
+    await first.ask_async("Classify: great product")
+    assert first.calls == 2
+
+    other = _model(cache).sys_prompt("Answer in French.")
+    await other.ask_async("Classify: great product")
+    assert other.calls == 1
+
+    assert [p.content for p in second.get_history()] == ["Classify: great product", response.content]
+
+
+@pytest.mark.asyncio
+async def test_sampled_requests_bypass_the_cache_unless_forced():
+    """Tests that requests with a temperature above 0, or none set, are not cached by default."""
+    cache = CompletionCache()
+    for temperature in (0.7, None):
+        model = _CountingModel(api).cache_responses(cache)
+        if temperature is not None:
+            model.temperature(temperature)
+        await model.ask_async("hi")
+        model.reset().cache_responses(cache)
+        if temperature is not None:
+            model.temperature(temperature)
+        await model.ask_async("hi")
+        assert model.calls == 2
+    assert cache.stats.bypassed == 4 and cache.stats.hits == 0
+
+    forced = CompletionCache(force=True)
+    model = _CountingModel(api).temperature(0.7).cache_responses(forced)
+    await model.ask_async("hi")
+    model.memory.clear()
+    await model.ask_async("hi")
+    assert model.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_responses_are_replayed_as_streams():
+    """Tests that a streamed answer is cached and replayed chunk by chunk to stream and non-stream callers."""
+    cache = CompletionCache()
+    streamed = _model(cache)
+    text = "".join([chunk.content async for chunk in streamed.ask_stream("hi")])
+
+    replayed = _model(cache)
+    chunks = [chunk.content async for chunk in replayed.ask_stream("hi")]
+    assert "".join(chunks) == text and len(chunks) > 1
+    assert replayed.calls == 0 and replayed.get_history()[-1].content == text
+
+    assert (await _model(cache).ask_async("hi")).content == text
+
+
+def test_backends_evict_and_expire(tmp_path):
+    """Tests LRU eviction, TTL expiry and persistence of the SQLite backend."""
+    lru = LRUCacheBackend(max_entries=2)
+    for key in "abc":
+        lru.set(key, {"content": key})
+    assert len(lru) == 2 and lru.get("a") is None and lru.get("c") == {"content": "c"}
+    lru.set("old", {"content": "old"}, expires_at=time.time() - 1)
+    assert lru.get("old") is None
+
+    path = str(tmp_path / "completions.db")
+    disk = SQLiteCacheBackend(path)
+    disk.set("k", {"content": "kept"})
+    disk.set("gone", {"content": "gone"}, expires_at=time.time() - 1)
+    disk.set("stale", {"content": "stale"}, expires_at=time.time() - 1)
+    assert disk.get("gone") is None
+    assert disk.purge_expired() == 1
+    disk.close()
+    assert SQLiteCacheBackend(path).get("k") == {"content": "kept"}
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_disk_cache(tmp_path):
+    """Tests that entries expire after the TTL, and that a disk cache serves a new process's models."""
+    cache = CompletionCache(ttl=0.05)
+    model = _model(cache)
+    await model.ask_async("hi")
+    time.sleep(0.06)
+    again = _model(cache)
+    await again.ask_async("hi")
+    assert again.calls == 1
+
+    path = str(tmp_path / "completions.db")
+    await _model(CompletionCache(SQLiteCacheBackend(path))).ask_async("hi")
+    fresh = _model(CompletionCache(SQLiteCacheBackend(path)))
+    await fresh.ask_async("hi")
+    assert fresh.calls == 0
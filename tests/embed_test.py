@@ -1,5 +1,9 @@
+import asyncio
+
+import numpy as np
 import pytest
 import fastccg
+from fastccg.embedding.cache import CachedEmbedding
 from fastccg.embedding.mock import MockEmbedding
 
 # 1. Add the mock key. This sets up the mock provider.
@@ -31,3 +35,81 @@ async def test_mock_embedding(mock_embedding_model: MockEmbedding):
 
     print(f"\\nSuccessfully generated {len(embeddings)} mock embeddings.")
     print(f"Embedding size: {len(embeddings[0])}")
+
+
+class _CountingEmbedding(MockEmbedding):
+    """A mock embedder with small request limits that records the batches it receives."""
+    max_batch_items = 3
+    max_batch_tokens = 10
+    max_concurrency = 2
+
+    def __init__(self, api_key: str):
+        super().__init__(api_key=api_key)
+        self.batches = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def _embed(self, texts):
+        self.batches.append(list(texts))
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await super()._embed(texts)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.asyncio
+async def test_embed_splits_batches_and_keeps_order(mock_embedding_model: MockEmbedding):
+    """Tests that large inputs are batched by item count and tokens, sent concurrently, and reassembled in order."""
+    embedder = _CountingEmbedding(api_key=api)
+    texts = [f"text {i}" for i in range(10)] + ["one two three four five six seven eight nine ten eleven"]
+
+    vectors = await embedder.embed(texts)
+
+    assert vectors == await mock_embedding_model.embed(texts)
+    assert all(len(batch) <= 3 for batch in embedder.batches)
+    assert [text for batch in sorted(embedder.batches, key=lambda b: texts.index(b[0])) for text in batch] == texts
+    assert [texts[-1]] in embedder.batches  # Over the token limit, so sent on its own
+    assert embedder.peak_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_embedding_only_embeds_misses(tmp_path):
+    """Tests that the cache sends only misses to the provider, counts hits, and persists across instances."""
+    inner = _CountingEmbedding(api_key=api)
+    cache = CachedEmbedding(inner, max_entries=2, path=str(tmp_path / "embeddings.db"))
+
+    first = await cache.embed(["a", "b", "a"])
+    assert inner.batches == [["a", "b"]] and first[0] == first[2]
+    second = await cache.embed(["b", "c"])
+    assert second[0] == first[1] and inner.batches[-1] == ["c"]
+    assert np.allclose(second[1], (await MockEmbedding(api_key=api).embed("c"))[0], atol=1e-6)
+    assert cache.stats.misses == 3 and cache.stats.memory_hits == 1 and len(cache) == 2
+
+    # "a" was evicted from memory but is still on disk.
+    calls = len(inner.batches)
+    assert await cache.embed("a") == [first[0]]
+    assert len(inner.batches) == calls and cache.stats.disk_hits == 1
+    cache.close()
+
+    reopened = CachedEmbedding(_CountingEmbedding(api_key=api), path=str(tmp_path / "embeddings.db"))
+    assert await reopened.embed(["a", "b"]) == first[:2]
+    assert reopened.embedder.batches == [] and reopened.stats.hit_rate == 1.0
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_embeds_are_coalesced():
+    """Tests that concurrent identical embedding requests share one provider call."""
+    embedder = _CountingEmbedding(api_key=api)
+
+    results = await asyncio.gather(*(embedder.embed("popular query") for _ in range(5)), embedder.embed("other"))
+
+    assert all(result == results[0] for result in results[:5])
+    assert sorted(embedder.batches) == [["other"], ["popular query"]]
+    assert embedder._in_flight.coalesced == 4 and len(embedder._in_flight) == 0
+
+    embedder.coalesce_requests = False
+    await asyncio.gather(embedder.embed("x"), embedder.embed("x"))
+    assert embedder.batches[-2:] == [["x"], ["x"]]
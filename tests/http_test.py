@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+import fastccg
+from fastccg.core import http
+from fastccg.core.http import clear_clients, http_settings
+from fastccg.core.loop import run_sync
+from fastccg.embedding.openai import text_embedding_3_small
+from fastccg.models.gpt import gpt_4o, gpt_3_5_turbo
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    """Fixture to start every test from the default settings and an empty registry."""
+    defaults = http_settings()
+    clear_clients()
+    yield
+    fastccg.configure_http(**defaults.__dict__)
+
+
+def test_models_with_the_same_key_share_one_client():
+    """Tests that models and embedders built for the same provider and key share one connection pool."""
+    first = fastccg.init_model(gpt_4o, api_key="sk-one")
+    second = fastccg.init_model(gpt_3_5_turbo, api_key="sk-one")
+    embedder = fastccg.init_embedding(text_embedding_3_small, api_key="sk-one")
+    other = fastccg.init_model(gpt_4o, api_key="sk-two")
+
+    assert first.client is second.client is embedder.client
+    assert other.client is not first.client
+
+
+def test_configure_http_applies_to_new_clients():
+    """Tests that pool settings apply to clients built after they change."""
+    before = fastccg.init_model(gpt_4o, api_key="sk-one").client
+    settings = fastccg.configure_http(max_connections=7, http2=False)
+    after = fastccg.init_model(gpt_4o, api_key="sk-one").client
+
+    assert settings.max_connections == 7 and not settings.http2
+    assert after is not before
+
+    with pytest.raises(ValueError):
+        fastccg.configure_http(pool_size=3)
+
+
+def test_clients_are_not_shared_between_event_loops():
+    """Tests that the background loop and each `asyncio.run` loop get their own client, dropping closed loops'."""
+    model = fastccg.init_model(gpt_4o, api_key="sk-one")
+
+    async def client_and_loop():
+        return model.client, asyncio.get_running_loop()
+
+    background, background_loop = run_sync(client_and_loop())
+    first, first_loop = asyncio.run(client_and_loop())
+    again, _ = run_sync(client_and_loop())
+    second, _ = asyncio.run(client_and_loop())
+
+    assert again is background
+    assert first is not background and second is not background and second is not first
+    assert all(loop is not first_loop for _, _, loop in http._clients)
+    assert any(loop is background_loop for _, _, loop in http._clients)
@@ -0,0 +1,104 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import fastccg
+from fastccg.core.http import clear_clients
+from fastccg.core.loop import get_loop, run_sync
+from fastccg.embedding.mock import MockEmbedding
+from fastccg.models.gpt import gpt_4o
+from fastccg.models.mock import MockModel
+
+api = fastccg.add_mock_key()
+
+
+def test_sync_calls_share_one_background_loop():
+    """Tests that synchronous calls run on the same long-lived loop instead of a new one each time."""
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert run_sync(current_loop()) is run_sync(current_loop()) is get_loop()
+
+    model = fastccg.init_model(MockModel, api_key=api)
+    assert model.ask("hello").content == "This is a mock response to: hello"
+    embedder = fastccg.init_embedding(MockEmbedding, api_key=api)
+    assert embedder.embed_sync("hello") == embedder.embed_sync("hello")
+    assert get_loop().is_running()
+
+
+@pytest.mark.asyncio
+async def test_sync_api_works_inside_a_running_loop():
+    """Tests that the blocking API can be called from code that is already running in an event loop."""
+    model = fastccg.init_model(MockModel, api_key=api)
+    assert model.ask("inside").content.endswith("inside")
+
+    async def nested():
+        return run_sync(asyncio.sleep(0, result="deadlock"))
+
+    with pytest.raises(RuntimeError):
+        run_sync(nested())
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        run_sync(asyncio.sleep(1), timeout=0.01)
+
+
+class _ChatCompletions(BaseHTTPRequestHandler):
+    """Answers every request like OpenAI's chat completions endpoint, keeping connections alive."""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({
+            "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "pong"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    """Fixture to point OpenAI clients at a local server for the test."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatCompletions)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    clear_clients()
+    yield
+    clear_clients()
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_and_asyncio_run_calls_can_alternate(openai_server):
+    """Tests that ask(), asyncio.run(ask_async()) and ask() again on one key share no loop-bound resources."""
+    model = fastccg.init_model(gpt_4o, api_key="sk-test")
+    conversation = fastccg.init_model(MockModel, api_key=api)
+    conversation.compact_history(model, threshold_tokens=1, keep_turns=1)
+
+    async def ask_and_compact(prompt):
+        response = await conversation.ask_async(prompt)
+        await conversation.memory.wait_for_compaction()
+        return response, await model.ask_async(prompt)
+
+    assert model.ask("ping").content == "pong"
+    conversation.ask("first")
+    conversation.ask("second")
+    run_sync(conversation.memory.wait_for_compaction())
+
+    response, direct = asyncio.run(ask_and_compact("third"))
+    assert response.content.endswith("third") and direct.content == "pong"
+
+    assert model.ask("ping").content == "pong"
+    conversation.ask("fourth")
+    run_sync(conversation.memory.wait_for_compaction())
+    assert conversation.memory.compactions >= 2
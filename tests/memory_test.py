@@ -1,7 +1,11 @@
+import asyncio
 import os
+import time
 import unittest
 import json
+from fastccg.memory import SUMMARY_PREFIX, HistoryPolicy, MemoryManager
 from fastccg.models.mock import MockModel
+from fastccg.types.prompt import ModelPrompt
 
 
 class TestMemoryFeatures(unittest.TestCase):
@@ -70,5 +74,115 @@ class TestMemoryFeatures(unittest.TestCase):
         self.assertEqual(history[1].role, "assistant")
         self.assertEqual(history[1].content, "Hi, past user!")
 
+    def test_history_window_keeps_recent_turns(self):
+        """Test that a turn limit drops the oldest turns whole, keeping the system prompt."""
+        self.model.sys_prompt("Be brief.").history_window(max_turns=2)
+        for question in ("one", "two", "three"):
+            self.model.ask(question)
+
+        history = self.model.get_history()
+        self.assertEqual([p.content for p in history if p.role == "user"], ["two", "three"])
+        self.assertEqual(history[0].role, "user")
+        self.assertEqual(self.model.memory.turns, 2)
+        self.assertEqual(self.model._build_params()["system"], "Be brief.")
+
+    def test_history_window_token_budget(self):
+        """Test that a token budget counts the pinned system prompt and system messages, and tracks tokens incrementally."""
+        memory = MemoryManager(policy=HistoryPolicy(max_tokens=40, token_counter=lambda text: len(text.split())))
+        memory.set_system_prompt(ModelPrompt(role="system", content="one two three four five six"))
+        memory.append(ModelPrompt(role="system", content="Summary: the user likes tea."))
+        for i in range(10):
+            memory.append(ModelPrompt(role="user", content=f"question {i}"))
+            memory.append(ModelPrompt(role="assistant", content=f"answer {i}"))
+
+        # The system prompt (10 tokens) and summary (9) leave 21 tokens: room for one 12-token turn.
+        self.assertEqual(memory.tokens, 10 + 9 + 2 * 6)
+        self.assertEqual([p.content for p in memory.history], [
+            "Summary: the user likes tea.", "question 9", "answer 9",
+        ])
+
+        # The latest turn is kept even when it alone exceeds the budget.
+        memory.append(ModelPrompt(role="user", content=" ".join(["word"] * 50)))
+        self.assertEqual(memory.turns, 1)
+        self.assertEqual(memory.history[-1].content.count("word"), 50)
+
+        memory.set_policy(HistoryPolicy())
+        memory.history = [ModelPrompt(role="assistant", content="hi"), ModelPrompt(role="user", content="hello")]
+        self.assertEqual(memory.turns, 2)
+
+class _SlowSummarizer(MockModel):
+    """A mock summarizer that takes a while and records the requests it gets."""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    async def _ask_async(self, prompt: str):
+        self.requests.append(prompt)
+        await asyncio.sleep(0.2)
+        response = await super()._ask_async(prompt)
+        response.content = f"summary #{len(self.requests)}"
+        return response
+
+
+class TestHistoryCompaction(unittest.IsolatedAsyncioTestCase):
+    async def test_compaction_runs_in_the_background(self):
+        """Test that old turns are summarized without delaying replies, and that summaries roll up."""
+        summarizer = _SlowSummarizer()
+        model = MockModel().compact_history(summarizer, threshold_tokens=40, keep_turns=1)
+
+        await model.ask_async("first question")
+        start = time.monotonic()
+        await model.ask_async("second question")
+        self.assertLess(time.monotonic() - start, 0.1)
+        self.assertIsNone(model.memory.summary)
+
+        await model.memory.wait_for_compaction()
+        history = model.get_history()
+        self.assertEqual(history[0].content, SUMMARY_PREFIX + "summary #1")
+        self.assertEqual([p.content for p in history[1:] if p.role == "user"], ["second question"])
+        self.assertIn("user: first question", summarizer.requests[0])
+        self.assertEqual(summarizer.get_history(), [])
+
+        await model.ask_async("third question")
+        await model.memory.wait_for_compaction()
+        self.assertEqual(model.memory.summary.content, SUMMARY_PREFIX + "summary #2")
+        self.assertIn("Previous summary:\nsummary #1", summarizer.requests[1])
+        self.assertIn("user: second question", summarizer.requests[1])
+        self.assertEqual(model.memory.turns, 1)
+        self.assertEqual(model.memory.compactions, 2)
+
+    async def test_assistant_summary_stays_pinned_when_the_history_is_reset(self):
+        """Test that a summary written as an assistant message survives a history reset, e.g. a new token counter."""
+        model = MockModel()
+        model.memory.enable_compaction(_SlowSummarizer(), threshold_tokens=40, keep_turns=1, role="assistant")
+        await model.ask_async("first question")
+        await model.ask_async("second question")
+        await model.memory.wait_for_compaction()
+        summary = model.memory.summary
+        self.assertEqual(summary.role, "assistant")
+
+        model.history_window(max_turns=1, token_counter=len)
+        history = model.get_history()
+        self.assertIs(model.memory.summary, summary)
+        self.assertEqual(history[0], summary)
+        self.assertEqual([p.content for p in history if p.role == "user"], ["second question"])
+        self.assertEqual(model.memory.turns, 1)
+
+    async def test_compaction_of_a_replaced_history_is_discarded(self):
+        """Test that a summary arriving after the history was cleared is dropped."""
+        model = MockModel().compact_history(_SlowSummarizer(), threshold_tokens=40, keep_turns=1)
+        await model.ask_async("first question")
+        await model.ask_async("second question")
+        model.memory.clear()
+        await model.memory.wait_for_compaction()
+        self.assertEqual(model.get_history(), [])
+        self.assertEqual(model.memory.compactions, 0)
+
+    def test_model_cannot_summarize_itself(self):
+        model = MockModel()
+        with self.assertRaises(ValueError):
+            model.compact_history(model, threshold_tokens=100)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+import fastccg
+from fastccg.embedding.mock import MockEmbedding
+from fastccg.models.mock import MockModel
+from fastccg.rag import RAGModel, chunk_text
+from fastccg.utils.tokens import estimate_tokens
+from fastccg.vector_store.base import VectorStoreBase
+from fastccg.vector_store.in_memory import InMemoryVectorStore
+
+api = fastccg.add_mock_key()
+
+DOCUMENTS = {
+    "doc1": "The sky is blue because of Rayleigh scattering.",
+    "doc2": "Photosynthesis is the process used by plants to convert light into energy.",
+    "doc3": "The capital of France is Paris, known for the Eiffel Tower.",
+}
+
+
+@pytest.fixture
+async def rag() -> RAGModel:
+    """Fixture to provide a RAG model over a small mock-embedded knowledge base."""
+    embedder = fastccg.init_embedding(MockEmbedding, api_key=api)
+    store = InMemoryVectorStore()
+    vectors = await embedder.embed(list(DOCUMENTS.values()))
+    for doc_id, text, vector in zip(DOCUMENTS, DOCUMENTS.values(), vectors):
+        store.add(doc_id, vector, metadata={"text": text})
+    return RAGModel(llm=fastccg.init_model(MockModel, api_key=api), embedder=embedder, store=store, top_k=1)
+
+
+@pytest.mark.asyncio
+async def test_ask_many_matches_individual_questions(rag: RAGModel):
+    """Tests that batched questions retrieve the same context as asking them one by one."""
+    questions = [DOCUMENTS["doc3"], DOCUMENTS["doc1"]]
+
+    batched = await rag.ask_many_async(questions)
+    single = [await rag.ask_async(question) for question in questions]
+
+    assert [r.content for r in batched] == [r.content for r in single]
+    assert DOCUMENTS["doc3"] in batched[0].content
+    assert DOCUMENTS["doc1"] in batched[1].content
+
+
+@pytest.mark.asyncio
+async def test_hybrid_retrieval_finds_exact_terms(rag: RAGModel):
+    """Tests that hybrid retrieval surfaces a keyword match that mock dense retrieval cannot rank."""
+    rag.retrieval = "hybrid"
+    response = await rag.ask_async("Eiffel Tower capital")
+    assert DOCUMENTS["doc3"] in response.content
+
+    batched = await rag.ask_many_async(["Rayleigh scattering", "photosynthesis plants"])
+    assert DOCUMENTS["doc1"] in batched[0].content
+    assert DOCUMENTS["doc2"] in batched[1].content
+
+    # Lexical hits outside the filter are dropped before fusion.
+    filtered = await rag.ask_async("Eiffel Tower capital", filter={"text": DOCUMENTS["doc1"]})
+    assert DOCUMENTS["doc1"] in filtered.content
+
+
+def test_hybrid_retrieval_needs_a_listable_store():
+    """Tests that hybrid retrieval over a store that cannot list its documents is rejected up front."""
+    class UnlistableStore(InMemoryVectorStore):
+        documents = VectorStoreBase.documents
+
+    llm = fastccg.init_model(MockModel, api_key=api)
+    embedder = fastccg.init_embedding(MockEmbedding, api_key=api)
+    with pytest.raises(ValueError, match="UnlistableStore"):
+        RAGModel(llm=llm, embedder=embedder, store=UnlistableStore(), retrieval="hybrid")
+    assert RAGModel(llm=llm, embedder=embedder, store=UnlistableStore()).retrieval == "dense"
+
+
+@pytest.mark.asyncio
+async def test_lexical_index_save_load(rag: RAGModel, tmp_path):
+    """Tests that the BM25 index is saved beside the vector store and reloaded with it."""
+    rag.retrieval = "hybrid"
+    rag.build_lexical_index()
+    rag.lexical_index.remove("doc2")
+    filepath = str(tmp_path / "kb.fcvs")
+    rag.save(filepath)
+
+    rag.lexical_index = None
+    rag.load(filepath)
+    assert len(rag.lexical_index) == 2 and "doc2" not in rag.lexical_index
+    assert rag.lexical_index.search("Eiffel Tower")[0][0] == "doc3"
+
+    with pytest.raises(ValueError):
+        RAGModel(llm=rag.llm, embedder=rag.embedder, store=rag.store, retrieval="sparse")
+
+
+@pytest.mark.asyncio
+async def test_aindex_chunks_and_streams_documents(rag: RAGModel, tmp_path):
+    """Tests that the ingestion pipeline chunks, embeds and stores a stream of documents."""
+    long_text = " ".join(f"word{i}" for i in range(200))
+    chunks = chunk_text(long_text, max_tokens=50, overlap=10)
+    assert len(chunks) > 4 and all(estimate_tokens(chunk) <= 50 for chunk in chunks)
+    assert chunks[0].split()[-1] in chunks[1].split()[:5]
+
+    rag.build_lexical_index()
+    updates = []
+    stats = await rag.aindex(
+        [("long", long_text, {"source": "gen"}), "A short note about Rayleigh scattering."],
+        chunk_tokens=50, chunk_overlap=10, batch_size=2, concurrency=2, progress=lambda s: updates.append(s.chunks),
+    )
+    assert stats.documents == 2 and stats.chunks == len(chunks) + 1
+    assert updates[-1] == stats.chunks and rag.ingestion_stats is stats
+    assert rag.store.get_metadata("long#0") == {"source": "gen", "text": chunks[0], "doc_id": "long", "chunk": 0}
+
+    # Re-indexing a shorter version of a document drops its stale chunks.
+    await rag.aindex([("long", "now short")])
+    assert rag.store.get_metadata("long#1") is None and rag.store.get_metadata("long#0")["text"] == "now short"
+    assert "long#0" in rag.lexical_index and "long#1" not in rag.lexical_index
+
+    # So does a shorter version later in the same stream, even with the longer one still queued.
+    embed = rag.embedder.embed
+
+    async def slow_embed(texts):
+        await asyncio.sleep(0.01)
+        return await embed(texts)
+
+    rag.embedder.embed = slow_embed
+    await rag.aindex(
+        [("twice", long_text), ("twice", "now short")], chunk_tokens=50, chunk_overlap=10, batch_size=1, concurrency=2
+    )
+    stored = [n for n in range(len(chunks)) if rag.store.get_metadata(f"twice#{n}") is not None]
+    assert stored == [0] and rag.store.get_metadata("twice#0")["text"] == "now short"
+    assert [n for n in range(len(chunks)) if f"twice#{n}" in rag.lexical_index] == [0]
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("alpha")
+    (tmp_path / "sub" / "b.md").write_text("beta")
+    (tmp_path / "c.bin").write_text("ignored")
+    stats = await rag.aindex(tmp_path)
+    assert stats.documents == 2 and rag.store.get_metadata("sub/b.md#0")["text"] == "beta"
+
+
+@pytest.mark.asyncio
+async def test_coalesced_questions_share_one_answer(rag: RAGModel):
+    """Tests that concurrent identical questions are answered once when coalescing is enabled."""
+    rag.coalesce = True
+    calls = []
+    ask_async = rag.llm.ask_async
+
+    async def counting_ask_async(prompt):
+        calls.append(prompt)
+        return await ask_async(prompt)
+
+    rag.llm.ask_async = counting_ask_async
+    responses = await asyncio.gather(*(rag.ask_async("Where is Paris?") for _ in range(3)), rag.ask_async("Why is the sky blue?"))
+
+    assert len(calls) == 2 and responses[0] is responses[1] is responses[2]
+    await rag.ask_async("Where is Paris?")
+    assert len(calls) == 3
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+import fastccg
+from fastccg.core.rate_limit import RateLimiter, configure_rate_limit, get_rate_limiter, parse_retry_after
+from fastccg.core.retry import RetryPolicy
+from fastccg.errors import QuotaExceeded, RateLimited
+from fastccg.models.mock import MockModel
+
+api = fastccg.add_mock_key()
+
+
+class _FlakyModel(MockModel):
+    """A mock model whose first requests are rejected with a 429."""
+    provider = "flaky"
+
+    def __init__(self, api_key: str, failures: int = 1):
+        super().__init__(api_key=api_key)
+        self.failures = failures
+        self.attempts = 0
+
+    async def _ask_async(self, prompt: str):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RateLimited(retry_after=0.01)
+        return await super()._ask_async(prompt)
+
+
+@pytest.mark.asyncio
+async def test_bucket_delays_requests_over_budget():
+    """Tests that requests wait once the per-minute budget is spent, and are served in arrival order."""
+    limiter = RateLimiter(requests_per_minute=1200, tokens_per_minute=6000)
+    start = time.monotonic()
+    for _ in range(1200):
+        await limiter.acquire()
+    assert time.monotonic() - start < 0.5 and limiter.stats.delayed == 0
+
+    order = []
+
+    async def request(i):
+        await limiter.acquire(tokens=50)
+        order.append(i)
+
+    start = time.monotonic()
+    await asyncio.gather(*(request(i) for i in range(4)))
+    # 1200 requests per minute is one every 50ms once the bucket is empty.
+    assert order == [0, 1, 2, 3] and time.monotonic() - start >= 0.15
+    assert limiter.stats.delayed == 4
+
+
+def test_rates_adapt_to_429s_and_headers():
+    """Tests that 429s halve the rates once per burst, successes restore them, and headers are applied."""
+    limiter = RateLimiter(requests_per_minute=100)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.requests_per_minute == 50 and limiter.stats.rate_limited == 2
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.requests_per_minute == 70
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.requests_per_minute == 100
+
+    unconfigured = RateLimiter()
+    unconfigured.update_from_headers({"x-ratelimit-limit-tokens": "40000", "x-ratelimit-remaining-tokens": "10"})
+    assert unconfigured.tokens_per_minute == 40000 and unconfigured.requests_per_minute is None
+    assert unconfigured._tokens.wait_time(20) > 0
+
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "2"}) == 2.0
+    assert parse_retry_after({}) is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_requests_are_retried():
+    """Tests that a model queues a rate-limited request again instead of failing it."""
+    model = fastccg.init_model(_FlakyModel, api_key="flaky-1")
+    response = await model.ask_async("hello")
+    assert response.content.endswith("hello") and model.attempts == 2
+    assert model.rate_limiter is get_rate_limiter("flaky", "flaky-1")
+    assert model.rate_limiter.stats.rate_limited == 1
+
+    stubborn = _FlakyModel(api_key="flaky-2", failures=10)
+    stubborn.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01)
+    with pytest.raises(QuotaExceeded):
+        await stubborn.ask_async("hello")
+    assert stubborn.attempts == 2
+
+
+def test_configure_rate_limit_applies_to_existing_limiters():
+    """Tests that configured budgets apply to every key of the provider, including limiters in use."""
+    limiter = get_rate_limiter("configured", "key-1")
+    configure_rate_limit("configured", requests_per_minute=500, tokens_per_minute=90000)
+    assert limiter.requests_per_minute == 500
+    assert get_rate_limiter("configured", "key-2").tokens_per_minute == 90000
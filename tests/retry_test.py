@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import fastccg
+from fastccg.core.retry import RetryPolicy
+from fastccg.errors import APIRequestFailed, DeadlineExceeded, ModelUnavailable, RateLimited, is_retryable
+from fastccg.models.mock import MockModel
+
+api = fastccg.add_mock_key()
+
+FAST = RetryPolicy(max_attempts=4, base_delay=0.01)
+
+
+class _FailingModel(MockModel):
+    """A mock model whose first requests fail with a given error."""
+
+    def __init__(self, api_key: str, error: Exception = None, failures: int = 0, delay: float = 0.0):
+        super().__init__(api_key=api_key)
+        self.error = error
+        self.failures = failures
+        self.delay = delay
+        self.attempts = 0
+
+    async def _ask_async(self, prompt: str):
+        self.attempts += 1
+        await asyncio.sleep(self.delay)
+        if self.attempts <= self.failures:
+            raise self.error
+        return await super()._ask_async(prompt)
+
+    async def _ask_stream(self, prompt: str):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise self.error
+        yield await super()._ask_async(prompt)
+        if self.delay:
+            raise self.error
+
+
+def test_errors_are_classified():
+    """Tests which errors are worth retrying."""
+    assert is_retryable(APIRequestFailed("overloaded", status_code=503))
+    assert is_retryable(APIRequestFailed("reset", retryable=True))
+    assert is_retryable(RateLimited())
+    assert is_retryable(httpx.ConnectError("reset"))
+    assert not is_retryable(APIRequestFailed("bad request", status_code=400))
+    assert not is_retryable(ModelUnavailable("gone"))
+    assert not is_retryable(ValueError("bug"))
+
+    try:
+        try:
+            raise httpx.ReadTimeout("slow")
+        except Exception as e:
+            raise APIRequestFailed(f"Unexpected error: {e}")
+    except APIRequestFailed as wrapped:
+        assert is_retryable(wrapped)
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    """Tests that transient errors are retried and final ones are raised at once."""
+    model = _FailingModel(api, APIRequestFailed("unavailable", status_code=503), failures=2)
+    model.retry_policy = FAST
+    assert (await model.ask_async("hi")).content.endswith("hi") and model.attempts == 3
+
+    model = _FailingModel(api, APIRequestFailed("invalid", status_code=400), failures=2)
+    model.retry_policy = FAST
+    with pytest.raises(APIRequestFailed):
+        await model.ask_async("hi")
+    assert model.attempts == 1
+
+    model = _FailingModel(api, APIRequestFailed("unavailable", status_code=503), failures=10)
+    model.retry_policy = FAST
+    with pytest.raises(APIRequestFailed):
+        await model.ask_async("hi")
+    assert model.attempts == 4
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_the_whole_request():
+    """Tests that a deadline cancels slow attempts and skips retries that could not finish in time."""
+    model = _FailingModel(api, delay=1.0)
+    model.retry_policy = RetryPolicy(deadline=0.1)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await model.ask_async("hi")
+    assert time.monotonic() - start < 0.5
+
+    model = _FailingModel(api, RateLimited(retry_after=5.0), failures=1)
+    model.retry_policy = RetryPolicy(deadline=1.0)
+    with pytest.raises(RateLimited):
+        await model.ask_async("hi")
+    assert model.attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_streams_retry_only_before_the_first_chunk():
+    """Tests that a stream is retried while nothing was yielded, but not once chunks were sent."""
+    model = _FailingModel(api, APIRequestFailed("unavailable", status_code=503), failures=2)
+    model.retry_policy = FAST
+    chunks = [chunk.content async for chunk in model.ask_stream("hi")]
+    assert chunks == ["This is a mock response to: hi"] and model.attempts == 3
+
+    model = _FailingModel(api, APIRequestFailed("reset", retryable=True), delay=1)
+    model.retry_policy = FAST
+    chunks = []
+    with pytest.raises(APIRequestFailed):
+        async for chunk in model.ask_stream("hi"):
+            chunks.append(chunk)
+    assert len(chunks) == 1 and model.attempts == 1
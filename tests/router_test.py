@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+import fastccg
+from fastccg.core.rate_limit import RateLimiter
+from fastccg.errors import APIRequestFailed, ModelUnavailable, RateLimited
+from fastccg.models.mock import MockModel
+from fastccg.models.router import RouterModel
+
+api = fastccg.add_mock_key()
+
+
+class _Backend(MockModel):
+    """
+    A mock backend with a fixed latency, optionally failing every request.
+
+    The router calls per-request copies of it, so it records the requests in
+    lists the copies share.
+    """
+
+    def __init__(self, name: str, delay: float = 0.0, error: Exception = None):
+        super().__init__(api_key=f"router-test-{name}", model_name=name)
+        self.delay = delay
+        self.error = error
+        # The history and system prompt each request was sent with, and the cancelled requests.
+        self.requests = []
+        self.cancellations = []
+
+    @property
+    def calls(self):
+        return len(self.requests)
+
+    @property
+    def cancelled(self):
+        return len(self.cancellations)
+
+    @property
+    def seen_history(self):
+        return self.requests[-1][0] if self.requests else None
+
+    async def _ask_async(self, prompt: str):
+        self.requests.append(([p.content for p in self.memory.history], self._sys_prompt and self._sys_prompt.content))
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancellations.append(prompt)
+            raise
+        if self.error is not None:
+            raise self.error
+        response = await super()._ask_async(prompt)
+        response.content = f"{self.model_name}: {prompt}"
+        return response
+
+
+@pytest.mark.asyncio
+async def test_router_uses_first_backend_and_owns_the_conversation():
+    """Tests that the router sends its history to the backend and records the turn itself."""
+    fast, other = _Backend("fast"), _Backend("other")
+    router = RouterModel([fast, other])
+    router.sys_prompt("Be brief.")
+    await router.ask_async("one")
+    response = await router.ask_async("two")
+    assert response.content == "fast: two"
+    assert fast.requests[-1] == (["one", "fast: one", "two"], "Be brief.")
+    assert fast.memory.history == [] and fast._sys_prompt is None
+    assert [p.content for p in router.get_history()] == ["one", "fast: one", "two", "fast: two"]
+    assert other.calls == 0 and len(router.stats[0].latencies) == 2
+
+
+@pytest.mark.asyncio
+async def test_routers_sharing_a_queued_backend_keep_their_conversations_apart():
+    """Tests that routers sharing a backend each send their own conversation while its rate limiter queues them."""
+    shared = _Backend("shared")
+    shared.rate_limiter = RateLimiter(requests_per_minute=1200)
+    shared.rate_limiter._requests.level = 0  # Every request now waits its turn.
+    first, second = RouterModel([shared], hedge=False), RouterModel([shared], hedge=False)
+    first.sys_prompt("First.")
+    second.sys_prompt("Second.").temperature(0.5)
+    await asyncio.gather(first.ask_async("from conv1"), second.ask_async("from conv2"))
+    assert sorted(shared.requests) == [(["from conv1"], "First."), (["from conv2"], "Second.")]
+    assert [p.content for p in first.get_history()] == ["from conv1", "shared: from conv1"]
+    assert [p.content for p in second.get_history()] == ["from conv2", "shared: from conv2"]
+
+
+@pytest.mark.asyncio
+async def test_router_hedges_a_slow_backend():
+    """Tests that a slow request is duplicated to the next backend and the faster answer wins."""
+    slow, quick = _Backend("slow", delay=1.0), _Backend("quick", delay=0.01)
+    router = RouterModel([slow, quick], default_hedge_delay=0.05)
+    response = await router.ask_async("hi")
+    await asyncio.sleep(0)
+    assert response.content == "quick: hi"
+    assert slow.cancelled == 1
+    assert router.stats[1].hedges == 1 and router.stats[1].hedges_won == 1
+
+    no_hedge = RouterModel([_Backend("slow", delay=0.1), _Backend("quick")], hedge=False, default_hedge_delay=0.01)
+    assert (await no_hedge.ask_async("hi")).content == "slow: hi"
+
+
+@pytest.mark.asyncio
+async def test_router_fails_over_and_cools_down():
+    """Tests failover on quota, availability and transient errors, and that failed backends are skipped."""
+    limited = _Backend("limited", error=RateLimited(retry_after=60))
+    gone = _Backend("gone", error=ModelUnavailable("gone"))
+    healthy = _Backend("healthy")
+    router = RouterModel([limited, gone, healthy], hedge=False)
+    assert (await router.ask_async("hi")).content == "healthy: hi"
+    assert router._ranked() == [2, 0, 1]
+    await router.ask_async("again")
+    assert limited.calls == 1 and gone.calls == 1 and healthy.calls == 2
+
+    bad = RouterModel([_Backend("bad", error=APIRequestFailed("invalid", status_code=400)), _Backend("fine")])
+    with pytest.raises(APIRequestFailed):
+        await bad.ask_async("hi")
+
+    down = RouterModel([_Backend("a", error=ModelUnavailable("a")), _Backend("b", error=ModelUnavailable("b"))])
+    with pytest.raises(ModelUnavailable):
+        await down.ask_async("hi")
+
+
+@pytest.mark.asyncio
+async def test_router_ranks_by_latency_and_streams_with_failover():
+    """Tests latency-based ranking and failover of streams before the first chunk."""
+    slow, quick = _Backend("slow", delay=0.03), _Backend("quick")
+    router = RouterModel([slow, quick], hedge=False, min_samples=2)
+    for backend in (0, 1):
+        router.stats[backend].latencies.extend([0.03, 0.03] if backend == 0 else [0.001, 0.001])
+    assert router._ranked() == [1, 0]
+
+    failing = _Backend("failing", error=ModelUnavailable("down"))
+
+    async def broken_stream(prompt):
+        raise ModelUnavailable("down")
+        yield
+
+    failing._ask_stream = broken_stream
+    streaming = RouterModel([failing, _Backend("mock")])
+    chunks = [chunk.content async for chunk in streaming.ask_stream("hi")]
+    assert "".join(chunks) == "This is a mock streamed response."
+    assert streaming.get_history()[-1].content == "This is a mock streamed response."
@@ -0,0 +1,120 @@
+import hashlib
+import re
+import time
+from typing import List
+
+import pytest
+import fastccg
+from fastccg.core.semantic_cache import SemanticCache
+from fastccg.embedding.base import EmbeddingBase
+from fastccg.models.mock import MockModel
+from fastccg.rag import RAGModel
+from fastccg.vector_store.in_memory import InMemoryVectorStore
+
+api = fastccg.add_mock_key()
+
+
+class _BagOfWordsEmbedding(EmbeddingBase):
+    """Embeds texts as hashed word counts, so rewordings with the same words are similar."""
+
+    provider = "mock"
+
+    def __init__(self):
+        super().__init__(api_key=api, model_name="bag-of-words")
+        self.calls = 0
+
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 64
+            for word in re.findall(r"\w+", text.lower()):
+                vector[hashlib.sha256(word.encode()).digest()[0] % 64] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+class _CountingModel(MockModel):
+    def __init__(self):
+        super().__init__(api_key=api)
+        self.calls = 0
+
+    async def _ask_async(self, prompt: str):
+        self.calls += 1
+        return await super()._ask_async(prompt)
+
+
+@pytest.mark.asyncio
+async def test_paraphrases_are_answered_from_the_cache():
+    """Tests that a reworded first question reuses the cached answer, and that hits are counted."""
+    cache = SemanticCache(_BagOfWordsEmbedding(), threshold=0.8)
+    first = _CountingModel().cache_similar_responses(cache)
+    answer = await first.ask_async("How do I reset my password?")
+
+    second = _CountingModel().cache_similar_responses(cache)
+    reused = await second.ask_async("how do I reset my password")
+    assert reused.content == answer.content and reused.tokens_used == 0
+    assert second.calls == 0 and second.get_history()[-1].content == answer.content
+
+    unrelated = _CountingModel().cache_similar_responses(cache)
+    await unrelated.ask_async("What are your opening hours?")
+    assert unrelated.calls == 1
+    assert cache.stats.hits == 1 and cache.stats.misses == 2
+    assert sorted(entry.hits for entry in cache.entries()) == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_cache_is_scoped_and_skips_follow_up_questions():
+    """Tests that differently configured models don't share answers, and that later turns bypass the cache."""
+    cache = SemanticCache(_BagOfWordsEmbedding(), threshold=0.8)
+    model = _CountingModel().cache_similar_responses(cache)
+    await model.ask_async("What is the refund policy?")
+
+    french = _CountingModel().sys_prompt("Answer in French.").cache_similar_responses(cache)
+    await french.ask_async("What is the refund policy?")
+    assert french.calls == 1
+
+    await model.ask_async("What is the refund policy?")
+    assert model.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_are_evicted_by_size_and_ttl():
+    """Tests LRU eviction beyond max_entries and expiry after the TTL, in the store as well as the cache."""
+    embedder = _BagOfWordsEmbedding()
+    store = InMemoryVectorStore()
+    cache = SemanticCache(embedder, store=store, threshold=0.8, max_entries=2)
+    for question in ("alpha question", "beta question", "gamma question"):
+        cache.put(await cache.embed(question), question, f"answer to {question}", scope="s")
+    assert len(cache) == 2 and len(store) == 2 and cache.stats.evictions == 1
+    assert cache.get(await cache.embed("alpha question"), "s") is None
+    assert cache.get(await cache.embed("gamma question"), "s").content == "answer to gamma question"
+
+    cache.ttl = 0.05
+    time.sleep(0.06)
+    assert cache.get(await cache.embed("gamma question"), "s") is None
+    assert cache.purge_expired() == 1 and len(cache) == 0 and len(store) == 0
+
+
+@pytest.mark.asyncio
+async def test_rag_skips_retrieval_and_generation_on_a_hit():
+    """Tests that a RAG model answers a paraphrase from the cache, reusing the question's embedding."""
+    embedder = _BagOfWordsEmbedding()
+    store = InMemoryVectorStore()
+    text = "Refunds are issued within 14 days of purchase."
+    store.add("doc", (await embedder.embed(text))[0], {"text": text})
+    llm = _CountingModel()
+    cache = SemanticCache(embedder, threshold=0.8)
+    rag = RAGModel(llm=llm, embedder=embedder, store=store, top_k=1, semantic_cache=cache)
+
+    calls = embedder.calls
+    answer = await rag.ask_async("When are refunds issued?")
+    assert embedder.calls == calls + 1
+    assert (await rag.ask_async("when are refunds issued")).content == answer.content
+    assert llm.calls == 1
+
+    batched = await rag.ask_many_async(["When are refunds issued?", "Can I pay by card?"])
+    assert batched[0].content == answer.content and llm.calls == 2
+
+    filtered = await rag.ask_async("When are refunds issued?", filter={"text": text})
+    assert filtered.content == answer.content and llm.calls == 3
@@ -0,0 +1,409 @@
+import os
+import random
+from typing import Callable
+
+import numpy as np
+import pytest
+from fastccg.vector_store.base import VectorStoreBase
+from fastccg.vector_store.fcvs import is_binary_fcvs, read_fcvs, read_header
+from fastccg.vector_store.hnsw import HNSWVectorStore
+from fastccg.vector_store.in_memory import InMemoryVectorStore
+from fastccg.vector_store.ivf import IVFVectorStore
+from fastccg.vector_store.metadata_index import matches_filter
+from fastccg.vector_store.quantized import QuantizedVectorStore
+from fastccg.vector_store.sharded import ShardedVectorStore
+from fastccg.vector_store.wal import wal_path
+
+# Settings under which every store returns the exact neighbours of the small test corpora.
+STORE_FACTORIES = {
+    "memory": InMemoryVectorStore,
+    "hnsw": lambda: HNSWVectorStore(M=8, ef_construction=64, ef_search=64, seed=0),
+    "ivf": lambda: IVFVectorStore(n_lists=8, nprobe=8, seed=0),
+    "int8": lambda: QuantizedVectorStore(method="int8", rescore=50, seed=0),
+}
+
+
+@pytest.fixture
+def store() -> InMemoryVectorStore:
+    """Fixture to provide a small populated in-memory store."""
+    store = InMemoryVectorStore()
+    store.add("x", [1.0, 0.0, 0.0], metadata={"text": "x axis"})
+    store.add("y", [0.0, 1.0, 0.0], metadata={"text": "y axis"})
+    store.add("xy", [1.0, 1.0, 0.0], metadata={"text": "diagonal"})
+    return store
+
+
+@pytest.fixture(params=list(STORE_FACTORIES))
+def make_store(request) -> Callable[[], VectorStoreBase]:
+    """Fixture to build empty stores of one kind; tests using it run once per kind."""
+    return STORE_FACTORIES[request.param]
+
+
+def train(store: VectorStoreBase) -> None:
+    """Trains the stores that partition or quantize their vectors, once documents are added."""
+    if isinstance(store, (IVFVectorStore, QuantizedVectorStore)):
+        store.train()
+
+
+def test_similarity_search_ranks_by_cosine(store: InMemoryVectorStore):
+    """Tests that results come back best-first with cosine scores."""
+    results = store.similarity_search([1.0, 0.1, 0.0], top_k=2)
+
+    assert [doc_id for doc_id, _, _ in results] == ["x", "xy"]
+    assert results[0][1] == pytest.approx(0.995, abs=1e-3)
+    assert results[0][2] == {"text": "x axis"}
+
+
+def test_add_overwrites_existing_document(store: InMemoryVectorStore):
+    """Tests that re-adding a document id replaces its vector in place."""
+    store.add("x", [0.0, 0.0, 1.0], metadata={"text": "z axis"})
+    results = store.similarity_search([0.0, 0.0, 1.0], top_k=1)
+
+    assert len(store) == 3
+    assert results[0][0] == "x"
+    assert results[0][2] == {"text": "z axis"}
+
+
+def test_dimension_mismatch_raises(store: InMemoryVectorStore):
+    """Tests that vectors of the wrong size are rejected."""
+    with pytest.raises(ValueError):
+        store.add("bad", [1.0, 2.0])
+
+
+def test_save_and_load_round_trip(store: InMemoryVectorStore, tmp_path):
+    """Tests that the JSON .fcvs format round-trips vectors and metadata."""
+    path = tmp_path / "store.fcvs"
+    store.save(str(path))
+
+    loaded = InMemoryVectorStore()
+    loaded.load(str(path))
+
+    assert len(loaded) == 3
+    assert loaded.similarity_search([0.0, 1.0, 0.0], top_k=1)[0][0] == "y"
+
+
+def test_hnsw_matches_exact_search_on_small_corpus(tmp_path):
+    """Tests that the HNSW store finds the same neighbours as the exact store and survives save/load."""
+    rng = random.Random(0)
+    exact = InMemoryVectorStore()
+    approx = STORE_FACTORIES["hnsw"]()
+    for i in range(300):
+        vector = [rng.gauss(0, 1) for _ in range(16)]
+        exact.add(f"doc{i}", vector, metadata={"i": i})
+        approx.add(f"doc{i}", vector, metadata={"i": i})
+
+    query = [rng.gauss(0, 1) for _ in range(16)]
+    expected = [doc_id for doc_id, _, _ in exact.similarity_search(query, top_k=5)]
+    assert [doc_id for doc_id, _, _ in approx.similarity_search(query, top_k=5)] == expected
+
+    path = str(tmp_path / "hnsw.fcvs")
+    approx.save(path)
+    loaded = HNSWVectorStore()
+    loaded.load(path)
+    assert loaded.M == 8
+    assert [doc_id for doc_id, _, _ in loaded.similarity_search(query, top_k=5)] == expected
+
+    # A plain .fcvs file (no graph sidecar) is rebuilt into a graph on load.
+    exact.save(str(tmp_path / "plain.fcvs"))
+    rebuilt = HNSWVectorStore(ef_search=64, seed=0)
+    rebuilt.load(str(tmp_path / "plain.fcvs"))
+    assert len(rebuilt) == 300
+    assert rebuilt.similarity_search(query, top_k=1)[0][0] == expected[0]
+
+    # A stale sidecar, from before documents were added to the .fcvs file, is ignored and the graph rebuilt.
+    exact.add("extra", query, metadata={"i": -1})
+    exact.save(path)
+    stale = HNSWVectorStore(seed=0)
+    stale.load(path)
+    assert len(stale) == 301 and stale.similarity_search(query, top_k=1)[0][0] == "extra"
+
+
+def test_ivf_search_and_offline_build(tmp_path):
+    """Tests that a trained IVF store finds exact neighbours when probing every list, and builds from .fcvs."""
+    rng = random.Random(0)
+    exact = InMemoryVectorStore()
+    for i in range(200):
+        exact.add(f"doc{i}", [rng.gauss(0, 1) for _ in range(8)], metadata={"i": i})
+    path = str(tmp_path / "store.fcvs")
+    exact.save(path)
+
+    ivf = IVFVectorStore.build(path, n_lists=10, nprobe=10, seed=0)
+    assert ivf.is_trained and ivf.n_lists == 10
+
+    query = [rng.gauss(0, 1) for _ in range(8)]
+    expected = [doc_id for doc_id, _, _ in exact.similarity_search(query, top_k=5)]
+    assert [doc_id for doc_id, _, _ in ivf.similarity_search(query, top_k=5)] == expected
+
+    loaded = IVFVectorStore()
+    loaded.load(path)
+    assert loaded.is_trained and loaded.nprobe == 10
+    assert [doc_id for doc_id, _, _ in loaded.similarity_search(query, top_k=5)] == expected
+
+    rebuilt = IVFVectorStore.build(path, n_lists=4, nprobe=2, seed=0)
+    assert (rebuilt.n_lists, rebuilt.nprobe) == (4, 2)
+
+
+def test_ivf_ignores_a_stale_sidecar(tmp_path):
+    """Tests that an .ivf sidecar describing other documents than its .fcvs file is ignored, and can be rebuilt."""
+    path = str(tmp_path / "store.fcvs")
+    old = InMemoryVectorStore()
+    for i in range(20):
+        old.add(f"a{i}", [float(i), 1.0])
+    old.save(path)
+    IVFVectorStore.build(path, n_lists=4, seed=0)
+
+    grown = InMemoryVectorStore()
+    grown.load(path)
+    grown.add("extra", [1.0, -1.0])
+    grown.save(path)
+    loaded = IVFVectorStore()
+    loaded.load(path)
+    assert not loaded.is_trained and len(loaded) == 21
+    assert loaded.similarity_search([1.0, -1.0], top_k=1)[0][0] == "extra"
+
+    replaced = InMemoryVectorStore()
+    for i in range(20):
+        replaced.add(f"b{i}", [1.0, float(i)])
+    replaced.save(path)
+    loaded = IVFVectorStore()
+    loaded.load(path)
+    assert not loaded.is_trained and sorted(loaded._ids) == sorted(f"b{i}" for i in range(20))
+    rebuilt = IVFVectorStore.build(path, n_lists=2, seed=0)
+    assert rebuilt.is_trained and rebuilt.similarity_search([1.0, 19.0], top_k=1)[0][0] == "b19"
+
+
+def test_binary_fcvs_round_trip_is_memory_mapped(store: InMemoryVectorStore, tmp_path):
+    """Tests that the binary .fcvs layout loads memory-mapped and stays writable through copy-on-write."""
+    path = str(tmp_path / "store.fcvs")
+    store.save(path, binary=True)
+    assert is_binary_fcvs(path)
+
+    loaded = InMemoryVectorStore()
+    loaded.load(path)
+    assert isinstance(loaded._matrix, np.memmap)
+    assert loaded.similarity_search([1.0, 0.1, 0.0], top_k=2) == store.similarity_search([1.0, 0.1, 0.0], top_k=2)
+
+    loaded.add("z", [0.0, 0.0, 1.0])
+    loaded.save(path, binary=True, dtype="float16")
+    reloaded = InMemoryVectorStore()
+    reloaded.load(path)
+    assert len(reloaded) == 4
+    assert reloaded.similarity_search([0.0, 0.0, 1.0], top_k=1)[0][0] == "z"
+
+
+@pytest.mark.parametrize("method, options", [("int8", {}), ("pq", {"subvectors": 4, "rescore": 20})])
+def test_quantized_store_search_and_round_trip(method, options, tmp_path):
+    """Tests that quantized stores keep their nearest neighbours and survive save/load."""
+    rng = random.Random(0)
+    exact = InMemoryVectorStore()
+    quantized = QuantizedVectorStore(method=method, seed=0, **options)
+    for i in range(300):
+        vector = [rng.gauss(0, 1) for _ in range(16)]
+        exact.add(f"doc{i}", vector, metadata={"i": i})
+        quantized.add(f"doc{i}", vector, metadata={"i": i})
+    quantized.train()
+    assert quantized.is_trained
+
+    query = [rng.gauss(0, 1) for _ in range(16)]
+    expected = exact.similarity_search(query, top_k=1)[0][0]
+    assert quantized.similarity_search(query, top_k=1)[0][0] == expected
+
+    path = str(tmp_path / "quantized.fcvs")
+    quantized.save(path)
+    assert read_header(path).quantization == method
+
+    loaded = QuantizedVectorStore(**options)
+    loaded.load(path)
+    assert loaded.method == method and len(loaded) == 300
+    assert loaded.similarity_search(query, top_k=1)[0][0] == expected
+
+    # Other readers decode quantized files back to float vectors.
+    ids, vectors, _, metadata = read_fcvs(path)
+    assert len(ids) == 300 and vectors.shape == (300, 16) and metadata[0] == {"i": 0}
+
+
+def test_similarity_search_batch_matches_single_queries(store: InMemoryVectorStore):
+    """Tests that the vectorized batch search agrees with the per-query search and the base-class fallback."""
+    queries = [[1.0, 0.1, 0.0], [0.0, 1.0, 0.2], [0.5, 0.5, 0.0]]
+    batched = store.similarity_search_batch(queries, top_k=2)
+    fallback = VectorStoreBase.similarity_search_batch(store, queries, top_k=2)
+
+    for query, results, expected in zip(queries, batched, fallback):
+        assert [doc_id for doc_id, _, _ in results] == [doc_id for doc_id, _, _ in expected]
+        assert [score for _, score, _ in results] == pytest.approx([score for _, score, _ in expected])
+
+
+def test_metadata_filter_restricts_search(store: InMemoryVectorStore):
+    """Tests equality, $in and range filters, and that the metadata index follows overwrites."""
+    store.add("x", [1.0, 0.0, 0.0], metadata={"text": "x axis", "tenant": "acme", "year": 2021})
+    store.add("y", [0.0, 1.0, 0.0], metadata={"text": "y axis", "tenant": "acme", "year": 2023})
+    store.add("xy", [1.0, 1.0, 0.0], metadata={"text": "diagonal", "tenant": "globex", "year": 2024})
+    query = [1.0, 0.1, 0.0]
+
+    assert [r[0] for r in store.similarity_search(query, top_k=3, filter={"tenant": "acme"})] == ["x", "y"]
+    assert [r[0] for r in store.similarity_search(query, top_k=3, filter={"year": {"$gte": 2022}})] == ["xy", "y"]
+    assert [r[0] for r in store.similarity_search(query, top_k=3, filter={"tenant": {"$in": ["globex"]}})] == ["xy"]
+    assert store.similarity_search(query, top_k=3, filter={"tenant": "acme", "year": {"$gt": 2023}}) == []
+    assert store.similarity_search(query, top_k=3, filter={}) == store.similarity_search(query, top_k=3)
+    assert store.similarity_search_batch([query], top_k=3, filter={}) == [store.similarity_search(query, top_k=3)]
+
+    store.add("x", [1.0, 0.0, 0.0], metadata={"text": "x axis", "tenant": "globex", "year": 2021})
+    assert [r[0] for r in store.similarity_search(query, top_k=3, filter={"tenant": "globex"})] == ["x", "xy"]
+    assert [[r[0] for r in results] for results in store.similarity_search_batch([query, [0.0, 1.0, 0.0]], filter={"tenant": "globex"})] == [["x", "xy"], ["xy", "x"]]
+
+    with pytest.raises(ValueError):
+        store.similarity_search(query, filter={"year": {"$near": 2020}})
+
+
+def test_metadata_filter_keeps_booleans_apart_from_numbers(store: InMemoryVectorStore):
+    """Tests that True and 1 (or False and 0) don't match each other, in the index as in `matches_filter`."""
+    store.add("x", [1.0, 0.0, 0.0], metadata={"flag": True})
+    store.add("y", [0.0, 1.0, 0.0], metadata={"flag": 1})
+    store.add("xy", [1.0, 1.0, 0.0], metadata={"flag": 1.0})
+    query = [1.0, 0.1, 0.0]
+
+    assert [r[0] for r in store.similarity_search(query, top_k=3, filter={"flag": True})] == ["x"]
+    assert [r[0] for r in store.similarity_search(query, top_k=3, filter={"flag": 1})] == ["xy", "y"]
+    assert [r[0] for r in store.similarity_search(query, top_k=3, filter={"flag": {"$in": [False, 0]}})] == []
+    assert not matches_filter({"flag": 1}, {"flag": True}) and matches_filter({"flag": [0, True]}, {"flag": True})
+
+
+def test_metadata_filter_on_every_store(make_store):
+    """Tests that every store only returns documents matching the filter, in exact order for small corpora."""
+    rng = random.Random(0)
+    exact = InMemoryVectorStore()
+    other = make_store()
+    for i in range(400):
+        vector = [rng.gauss(0, 1) for _ in range(16)]
+        metadata = {"tenant": f"t{i % 4}", "year": 2000 + i % 25}
+        exact.add(f"doc{i}", vector, metadata)
+        other.add(f"doc{i}", vector, metadata)
+    train(other)
+
+    query = [rng.gauss(0, 1) for _ in range(16)]
+    for filter in ({"tenant": "t1"}, {"tenant": "t2", "year": {"$lt": 2005}}):
+        results = other.similarity_search(query, top_k=5, filter=filter)
+        assert all(matches_filter(metadata, filter) for _, _, metadata in results)
+        assert [r[0] for r in results] == [r[0] for r in exact.similarity_search(query, top_k=5, filter=filter)]
+    assert other.similarity_search(query, top_k=5, filter={}) == other.similarity_search(query, top_k=5)
+
+
+def test_add_many_matches_individual_adds(store: InMemoryVectorStore):
+    """Tests that bulk ingestion overwrites, de-duplicates and searches like repeated add calls."""
+    ids = ["z", "x", "w", "z"]
+    vectors = [[0.0, 0.0, 1.0], [0.0, 0.5, 0.5], [1.0, 0.0, 1.0], [0.0, 0.1, 1.0]]
+    metadatas = [{"text": "z"}, {"text": "x moved"}, None, {"text": "z again"}]
+
+    bulk = InMemoryVectorStore()
+    bulk.add_many(["x", "y", "xy"], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 1.0, 0.0]], [{"text": "x axis"}, {"text": "y axis"}, {"text": "diagonal"}])
+    bulk.add_many(ids, vectors, metadatas)
+    VectorStoreBase.add_many(store, ids, vectors, metadatas)
+
+    assert len(bulk) == len(store) == 5
+    query = [0.0, 0.3, 1.0]
+    assert bulk.similarity_search(query, top_k=5) == pytest.approx(store.similarity_search(query, top_k=5))
+    assert bulk.similarity_search([0.0, 0.1, 1.0], top_k=1)[0][2] == {"text": "z again"}
+
+    with pytest.raises(ValueError):
+        bulk.add_many(["a", "b"], [[1.0, 0.0, 0.0]])
+
+
+def test_delete_tombstones_and_compaction(make_store, tmp_path):
+    """Tests that deleted documents disappear from searches, compaction reclaims rows, and saves skip them."""
+    rng = random.Random(0)
+    vectors = {f"doc{i}": [rng.gauss(0, 1) for _ in range(8)] for i in range(100)}
+    store = make_store()
+    store.add_many(list(vectors), list(vectors.values()), [{"i": i, "even": i % 2 == 0} for i in range(100)])
+    train(store)
+
+    assert store.delete("doc0") and not store.delete("doc0")
+    assert len(store) == 99 and store._num_deleted == 1
+    assert store.similarity_search(vectors["doc0"], top_k=1)[0][0] != "doc0"
+    assert all(r[0] != "doc0" for r in store.similarity_search(vectors["doc0"], top_k=5, filter={"even": True}))
+
+    # Passing the threshold (25% of rows) compacts the tombstones away.
+    for i in range(1, 26):
+        store.delete(f"doc{i}")
+    assert len(store) == 74 and store._num_deleted == 0 and len(store._ids) == 74
+
+    store.upsert("doc1", vectors["doc1"], {"i": 1, "even": False})
+    store.upsert("doc50", vectors["doc1"], {"i": 50, "even": True})
+    assert len(store) == 75
+    assert {r[0] for r in store.similarity_search(vectors["doc1"], top_k=2)} == {"doc1", "doc50"}
+
+    store.delete("doc99")
+    path = str(tmp_path / "store.fcvs")
+    store.save(path)
+    loaded = make_store()
+    loaded.load(path)
+    assert len(loaded) == 74 and "doc99" not in loaded._ids
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_incremental_save_appends_to_write_ahead_log(store: InMemoryVectorStore, tmp_path, binary):
+    """Tests that incremental saves only log the changed documents, load replays them and checkpoint folds them in."""
+    path = str(tmp_path / "store.fcvs")
+    store.save(path, binary=binary)
+    snapshot_size = os.path.getsize(path)
+
+    store.add("z", [0.0, 0.0, 1.0], metadata={"text": "z axis"})
+    store.add("x", [1.0, 0.0, 0.5], metadata={"text": "x moved"})
+    store.delete("y")
+    store.save(path, binary=binary, incremental=True)
+    store.save(path, binary=binary, incremental=True)  # Nothing changed: nothing to append.
+
+    assert os.path.getsize(path) == snapshot_size
+    with open(wal_path(path)) as f:
+        assert len(f.readlines()) == 3
+
+    # A torn final record (e.g. a crash mid-append) is ignored on replay.
+    with open(wal_path(path), "a") as f:
+        f.write('{"op": "delete", "id": "z"')
+
+    loaded = InMemoryVectorStore()
+    loaded.load(path)
+    assert sorted(loaded._id_to_row) == ["x", "xy", "z"]
+    assert loaded.similarity_search([1.0, 0.0, 0.5], top_k=1)[0][2] == {"text": "x moved"}
+
+    # Appending after a torn record starts on a fresh line.
+    loaded.add("w", [0.0, 1.0, 1.0])
+    loaded.save(path, incremental=True)
+    loaded.checkpoint()
+    assert not os.path.exists(wal_path(path))
+    reloaded = InMemoryVectorStore()
+    reloaded.load(path)
+    assert sorted(reloaded._id_to_row) == ["w", "x", "xy", "z"]
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_sharded_store_matches_single_store(tmp_path, processes):
+    """Tests that fan-out search over hash-partitioned shards equals one exact store, in threads or worker processes."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    ids = [f"doc{i}" for i in range(500)]
+    metadatas = [{"tenant": f"t{i % 3}"} for i in range(500)]
+    exact = InMemoryVectorStore()
+    exact.add_many(ids, vectors, metadatas)
+
+    path = str(tmp_path / "sharded.fcvs")
+    writer = ShardedVectorStore(num_shards=4)
+    writer.add_many(ids, vectors, metadatas)
+    writer.delete("doc7")
+    exact.delete("doc7")
+    writer.save(path)
+
+    store = ShardedVectorStore(processes=processes)
+    store.load(path)
+    store.add("new", vectors[0] + 0.01, {"tenant": "t9"})  # A changed shard is searched in-process.
+    exact.add("new", vectors[0] + 0.01, {"tenant": "t9"})
+    try:
+        assert len(store) == len(exact) == 500
+        queries = rng.normal(size=(5, 16)).astype(np.float32)
+        for query, batched in zip(queries, store.similarity_search_batch(queries, top_k=10)):
+            expected = [r[0] for r in exact.similarity_search(query, top_k=10)]
+            assert [r[0] for r in store.similarity_search(query, top_k=10)] == expected
+            assert [r[0] for r in batched] == expected
+        expected = [r[0] for r in exact.similarity_search(queries[0], top_k=5, filter={"tenant": "t1"})]
+        assert [r[0] for r in store.similarity_search(queries[0], top_k=5, filter={"tenant": "t1"})] == expected
+    finally:
+        store.close()